@@ -0,0 +1,198 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from structured_logging import NOISY, get_logger
+
+log = get_logger("admission")
+
+
+PRIORITIES = ("high", "normal", "low")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't even be queued; carries a Retry-After hint"""
+
+    def __init__(self, status_code, retry_after, reason):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionTicket:
+    def __init__(self, priority, position, estimated_wait):
+        self.priority = priority
+        self.position = position
+        self.estimated_wait = estimated_wait
+        self.queued_at = time.monotonic()
+        self.started_at = None
+
+    def headers(self):
+        waited = (self.started_at or time.monotonic()) - self.queued_at
+        return {
+            "X-Queue-Priority": self.priority,
+            "X-Queue-Wait": f"{waited:.2f}",
+        }
+
+
+class AdmissionController:
+    """
+    Caps concurrent generations and bounds the waiting line per priority.
+    Work past the cap waits in a queue; once a priority's queue is full,
+    new requests are turned away immediately instead of timing out later.
+    Runs on the event loop only, so no locking is needed.
+    """
+
+    def __init__(self, max_concurrent=None, queue_limits=None):
+        if max_concurrent is None:
+            max_concurrent = int(os.getenv("ADMISSION_MAX_CONCURRENT", "4"))
+        if queue_limits is None:
+            queue_limits = {
+                "high": int(os.getenv("ADMISSION_QUEUE_HIGH", "16")),
+                "normal": int(os.getenv("ADMISSION_QUEUE_NORMAL", "8")),
+                "low": int(os.getenv("ADMISSION_QUEUE_LOW", "2")),
+            }
+        self.max_concurrent = max_concurrent
+        self.queue_limits = queue_limits
+        self.running = 0
+        self._queues = {p: deque() for p in PRIORITIES}
+        # ticket_id -> (ticket, waiter), so a waiting client can poll its place
+        self._tickets = {}
+        # Moving average of how long one generation holds a slot
+        self.avg_service_time = float(os.getenv("ADMISSION_INITIAL_SERVICE_SECONDS", "30"))
+
+    @staticmethod
+    def normalize_priority(priority):
+        priority = (priority or "normal").lower()
+        return priority if priority in PRIORITIES else "normal"
+
+    def queue_depth(self, priority=None):
+        if priority is not None:
+            return len(self._queues[priority])
+        return sum(len(q) for q in self._queues.values())
+
+    def _ahead_of(self, priority):
+        """Waiters that will be served before a new request at this priority"""
+        ahead = 0
+        for p in PRIORITIES:
+            ahead += len(self._queues[p])
+            if p == priority:
+                break
+        return ahead
+
+    def estimate_wait(self, position):
+        """Seconds until a request `position` places back in line gets a slot"""
+        if self.running < self.max_concurrent and position == 0:
+            return 0.0
+        return (position + 1) * self.avg_service_time / self.max_concurrent
+
+    def status(self):
+        """Queue snapshot for clients and readiness checks"""
+        return {
+            "running": self.running,
+            "max_concurrent": self.max_concurrent,
+            "avg_service_seconds": round(self.avg_service_time, 2),
+            "queues": {
+                p: {
+                    "depth": len(self._queues[p]),
+                    "limit": self.queue_limits[p],
+                    "estimated_wait": round(self.estimate_wait(self._ahead_of(p)), 1),
+                }
+                for p in PRIORITIES
+            },
+        }
+
+    def ticket_status(self, ticket_id):
+        """Live place in line of an admitted request, or None if it isn't known"""
+        entry = self._tickets.get(ticket_id)
+        if entry is None:
+            return None
+        ticket, waiter = entry
+        now = time.monotonic()
+        if ticket.started_at is not None:
+            return {
+                "state": "running",
+                "priority": ticket.priority,
+                "position": 0,
+                "estimated_wait": 0.0,
+                "waited": round(ticket.started_at - ticket.queued_at, 2),
+            }
+        queue = self._queues[ticket.priority]
+        # Everyone in higher-priority queues, then those ahead in its own
+        position = self._ahead_of(ticket.priority) - len(queue)
+        position += queue.index(waiter) if waiter in queue else 0
+        return {
+            "state": "queued",
+            "priority": ticket.priority,
+            "position": position,
+            "estimated_wait": round(self.estimate_wait(position), 1),
+            "waited": round(now - ticket.queued_at, 2),
+        }
+
+    @asynccontextmanager
+    async def admit(self, priority="normal", ticket_id=None):
+        """
+        Hold a generation slot, waiting in the priority queue if needed.
+        With a ticket_id, ticket_status(ticket_id) reports the live position
+        until the slot is released.
+        """
+        priority = self.normalize_priority(priority)
+        # A reused id (e.g. a retried request) keeps the first registration
+        track = ticket_id is not None and ticket_id not in self._tickets
+
+        if self.running < self.max_concurrent and self.queue_depth() == 0:
+            ticket = AdmissionTicket(priority, 0, 0.0)
+            self.running += 1
+            if track:
+                self._tickets[ticket_id] = (ticket, None)
+        else:
+            total_limit = sum(self.queue_limits.values())
+            if len(self._queues[priority]) >= self.queue_limits[priority] or self.queue_depth() >= total_limit:
+                saturated = self.queue_depth() >= total_limit
+                retry_after = max(1, math.ceil(self.estimate_wait(self._ahead_of(priority))))
+                reason = "Server saturated" if saturated else f"Too many queued {priority}-priority requests"
+                log.warning(f"🚦 Rejected {priority} request: {reason} (retry in {retry_after}s)")
+                raise AdmissionRejected(503 if saturated else 429, retry_after, reason)
+
+            position = self._ahead_of(priority)
+            ticket = AdmissionTicket(priority, position, self.estimate_wait(position))
+            waiter = asyncio.get_running_loop().create_future()
+            self._queues[priority].append(waiter)
+            if track:
+                self._tickets[ticket_id] = (ticket, waiter)
+            log.info(f"🚦 Queued {priority} request at position {position} (~{ticket.estimated_wait:.0f}s)", extra=NOISY)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Slot was handed over just as the client went away
+                    self._release()
+                else:
+                    self._queues[priority].remove(waiter)
+                if track:
+                    del self._tickets[ticket_id]
+                raise
+
+        ticket.started_at = time.monotonic()
+        try:
+            yield ticket
+        finally:
+            elapsed = time.monotonic() - ticket.started_at
+            self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * elapsed
+            if track:
+                del self._tickets[ticket_id]
+            self._release()
+
+    def _release(self):
+        """Hand the slot to the next waiter, highest priority first"""
+        for p in PRIORITIES:
+            queue = self._queues[p]
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(True)
+                    return
+        self.running -= 1
@@ -1,31 +1,120 @@
+# First, so the startup report covers every import below
+from startup import startup_timer
+import anyio
+import asyncio
+import hashlib
+import hmac
 import os
 import shutil
+import sys
 import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from fastapi import FastAPI, Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from generate_music import MusicGenerator
 from generate_image import ImageGenerator
-from generate_lyrics import LyricsGenerator
+from generate_lyrics import LyricsGenerator, DEFAULT_SONG_LENGTH, resolve_song_length
+from lyrics_document import build_lyrics_document
+from idempotency import IdempotencyStore, IdempotencyConflict
+from single_flight import SingleFlight
+from admission import AdmissionController, AdmissionRejected
+from circuit_breaker import CircuitOpenError
+from deadline import Deadline, DeadlineExceeded
+from cover_jobs import CoverJobs
+from placeholder_art import PlaceholderCoverRenderer
+from batch import ndjson, run_batch
+from rate_limit import PROVIDER_DEFAULTS, get_limiter, limiter_states
+from circuit_breaker import breaker_states
+import metrics
+from metrics import FALLBACKS, IN_FLIGHT, cache_result, stage_timer
+from structured_logging import get_logger, log_context, setup_logging, submit_with_context
+import tracing
+from tracing import tracer
+from profiler import profiler
+from readiness import UNREADY, ReadinessProbe, disk_headroom
+from generation_index import GenerationIndex, InvalidCursor
+from retention import RetentionSweeper
+from startup import READY, ComponentUnavailable, LazyComponent, warm_up
+from structured_logging import job_id_var, request_id_var
+
+# JSON lines through a background writer (LOG_LEVEL / LOG_FORMAT / LOG_SAMPLE)
+setup_logging()
+log = get_logger("app")
+startup_timer.mark("imports")
 
 # Create FastAPI app
 app = FastAPI()
 
-# Initialize all generators
-print("🎵 Initializing Music Generator...")
-musicgen = MusicGenerator()
+# Generators are built off the startup path (STARTUP_WARMUP) and on first
+# use; one that fails to start only takes down the features that need it
+musicgen = LazyComponent("music_generator", MusicGenerator)
+imagegen = LazyComponent("image_generator", ImageGenerator)
+# Warming creates the OpenAI client; without one lyrics come from the local engine
+lyricsgen = LazyComponent("lyrics_generator", LyricsGenerator, warm=lambda generator: generator.client)
+GENERATORS = {component.name: component for component in (musicgen, imagegen, lyricsgen)}
+
+# Idempotency-Key -> generation job (window set by IDEMPOTENCY_TTL_SECONDS)
+idempotency = IdempotencyStore()
+
+# Identical prompts in flight at the same time share one generation
+single_flight = SingleFlight()
+
+# Bounded concurrency + per-priority queues (ADMISSION_* settings)
+admission = AdmissionController()
+
+# DALL·E renders run in the background behind an instant placeholder cover
+cover_jobs = CoverJobs()
+
+# SQLite catalog behind /history and /gallery
+generation_index = GenerationIndex()
+HISTORY_PAGE_MAX = 200
+placeholder_renderer = PlaceholderCoverRenderer()
+
+# /metrics reads queue, provider and breaker state at scrape time
+metrics.QUEUE_DEPTH.set_function(lambda: {(p,): admission.queue_depth(p) for p in admission.queue_limits})
+metrics.PROVIDER_IN_FLIGHT.set_function(lambda: {(n,): get_limiter(n).in_flight for n in PROVIDER_DEFAULTS})
+metrics.PROVIDER_WAITING.set_function(lambda: {(n,): get_limiter(n).waiting for n in PROVIDER_DEFAULTS})
+metrics.BREAKER_OPEN.set_function(
+    lambda: {(n,): 0 if b["state"] == "closed" else 1 for n, b in breaker_states().items()}
+)
+
+# Share of the remaining request budget each stage may use, in pipeline order.
+# Artwork renders in the background and has its own budget.
+STAGE_BUDGETS = {
+    "lyrics": 0.2,
+    "music": 0.95,
+}
+COVER_RENDER_SECONDS = float(os.getenv("COVER_RENDER_SECONDS", "120"))
 
-print("🎨 Initializing Image Generator...")
-imagegen = ImageGenerator()
+# /generate/batch: items per request and how many of them run at once
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "3"))
 
-print("🎤 Initializing Lyrics Generator...")
-lyricsgen = LyricsGenerator()
+# /album: track limit, whole-album budget and the arc used to vary track prompts
+ALBUM_MAX_TRACKS = int(os.getenv("ALBUM_MAX_TRACKS", "8"))
+ALBUM_DEADLINE_SECONDS = float(os.getenv("ALBUM_DEADLINE_SECONDS", "300"))
+ALBUM_TRACK_ARCS = [
+    "opening track", "lead single", "slow reflective cut", "upbeat turn",
+    "deep cut", "interlude", "anthem",
+]
 
-print("✅ All generators ready!")
+# Bearer token (or X-Admin-Token) for /debug/profile; unset disables profiling
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
 # Define static folder
 STATIC_DIR = "./static"
 os.makedirs(STATIC_DIR, exist_ok=True)
+# Where the generators write before assets are published
+ASSETS_DIR = "./assets"
+
+# Background sweeper keeping both asset directories inside RETENTION_MAX_MB
+retention = RetentionSweeper(generation_index, [ASSETS_DIR, STATIC_DIR])
+retention.start()
 
 # CORS for frontend communication
 app.add_middleware(
@@ -34,114 +123,891 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "Idempotency-Key", "Idempotent-Replayed", "X-Coalesced", "Retry-After",
+        "X-Queue-Priority", "X-Queue-Wait",
+        "X-Batch-Id", "X-Request-ID", "X-Trace-Id", "traceparent", "X-Profile-Id",
+    ],
 )
 
+# Polling and debug traffic would crowd generations out of the trace buffer
+UNTRACED_PATHS = ("/debug", "/metrics", "/health", "/ready", "/static", "/queue", "/cover/")
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    # Every log line written while handling the request carries its ID,
+    # and its spans share one trace (continued from the caller's traceparent)
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12]
+    record = not request.url.path.startswith(UNTRACED_PATHS)
+    # Held open until the body is sent, not just until the handler returns:
+    # a StreamingResponse (/generate/batch) does its work while streaming
+    context = ExitStack()
+    context.enter_context(log_context(request_id=request_id))
+    root = context.enter_context(tracing.start_trace(
+        request.method, request.headers.get("traceparent"), record=record, request_id=request_id
+    ))
+    try:
+        sampler = _start_request_profile(request, root)
+        try:
+            response = await call_next(request)
+        finally:
+            if sampler is not None:
+                await run_in_threadpool(profiler.finish_request, sampler)
+        if sampler is not None:
+            response.headers["X-Profile-Id"] = sampler.trace_id
+        # Label by route template so /static/<file> and /cover/<id> stay one series each
+        path = getattr(request.scope.get("route"), "path", "unmatched")
+        root.name = f"{request.method} {path}"
+        root.set(status=response.status_code)
+    except BaseException:
+        if not context.__exit__(*sys.exc_info()):
+            raise
+    response.headers["X-Request-ID"] = request_id
+    response.headers["X-Trace-Id"] = root.trace_id
+    response.headers["traceparent"] = root.traceparent
+    metrics.REQUESTS.inc(path, response.status_code)
+    response.body_iterator = _body_in_context(response.body_iterator, context)
+    return response
+
+async def _body_in_context(body, context):
+    """Send the body, then close the request's log context and root span"""
+    try:
+        async for chunk in body:
+            yield chunk
+    except BaseException:
+        if not context.__exit__(*sys.exc_info()):
+            raise
+    else:
+        context.close()
+
+def _is_admin(request):
+    """True when the request carries ADMIN_TOKEN as a Bearer token or X-Admin-Token"""
+    if not ADMIN_TOKEN:
+        return False
+    supplied = request.headers.get("X-Admin-Token") or request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    return hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+def _client_scope(request):
+    """
+    Who an Idempotency-Key belongs to: a hash of the bearer token when the
+    client sends one, else its address
+    """
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if token:
+        return "token:" + hashlib.sha256(token.encode()).hexdigest()[:16]
+    return "addr:" + (request.client.host if request.client else "unknown")
+
+def _start_request_profile(request, root):
+    """Sample this /generate's threads when an admin sends X-Profile: 1"""
+    if request.url.path != "/generate" or request.headers.get("X-Profile", "").lower() not in ("1", "true"):
+        return None
+    if not _is_admin(request):
+        log.warning("⚠️ Ignoring X-Profile without a valid admin token")
+        return None
+    return profiler.start_request(root.trace_id)
+
+# Provider behind each user-facing component
+COMPONENT_PROVIDERS = {
+    "music_generator": "replicate",
+    "image_generator": "openai_images",
+    "lyrics_generator": "openai_chat",
+}
+BREAKER_COMPONENT_STATUS = {"closed": "ready", "half_open": "recovering", "open": "unavailable"}
+GENERATOR_COMPONENT_STATUS = {"cold": "cold", "starting": "starting", "degraded": "degraded", "failed": "unavailable"}
+
+def _component_status():
+    """Component readiness: the generator's start-up state, then its provider's circuit breaker"""
+    states = breaker_states()
+    status = {}
+    for component, provider in COMPONENT_PROVIDERS.items():
+        breaker = states.get(provider, {}).get("state", "closed")
+        generator = GENERATORS[component].state
+        if generator == READY or breaker != "closed":
+            status[component] = BREAKER_COMPONENT_STATUS[breaker]
+        else:
+            status[component] = GENERATOR_COMPONENT_STATUS[generator]
+    return status
+
+def _capacity_report():
+    """Raw inputs for /ready; runs on the event loop"""
+    threads = anyio.to_thread.current_default_thread_limiter()
+    return {
+        "admission": dict(admission.status(), free_slots=max(0, admission.max_concurrent - admission.running)),
+        "executors": {
+            "threadpool": {"size": int(threads.total_tokens), "busy": threads.borrowed_tokens,
+                           "free": int(threads.total_tokens) - threads.borrowed_tokens},
+            "cover": {"workers": cover_jobs.max_workers, "pending": cover_jobs.pending()},
+        },
+        "breakers": breaker_states(),
+        "providers": limiter_states(),
+        "disk": {path: disk_headroom(path) for path in (STATIC_DIR, ASSETS_DIR)},
+        "components": _component_status(),
+        "generators": {name: component.status() for name, component in GENERATORS.items()},
+    }
+
+readiness = ReadinessProbe(_capacity_report)
+
 @app.get("/")
 async def root():
+    labels = {"music_generator": "MusicGen", "image_generator": "DALL-E 3", "lyrics_generator": "GPT-4 Lyrics"}
     return {
         "message": "🎵 Complete Music Generator API is running!", 
         "status": "healthy",
         "components": {
-            "music": "✅ MusicGen ready",
-            "image": "✅ DALL-E 3 ready",
-            "lyrics": "✅ GPT-4 Lyrics ready"
+            name.split("_")[0]: f"{'✅' if state == 'ready' else '⚠️'} {labels[name]} {state}"
+            for name, state in _component_status().items()
         }
     }
 
+@tracing.traced("generate_song")
+def _generate_song(prompt, duration, deadline, options=None):
+    """
+    Run the full lyrics + music + artwork pipeline (blocking).
+    Each stage gets its STAGE_BUDGETS share of what is left of the deadline.
+    options carries request-level knobs (song_length, image_quality, image_size).
+    """
+    options = options or {}
+    log.info(f"🎵 Generating complete song for: '{prompt}' ({duration}s, {deadline.remaining():.0f}s budget)",
+             extra={"prompt": prompt, "duration": duration, "budget": round(deadline.remaining(), 1)})
+    start = time.time()
+    deadline.check("queue")
+    
+    # Initialize result containers
+    audio_path = None
+    lyrics_data = None
+    
+    # Generate lyrics using GPT-4 API
+    try:
+        log.debug("🎤 Creating lyrics with GPT-4...")
+        lyrics_data = lyricsgen.get().generate_lyrics(
+            prompt,
+            song_length=options.get("song_length", DEFAULT_SONG_LENGTH),
+            deadline=deadline.stage(STAGE_BUDGETS["lyrics"])
+        )
+        log.info(f"✅ Lyrics generated: {lyrics_data['title']}")
+    except Exception as e:
+        log.warning(f"⚠️ GPT-4 lyrics generation failed: {e}")
+        log.info("🔄 Using the local lyrics engine...")
+        lyrics_data = lyricsgen.get().generate_synthetic_lyrics_fallback(
+            prompt, options.get("song_length", DEFAULT_SONG_LENGTH)
+        )
+    lyrics_done = time.time()
+    
+    # Start DALL·E now so it renders while MusicGen composes
+    cover_job_id = cover_jobs.start(
+        lambda: _render_cover(prompt, options.get("image_quality"), options.get("image_size", "square"))
+    )
+    
+    # Generate music (working well)
+    try:
+        log.debug("🎵 Composing music...")
+        audio_path = musicgen.get().generate(prompt, duration, deadline=deadline.stage(STAGE_BUDGETS["music"]))
+        audio_url = _publish(audio_path)
+        music_done = time.time()
+        log.info(f"✅ Music generated: {os.path.basename(audio_path)}")
+    except (CircuitOpenError, ComponentUnavailable, DeadlineExceeded):
+        # Replicate is down, MusicGen failed to start or out of time; let the handler answer right away
+        cover_jobs.cancel(cover_job_id)
+        raise
+    except Exception as e:
+        log.error(f"❌ Music generation failed: {e}")
+        cover_jobs.cancel(cover_job_id)
+        raise Exception("Music generation failed - cannot continue without audio")
+
+    # Prepare response
+    response_data = {
+        "audio_url": audio_url,
+        "original_prompt": prompt,
+        "duration": duration,
+        "lyrics": _lyrics_payload(lyrics_data, options.get("song_length", DEFAULT_SONG_LENGTH))
+    }
+
+    _attach_cover(response_data, cover_job_id, lyrics_data["title"], lyrics_data["genre"], lyrics_data["mood"])
+    timings = {
+        "lyrics": round(lyrics_done - start, 3),
+        "music": round(music_done - lyrics_done, 3),
+        "total": round(time.time() - start, 3),
+    }
+    response_data["id"] = _index_generation(
+        "song", prompt, duration, options, response_data["lyrics"], audio_path, response_data, cover_job_id, timings
+    )
+    if response_data["status"] == "complete":
+        log.info("✅ Complete song generated successfully!", extra={"elapsed": timings["total"]})
+    return response_data
+
+def _index_generation(kind, prompt, duration, options, lyrics, audio_path, cover, cover_job_id, timings, **extra):
+    """
+    Catalog a finished generation; returns its id (None if the index write
+    failed, which never fails the generation itself)
+    """
+    placeholder = cover.get("image_url") if cover.get("status") == "partial" else None
+    image = cover.get("image_url") if cover.get("status") == "complete" else None
+    span = tracing.current_span()
+    try:
+        generation_id = generation_index.record(
+            kind=kind,
+            prompt=prompt,
+            duration=duration,
+            options=options,
+            title=lyrics["title"],
+            genre=lyrics["genre"],
+            mood=lyrics["mood"],
+            theme=lyrics["theme"],
+            lyrics=lyrics,
+            lyrics_source=lyrics["source"],
+            audio_file=os.path.basename(audio_path),
+            audio_bytes=_file_size(audio_path),
+            image_file=_static_file(image),
+            image_bytes=_file_size(os.path.join(STATIC_DIR, _static_file(image))) if image else None,
+            placeholder_file=_static_file(placeholder),
+            cover_job_id=cover_job_id,
+            cover_status=cover_jobs.get(cover_job_id)["status"],
+            elapsed=timings.get("total"),
+            timings=timings,
+            request_id=request_id_var.get(),
+            job_id=job_id_var.get(),
+            trace_id=span.trace_id if span else None,
+            **extra,
+        )
+    except Exception as e:
+        log.warning(f"⚠️ Could not index generation: {e}", exc_info=e)
+        return None
+    # The cover may have finished between _attach_cover and the insert
+    _index_cover(cover_jobs.get(cover_job_id))
+    return generation_id
+
+def _index_cover(job):
+    """cover_jobs listener: record a settled render on its generations"""
+    if job is None or job["status"] == "pending":
+        return
+    image_file = _static_file(job["image_url"])
+    image_bytes = _file_size(os.path.join(STATIC_DIR, image_file)) if image_file else None
+    generation_index.set_cover(job["id"], job["status"], image_file, image_bytes)
+
+cover_jobs.on_finish(_index_cover)
+
+def _static_url(filename):
+    return f"http://127.0.0.1:7860/static/{filename}"
+
+def _static_file(url):
+    """Basename of a /static URL (None passes through)"""
+    return url.rsplit("/", 1)[-1] if url else None
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+def _attach_cover(response_data, cover_job_id, title, genre, mood):
+    """Use the DALL·E cover if it already finished, otherwise a procedural placeholder"""
+    cover = cover_jobs.get(cover_job_id)
+    if cover["status"] == "ready":
+        response_data["image_url"] = cover["image_url"]
+        response_data["status"] = "complete"
+    else:
+        with tracing.span("cover_placeholder"):
+            placeholder_path = placeholder_renderer.save(title, genre, mood, STATIC_DIR)
+        placeholder_url = _static_url(os.path.basename(placeholder_path))
+        cover_jobs.set_placeholder(cover_job_id, placeholder_url)
+        response_data["image_url"] = placeholder_url
+        response_data["status"] = "partial"
+        FALLBACKS.inc("placeholder_cover")
+        log.warning(f"⚠️ Returning placeholder cover, artwork is {cover['status']}")
+
+    response_data["cover_job"] = {
+        "id": cover_job_id,
+        "status": cover["status"],
+        "status_url": f"http://127.0.0.1:7860/cover/{cover_job_id}",
+    }
+
+@tracing.traced("generate_album")
+def _generate_album(prompt, track_prompts, duration, deadline, options=None):
+    """
+    Album pipeline (blocking). One style profile and one cover for the whole
+    album; all MusicGen predictions start at once and run while a single
+    completion writes every track's lyrics, so wall time is roughly one
+    song's and only music calls grow with the track count.
+    """
+    options = options or {}
+    start = time.time()
+    log.info(f"💿 Generating {len(track_prompts)}-track album for: '{prompt}' ({deadline.remaining():.0f}s budget)")
+    deadline.check("queue")
+
+    style = musicgen.get().style_profile(prompt)
+    style.update(theme=lyricsgen.get().analyze_prompt(prompt)["theme"])
+    cover_job_id = cover_jobs.start(
+        lambda: _render_cover(prompt, options.get("image_quality"), options.get("image_size", "square"))
+    )
+
+    def track_music(track_prompt, track_deadline):
+        audio_path = musicgen.get().generate(track_prompt, duration, deadline=track_deadline, style=style)
+        return _publish(audio_path)
+
+    with ThreadPoolExecutor(max_workers=len(track_prompts), thread_name_prefix="album") as pool:
+        music_deadline = deadline.stage(STAGE_BUDGETS["music"])
+        music = [submit_with_context(pool, track_music, tp, music_deadline) for tp in track_prompts]
+        album_title, track_lyrics, lyrics_completions = lyricsgen.get().generate_album_lyrics(
+            prompt, track_prompts,
+            song_length=options.get("song_length", DEFAULT_SONG_LENGTH),
+            deadline=deadline.stage(STAGE_BUDGETS["lyrics"])
+        )
+
+        tracks = []
+        errors = []
+        for index, (track_prompt, future, lyrics_data) in enumerate(zip(track_prompts, music, track_lyrics)):
+            track = {
+                "index": index,
+                "prompt": track_prompt,
+                "lyrics": _lyrics_payload(lyrics_data, options.get("song_length", DEFAULT_SONG_LENGTH)),
+            }
+            try:
+                track["audio_url"] = future.result()
+                track["status"] = "ok"
+            except Exception as e:
+                log.error(f"❌ Album track {index + 1} failed: {e}", extra={"track": index})
+                errors.append(e)
+                track.update(status="error", error=str(e))
+            tracks.append(track)
+
+    if len(errors) == len(tracks):
+        cover_jobs.cancel(cover_job_id)
+        raise errors[0]
+
+    response_data = {
+        "album": {"title": album_title, "prompt": prompt, "style": style},
+        "tracks": tracks,
+        "duration": duration,
+        "cost": {
+            "lyrics_completions": lyrics_completions,
+            "local_lyrics": sum(1 for track in tracks if track["lyrics"]["source"] == "local_markov"),
+            "image_renders": 1,
+            "music_predictions": len(track_prompts),
+        },
+    }
+    _attach_cover(response_data["album"], cover_job_id, album_title, style["genre"], style["mood"])
+    response_data["elapsed"] = round(time.time() - start, 2)
+    album_id = response_data["album"]["id"] = uuid.uuid4().hex[:16]
+    for track in tracks:
+        if track["status"] == "ok":
+            track["id"] = _index_generation(
+                "album_track", track["prompt"], duration, options, track["lyrics"],
+                os.path.join(ASSETS_DIR, _static_file(track["audio_url"])), response_data["album"], cover_job_id,
+                {"total": response_data["elapsed"]}, album_id=album_id, track_index=track["index"],
+            )
+    log.info(f"✅ Album '{album_title}' ready: {len(tracks) - len(errors)}/{len(tracks)} tracks in {response_data['elapsed']}s")
+    return response_data
+
+def _album_track_prompts(prompt, count):
+    """Per-track prompts that walk through an album arc around one theme"""
+    if count == 1:
+        return [f"{prompt} (title track)"]
+    arcs = [ALBUM_TRACK_ARCS[i] if i < len(ALBUM_TRACK_ARCS) else f"track {i + 1}" for i in range(count - 1)]
+    return [f"{prompt} ({arc})" for arc in arcs + ["closing track"]]
+
+def _lyrics_payload(lyrics_data, song_length):
+    """Client-facing shape of a LyricsGenerator result"""
+    return {
+        "title": lyrics_data["title"],
+        "content": lyrics_data["lyrics"],
+        "document": lyrics_data.get("document") or build_lyrics_document(lyrics_data["lyrics"]),
+        "theme": lyrics_data["theme"],
+        "genre": lyrics_data["genre"],
+        "mood": lyrics_data["mood"],
+        "source": lyrics_data.get("source", "api"),
+        "song_length": lyrics_data.get("song_length", song_length)
+    }
+
+def _render_cover(prompt, quality=None, size="square"):
+    """Background DALL·E render; returns the static URL of the finished cover"""
+    log.debug("🎨 Creating album artwork...")
+    with IN_FLIGHT.track_inprogress("cover"), tracing.span("cover_render", quality=quality, size=size):
+        image_path = imagegen.get().generate(prompt, size=size, quality=quality, deadline=Deadline(COVER_RENDER_SECONDS))
+    log.info(f"✅ Image generated: {os.path.basename(image_path)}")
+    return _publish(image_path)
+
+def _publish(path):
+    """Copy a generated asset into STATIC_DIR and return its URL"""
+    filename = os.path.basename(path)
+    with stage_timer("file_copy"):
+        shutil.copy(path, os.path.join(STATIC_DIR, filename))
+    return _static_url(filename)
+
+def _parse_generation(body):
+    """
+    prompt, duration and the options that change the output (part of the
+    coalescing/idempotency keys). Raises ValueError for invalid values.
+    """
+    if not isinstance(body, dict):
+        raise ValueError("Body must be a JSON object")
+    prompt = body.get("prompt", "")
+    if not isinstance(prompt, str):
+        raise ValueError("prompt must be a string")
+    try:
+        duration = int(body.get("duration", 15))
+    except (TypeError, ValueError):
+        raise ValueError("duration must be an integer")
+    options = {
+        "song_length": resolve_song_length(body.get("song_length")),
+        "image_quality": ImageGenerator.resolve_quality(body.get("image_quality")),
+        "image_size": ImageGenerator.resolve_size(body.get("image_size")),
+    }
+    return prompt, duration, options
+
+def _parse_flag(value, name):
+    """A JSON boolean, or "true"/"false"/"1"/"0"; anything else is a ValueError"""
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "1"):
+        return True
+    if isinstance(value, str) and value.strip().lower() in ("false", "0"):
+        return False
+    raise ValueError(f"{name} must be true or false")
+
+async def _run_generation(prompt, duration, options, deadline, priority=None, fresh=False, headers=None, ticket_id=None):
+    """
+    Admission and request coalescing around _generate_song.
+    Queue and coalescing details are added to headers when given; with a
+    ticket_id, GET /queue/{ticket_id} reports the live position while queued.
+    """
+    headers = {} if headers is None else headers
+
+    async def admitted_generate():
+        # Only the request doing the work takes a slot; duplicates just wait on it.
+        # Its log lines carry one job ID whichever request started it.
+        job_id = uuid.uuid4().hex[:12]
+        with log_context(job_id=job_id):
+            async with admission.admit(priority, ticket_id) as ticket:
+                headers.update(ticket.headers())
+                tracing.record_span("admission_wait", ticket.started_at - ticket.queued_at, priority=ticket.priority)
+                tracing.current_span().set(job_id=job_id)
+                with IN_FLIGHT.track_inprogress("song"):
+                    return await run_in_threadpool(_generate_song, prompt, duration, deadline, options)
+
+    if fresh:
+        # Caller explicitly asked for a new variation
+        return await admitted_generate()
+
+    # Identical prompts already in flight share one generation
+    key = single_flight.key(prompt, duration=duration, **options)
+    result, shared = await single_flight.do(key, admitted_generate)
+    cache_result("single_flight", shared)
+    headers["X-Coalesced"] = "true" if shared else "false"
+    return result
+
+def _error_response(e):
+    """(status_code, body, headers) for an exception raised by a generation"""
+    if isinstance(e, ValueError):
+        return 400, {"error": str(e)}, {}
+    if isinstance(e, AdmissionRejected):
+        return e.status_code, {"error": e.reason, "retry_after": e.retry_after, "queue": admission.status()}, {"Retry-After": str(e.retry_after)}
+    if isinstance(e, CircuitOpenError):
+        log.warning(f"⚡ {e}")
+        retry_after = max(1, int(e.retry_after))
+        return 503, {"error": "Music provider is temporarily unavailable", "retry_after": retry_after}, {"Retry-After": str(retry_after)}
+    if isinstance(e, ComponentUnavailable):
+        log.warning(f"⚡ {e}")
+        retry_after = max(1, int(e.retry_after))
+        return 503, {"error": str(e), "retry_after": retry_after}, {"Retry-After": str(retry_after)}
+    if isinstance(e, DeadlineExceeded):
+        log.warning(f"⌛ {e}")
+        return 504, {"error": str(e)}, {}
+    if isinstance(e, IdempotencyConflict):
+        log.warning(f"⚠️ {e}")
+        return 422, {"error": str(e)}, {}
+    log.error(f"❌ Error generating song: {e}", exc_info=e)
+    return 500, {"error": str(e)}, {}
+
 @app.post("/generate")
 async def generate(request: Request):
     try:
         body = await request.json()
-        prompt = body.get("prompt", "")
-        duration = int(body.get("duration", 15))
+        prompt, duration, options = _parse_generation(body)
+        fresh = _parse_flag(body.get("fresh"), "fresh")
+        # The budget starts now, so time spent queued counts against it
+        deadline_seconds = request.headers.get("X-Deadline-Seconds") or body.get("deadline_seconds")
+        deadline = Deadline.for_request(float(deadline_seconds) if deadline_seconds else None)
+        priority = request.headers.get("X-Priority") or body.get("priority")
+        idempotency_key = request.headers.get("Idempotency-Key") or body.get("idempotency_key")
 
-        print(f"🎵 Generating complete song for: '{prompt}' ({duration}s)")
-        
-        # Initialize result containers
-        audio_path = None
-        image_path = None
-        lyrics_data = None
-        
-        # Generate lyrics using GPT-4 API
-        try:
-            print(f"🎤 Creating lyrics with GPT-4...")
-            lyrics_data = lyricsgen.generate_lyrics(prompt)
-            print(f"✅ Lyrics generated: {lyrics_data['title']}")
-        except Exception as e:
-            print(f"⚠️ GPT-4 lyrics generation failed: {e}")
-            print("🔄 Using template fallback...")
-            lyrics_data = lyricsgen.generate_premium_fallback(prompt)
-        
-        # Generate music (working well)
-        try:
-            print(f"🎵 Composing music...")
-            audio_path = musicgen.generate(prompt, duration)
-            audio_filename = os.path.basename(audio_path)
-            audio_static_path = os.path.join(STATIC_DIR, audio_filename)
-            shutil.copy(audio_path, audio_static_path)
-            print(f"✅ Music generated: {audio_filename}")
-        except Exception as e:
-            print(f"❌ Music generation failed: {e}")
-            raise Exception("Music generation failed - cannot continue without audio")
-
-        # Try image generation with graceful failure
-        try:
-            print(f"🎨 Creating album artwork...")
-            image_path = imagegen.generate(prompt)
-            image_filename = os.path.basename(image_path)
-            image_static_path = os.path.join(STATIC_DIR, image_filename)
-            shutil.copy(image_path, image_static_path)
-            print(f"✅ Image generated: {image_filename}")
-        except Exception as e:
-            print(f"⚠️ Image generation failed (network issue): {e}")
-            print("🔄 Continuing without album artwork...")
-            image_filename = None
-
-        # Prepare response
-        response_data = {
-            "audio_url": f"http://127.0.0.1:7860/static/{audio_filename}",
-            "original_prompt": prompt,
-            "duration": duration,
-            "lyrics": {
-                "title": lyrics_data["title"],
-                "content": lyrics_data["lyrics"],
-                "theme": lyrics_data["theme"],
-                "genre": lyrics_data["genre"],
-                "mood": lyrics_data["mood"],
-                "source": lyrics_data.get("source", "api")
-            }
-        }
+        headers = {}
 
-        # Add image URL if generation succeeded
-        if image_filename:
-            response_data["image_url"] = f"http://127.0.0.1:7860/static/{image_filename}"
-            response_data["status"] = "complete"
-            print(f"✅ Complete song generated successfully!")
+        async def run_job():
+            return await _run_generation(prompt, duration, options, deadline, priority, fresh, headers, request_id_var.get())
+
+        if idempotency_key:
+            # Retries of the same click attach to the original job
+            fingerprint = idempotency.fingerprint({"prompt": prompt, "duration": duration, "fresh": fresh, **options})
+            response_data, replayed = await idempotency.run(idempotency_key, fingerprint, run_job, _client_scope(request))
+            cache_result("idempotency", replayed)
+            headers["Idempotency-Key"] = idempotency_key
+            headers["Idempotent-Replayed"] = "true" if replayed else "false"
         else:
-            response_data["image_url"] = None
-            response_data["status"] = "partial"
-            print(f"⚠️ Partial song generated (music + lyrics, no artwork)")
+            response_data = await run_job()
+
+        return JSONResponse(response_data, headers=headers)
 
-        return JSONResponse(response_data)
-        
     except Exception as e:
-        print(f"❌ Error generating song: {e}")
-        return JSONResponse(status_code=500, content={"error": str(e)})
+        status_code, content, headers = _error_response(e)
+        return JSONResponse(status_code=status_code, content=content, headers=headers)
+
+@app.post("/generate/batch")
+async def generate_batch(request: Request):
+    """
+    Generate many songs in one call. Items run concurrently (BATCH_CONCURRENCY
+    at a time, still within admission and provider limits) and results stream
+    back as NDJSON lines in completion order. Failed items are reported
+    without stopping the batch.
+    """
+    try:
+        body = await request.json()
+    except Exception:
+        return JSONResponse(status_code=400, content={"error": "Body must be JSON"})
+
+    if not isinstance(body, dict):
+        return JSONResponse(status_code=400, content={"error": "Body must be a JSON object"})
+    items = body.get("items")
+    if items is None:
+        prompts = body.get("prompts", [])
+        items = [{"prompt": p} for p in prompts] if isinstance(prompts, list) else prompts
+    if not isinstance(items, list) or not items:
+        return JSONResponse(status_code=400, content={"error": "items (or prompts) must be a non-empty list"})
+    if len(items) > BATCH_MAX_ITEMS:
+        return JSONResponse(status_code=400, content={"error": f"At most {BATCH_MAX_ITEMS} items per batch"})
+    if not all(isinstance(item, (str, dict)) for item in items):
+        return JSONResponse(status_code=400, content={"error": "Each item must be a prompt string or an object"})
+    concurrency = body.get("concurrency", BATCH_CONCURRENCY)
+    if isinstance(concurrency, bool) or not isinstance(concurrency, int):
+        return JSONResponse(status_code=400, content={"error": "concurrency must be an integer"})
+
+    # Batch-level fields are defaults for every item
+    defaults = {k: body[k] for k in ("duration", "song_length", "image_quality", "image_size", "fresh") if k in body}
+    priority = request.headers.get("X-Priority") or body.get("priority") or "low"
+    concurrency = max(1, min(concurrency, BATCH_CONCURRENCY))
+    batch_id = uuid.uuid4().hex[:12]
+    log.info(f"📦 Batch {batch_id}: {len(items)} items, {concurrency} at a time, {priority} priority",
+             extra={"batch_id": batch_id})
+
+    def item_job(item):
+        async def job():
+            if isinstance(item, str):
+                spec = dict(defaults, prompt=item)
+            else:
+                spec = dict(defaults, **item)
+            prompt, duration, options = _parse_generation(spec)
+            if not prompt.strip():
+                raise ValueError("prompt is required")
+            fresh = _parse_flag(spec.get("fresh"), "fresh")
+            deadline_seconds = spec.get("deadline_seconds")
+            deadline = Deadline.for_request(float(deadline_seconds) if deadline_seconds else None)
+            while True:
+                try:
+                    return await _run_generation(prompt, duration, options, deadline, priority, fresh)
+                except AdmissionRejected as e:
+                    # Batches wait their turn instead of failing on a full queue
+                    if deadline.remaining() <= e.retry_after:
+                        raise
+                    await asyncio.sleep(e.retry_after)
+        return job
+
+    async def stream():
+        start = time.time()
+        succeeded = failed = 0
+        yield ndjson({"type": "batch", "batch_id": batch_id, "total": len(items), "concurrency": concurrency})
+        with IN_FLIGHT.track_inprogress("batch"):
+            async for index, result, error in run_batch([item_job(item) for item in items], concurrency):
+                item = items[index]
+                record = {"type": "item", "index": index, "id": item.get("id") if isinstance(item, dict) else None}
+                if error is None:
+                    succeeded += 1
+                    record.update(status="ok", result=result)
+                else:
+                    failed += 1
+                    status_code, content, _ = _error_response(error)
+                    record.update(status="error", status_code=status_code, **content)
+                yield ndjson(record)
+        yield ndjson({
+            "type": "summary", "batch_id": batch_id, "total": len(items),
+            "succeeded": succeeded, "failed": failed, "elapsed": round(time.time() - start, 2),
+        })
+        log.info(f"📦 Batch {batch_id} finished: {succeeded} ok, {failed} failed", extra={"batch_id": batch_id})
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers={"X-Batch-Id": batch_id})
+
+@app.get("/cover/{job_id}")
+async def cover_status(job_id: str):
+    """Poll a background cover render; image_url is set once DALL·E finishes"""
+    job = cover_jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown cover job"})
+    return job
+
+@app.get("/queue")
+async def queue_status():
+    """Current queue depth and estimated wait per priority"""
+    return admission.status()
+
+@app.get("/queue/{request_id}")
+async def queue_ticket_status(request_id: str):
+    """
+    Live place in line of a /generate or /album request, by its X-Request-ID.
+    Poll while the request is pending; 404 once it finishes or if it was
+    coalesced onto another request.
+    """
+    ticket = admission.ticket_status(request_id)
+    if ticket is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown or finished request"})
+    return ticket
+
+@app.post("/album")
+async def generate_album(request: Request):
+    """
+    Multi-track album: one cover, one style profile, one lyrics completion,
+    and every track's music generated concurrently.
+    """
+    try:
+        body = await request.json()
+        prompt, duration, options = _parse_generation(body)
+        if not prompt.strip():
+            raise ValueError("prompt is required")
+        track_prompts = body.get("track_prompts")
+        if track_prompts is not None:
+            if not isinstance(track_prompts, list) or not all(isinstance(p, str) and p.strip() for p in track_prompts):
+                raise ValueError("track_prompts must be a list of non-empty strings")
+            count = len(track_prompts)
+        else:
+            tracks = body.get("tracks", 4)
+            if isinstance(tracks, bool) or not isinstance(tracks, int):
+                raise ValueError("tracks must be an integer")
+            count = tracks
+        if not 1 <= count <= ALBUM_MAX_TRACKS:
+            raise ValueError(f"An album has 1 to {ALBUM_MAX_TRACKS} tracks")
+        track_prompts = [p.strip() for p in track_prompts] if track_prompts is not None else _album_track_prompts(prompt, count)
+
+        deadline_seconds = request.headers.get("X-Deadline-Seconds") or body.get("deadline_seconds")
+        deadline = Deadline(float(deadline_seconds) if deadline_seconds else ALBUM_DEADLINE_SECONDS)
+        priority = request.headers.get("X-Priority") or body.get("priority")
+        idempotency_key = request.headers.get("Idempotency-Key") or body.get("idempotency_key")
+
+        headers = {}
+
+        async def run_job():
+            # The whole album takes one admission slot; Replicate's limiter paces the tracks
+            job_id = uuid.uuid4().hex[:12]
+            with log_context(job_id=job_id):
+                async with admission.admit(priority, request_id_var.get()) as ticket:
+                    headers.update(ticket.headers())
+                    tracing.record_span("admission_wait", ticket.started_at - ticket.queued_at, priority=ticket.priority)
+                    tracing.current_span().set(job_id=job_id)
+                    with IN_FLIGHT.track_inprogress("album"):
+                        return await run_in_threadpool(_generate_album, prompt, track_prompts, duration, deadline, options)
+
+        if idempotency_key:
+            fingerprint = idempotency.fingerprint({"album": prompt, "tracks": track_prompts, "duration": duration, **options})
+            response_data, replayed = await idempotency.run(idempotency_key, fingerprint, run_job, _client_scope(request))
+            cache_result("idempotency", replayed)
+            headers["Idempotency-Key"] = idempotency_key
+            headers["Idempotent-Replayed"] = "true" if replayed else "false"
+        else:
+            response_data = await run_job()
+
+        return JSONResponse(response_data, headers=headers)
+
+    except Exception as e:
+        status_code, content, headers = _error_response(e)
+        return JSONResponse(status_code=status_code, content=content, headers=headers)
+
+@app.post("/lyrics/regenerate")
+async def regenerate_lyrics(request: Request):
+    """New lyrics for a prompt; served from cached variants when available"""
+    try:
+        body = await request.json()
+        if not isinstance(body, dict):
+            return JSONResponse(status_code=400, content={"error": "Body must be a JSON object"})
+        prompt = body.get("prompt", "")
+        if not isinstance(prompt, str) or not prompt.strip():
+            return JSONResponse(status_code=400, content={"error": "prompt is required"})
+        try:
+            song_length = resolve_song_length(body.get("song_length"))
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+        deadline = Deadline.for_request().stage(STAGE_BUDGETS["lyrics"])
+
+        generator = await run_in_threadpool(lyricsgen.get)
+        lyrics_data = await run_in_threadpool(generator.regenerate_lyrics, prompt, song_length, deadline)
+        payload = _lyrics_payload(lyrics_data, song_length)
+        payload["cached"] = lyrics_data.get("cached", False)
+        return payload
+    except Exception as e:
+        status_code, content, headers = _error_response(e)
+        return JSONResponse(status_code=status_code, content=content, headers=headers)
+
+@app.get("/lyrics/usage")
+async def lyrics_usage():
+    """Token spend and completion latency per song_length tier"""
+    try:
+        generator = await run_in_threadpool(lyricsgen.get)
+    except ComponentUnavailable as e:
+        status_code, content, headers = _error_response(e)
+        return JSONResponse(status_code=status_code, content=content, headers=headers)
+    return generator.usage_snapshot()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: stage latencies, fallbacks, cache hits, in-flight work"""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+def _catalog_item(item):
+    """Index row -> client shape with asset URLs"""
+    item["audio_url"] = _static_url(item["audio_file"]) if item.get("audio_file") else None
+    cover = item.get("image_file") or item.get("placeholder_file")
+    item["image_url"] = _static_url(cover) if cover else None
+    return item
+
+async def _catalog_page(request, with_cover):
+    try:
+        limit = max(1, min(int(request.query_params.get("limit", 50)), HISTORY_PAGE_MAX))
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "limit must be an integer"})
+    try:
+        items, next_cursor = await run_in_threadpool(
+            generation_index.page, limit, request.query_params.get("cursor"), with_cover
+        )
+    except InvalidCursor as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"items": [_catalog_item(item) for item in items], "next_cursor": next_cursor}
+
+@app.get("/history")
+async def history(request: Request):
+    """
+    Newest-first generations, `limit` per page (max HISTORY_PAGE_MAX).
+    Pass the returned next_cursor as `cursor` for the following page.
+    """
+    return await _catalog_page(request, with_cover=False)
+
+@app.get("/history/{generation_id}")
+async def history_item(generation_id: str):
+    """One generation with its lyrics, options and stage timings"""
+    item = await run_in_threadpool(generation_index.get, generation_id)
+    if item is None:
+        return JSONResponse(status_code=404, content={"error": "Generation not found"})
+    return _catalog_item(item)
+
+async def _set_pinned(generation_id, pinned):
+    found = await run_in_threadpool(generation_index.set_pinned, generation_id, pinned)
+    if not found:
+        return JSONResponse(status_code=404, content={"error": "Generation not found"})
+    return {"id": generation_id, "pinned": pinned}
+
+@app.put("/history/{generation_id}/pin")
+async def pin_generation(generation_id: str):
+    """Favorite a generation; pinned generations are never evicted by retention"""
+    return await _set_pinned(generation_id, True)
+
+@app.delete("/history/{generation_id}/pin")
+async def unpin_generation(generation_id: str):
+    return await _set_pinned(generation_id, False)
+
+@app.get("/gallery")
+async def gallery(request: Request):
+    """Like /history, limited to generations whose final cover has rendered"""
+    return await _catalog_page(request, with_cover=True)
+
+@app.get("/debug/traces")
+async def debug_traces(limit: int = 50):
+    """Most recent traces in the in-process buffer, newest first"""
+    if tracer.ring is None:
+        return JSONResponse(status_code=404, content={"error": "Trace buffer is disabled (TRACE_EXPORTER)"})
+    return {"traces": tracer.ring.summaries(limit)}
+
+@app.get("/debug/traces/{trace_id}")
+async def debug_trace(trace_id: str, format: str = "json"):
+    """
+    Spans of one trace ordered by start time; format=chrome returns
+    Chrome trace events for chrome://tracing or Perfetto
+    """
+    spans = tracer.ring.get(trace_id) if tracer.ring is not None else []
+    if not spans:
+        return JSONResponse(status_code=404, content={"error": "Trace not found"})
+    if format == "chrome":
+        return tracing.chrome_trace(spans)
+    return {"trace_id": trace_id, "spans": spans}
+
+@app.get("/debug/profile")
+async def debug_profile(request: Request, seconds: float = 10, interval_ms: float = None, idle: bool = False):
+    """
+    Sample every thread's stack for `seconds` and return collapsed stacks
+    (flamegraph.pl / speedscope input). Admin only; one profile at a time.
+    """
+    if not _is_admin(request):
+        return JSONResponse(status_code=403, content={"error": "Admin token required"})
+    sampler = await run_in_threadpool(profiler.profile, seconds, interval_ms, idle)
+    if sampler is None:
+        return JSONResponse(status_code=409, content={"error": "A profile is already running"})
+    return Response(sampler.collapsed(), media_type="text/plain",
+                    headers={f"X-Profile-{k.replace('_', '-').title()}": str(v) for k, v in sampler.summary().items()})
+
+@app.get("/debug/profile/{trace_id}")
+async def debug_request_profile(request: Request, trace_id: str):
+    """Collapsed stacks of a /generate that was sent with X-Profile: 1"""
+    if not _is_admin(request):
+        return JSONResponse(status_code=403, content={"error": "Admin token required"})
+    sampler = profiler.get(trace_id)
+    if sampler is None:
+        return JSONResponse(status_code=404, content={"error": "Profile not found"})
+    return Response(sampler.collapsed(), media_type="text/plain")
+
+@app.get("/debug/retention")
+async def debug_retention(request: Request):
+    """Report of the last retention sweep. Admin only."""
+    if not _is_admin(request):
+        return JSONResponse(status_code=403, content={"error": "Admin token required"})
+    if retention.last_report is None:
+        return JSONResponse(status_code=404, content={"error": "No sweep has run yet"})
+    return retention.last_report
+
+@app.post("/debug/retention/sweep")
+async def debug_retention_sweep(request: Request):
+    """Run a retention sweep now and return its report. Admin only."""
+    if not _is_admin(request):
+        return JSONResponse(status_code=403, content={"error": "Admin token required"})
+    return await run_in_threadpool(retention.sweep)
 
 @app.get("/static/{filename}")
 async def serve_static(filename: str):
     file_path = os.path.join(STATIC_DIR, filename)
-    if os.path.exists(file_path):
+    if os.path.isfile(file_path):
+        retention.touch(filename)
         return FileResponse(file_path)
     return JSONResponse(status_code=404, content={"error": "File not found"})
 
 @app.get("/health")
 async def health():
+    """Liveness: the process answers. Routing decisions belong to /ready"""
     return {
         "status": "healthy",
-        "components": {
-            "music_generator": "ready",
-            "image_generator": "ready", 
-            "lyrics_generator": "ready"
-        }
-    }
\ No newline at end of file
+        "components": _component_status(),
+        "generators": {name: component.status() for name, component in GENERATORS.items()},
+        "startup": startup_timer.report(),
+    }
+
+@app.get("/ready")
+async def ready():
+    """
+    Capacity-aware readiness for load balancers: 200 when ready or degraded,
+    503 when this instance should get no new work. Cached for
+    READINESS_TTL_SECONDS.
+    """
+    report, age = readiness.get()
+    return JSONResponse(
+        status_code=503 if report["status"] == UNREADY else 200,
+        content=report,
+        headers={"Cache-Control": "no-store", "X-Readiness-Age": f"{age:.2f}"},
+    )
+
+startup_timer.mark("app")
+log.info(f"🚀 App ready in {startup_timer.report()['total_seconds']:.2f}s {startup_timer.phases}",
+         extra={"startup": startup_timer.report()})
+warm_up(GENERATORS.values())
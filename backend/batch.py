@@ -0,0 +1,35 @@
+import asyncio
+import json
+
+
+def ndjson(record):
+    """One newline-delimited JSON line"""
+    return (json.dumps(record) + "\n").encode("utf-8")
+
+
+async def run_batch(jobs, concurrency):
+    """
+    Run jobs (zero-argument coroutine functions), at most `concurrency` at
+    a time, and yield (index, result, error) in completion order. A failing
+    job never stops the others. If the consumer goes away (client
+    disconnect) every unfinished job is cancelled.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index, job):
+        async with semaphore:
+            try:
+                return index, await job(), None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                return index, None, e
+
+    tasks = [asyncio.ensure_future(run(i, job)) for i, job in enumerate(jobs)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,264 @@
+"""
+End-to-end /generate benchmark against the mock providers (no API credits).
+
+Starts mock_providers.py and the API server as subprocesses, sends
+--requests generations with --concurrency in flight at a time, and reports
+throughput, end-to-end and per-stage p50/p95/p99 and the server's peak RSS.
+
+    python bench_generate.py --requests 40 --concurrency 4
+    python bench_generate.py --chat-latency fixed:0.5 --music-latency lognormal:4:0.3 --image-failure-rate 0.1
+
+Per-stage percentiles are interpolated from the server's /metrics
+histograms, the way Prometheus' histogram_quantile() does it.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from example_prompts import EXAMPLE_PROMPTS
+from mock_providers import DEFAULT_PROFILES
+
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STAGE_BUCKET_RE = re.compile(r'^prompt2track_stage_duration_seconds_bucket\{stage="([^"]+)",le="([^"]+)"\} (\S+)$')
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of raw samples (q in 0..100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(q / 100 * len(ordered)))) - 1]
+
+
+def scrape_stage_buckets(base_url):
+    """{stage: [(upper_bound, cumulative_count), ...]} from /metrics"""
+    buckets = defaultdict(list)
+    for line in requests.get(f"{base_url}/metrics", timeout=10).text.splitlines():
+        match = STAGE_BUCKET_RE.match(line)
+        if match:
+            stage, le, count = match.groups()
+            buckets[stage].append((float("inf") if le == "+Inf" else float(le), float(count)))
+    return {stage: sorted(values) for stage, values in buckets.items()}
+
+
+def bucket_delta(before, after):
+    """Observations made between two scrapes"""
+    delta = {}
+    for stage, values in after.items():
+        previous = dict(before.get(stage, []))
+        delta[stage] = [(le, count - previous.get(le, 0.0)) for le, count in values]
+    return delta
+
+
+def histogram_quantile(q, buckets):
+    """Linear interpolation inside the bucket holding the q-th observation (q in 0..1)"""
+    total = buckets[-1][1] if buckets else 0
+    if total <= 0:
+        return None
+    rank = q * total
+    lower_bound, lower_count = 0.0, 0.0
+    for upper_bound, count in buckets:
+        if count >= rank:
+            if upper_bound == float("inf"):
+                return lower_bound
+            if count == lower_count:
+                return upper_bound
+            return lower_bound + (upper_bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = upper_bound, count
+    return lower_bound
+
+
+def peak_rss_mb(pid):
+    """High-water RSS of a process (Linux /proc), or None where unavailable"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def wait_until_up(url, process, timeout=60):
+    start = time.time()
+    while time.time() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+class Servers:
+    """
+    Mock providers + API server as subprocesses. The API server runs in a
+    scratch directory so generated assets don't land in the repo.
+    """
+
+    def __init__(self, mock_port=8900, app_port=7861, mock_args=(), app_env=None, quiet=True):
+        self.mock_port = mock_port
+        self.app_port = app_port
+        self.mock_args = list(mock_args)
+        self.app_env = app_env or {}
+        self.quiet = quiet
+        self.workdir = tempfile.mkdtemp(prefix="p2t-bench-")
+        self.mock = None
+        self.app = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.app_port}"
+
+    def __enter__(self):
+        output = subprocess.DEVNULL if self.quiet else None
+        self.mock = subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, "mock_providers.py"), "--port", str(self.mock_port)] + self.mock_args,
+            cwd=BACKEND_DIR, stdout=output, stderr=output,
+        )
+        wait_until_up(f"http://127.0.0.1:{self.mock_port}/mock/stats", self.mock)
+
+        env = dict(
+            os.environ,
+            OPENAI_API_KEY="mock",
+            REPLICATE_API_TOKEN="mock",
+            OPENAI_BASE_URL=f"http://127.0.0.1:{self.mock_port}/v1",
+            REPLICATE_BASE_URL=f"http://127.0.0.1:{self.mock_port}",
+            **self.app_env,
+        )
+        self.app = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--app-dir", BACKEND_DIR,
+             "--port", str(self.app_port), "--log-level", "warning"],
+            cwd=self.workdir, env=env, stdout=output, stderr=output,
+        )
+        wait_until_up(f"{self.base_url}/health", self.app)
+        return self
+
+    def mock_stats(self):
+        return requests.get(f"http://127.0.0.1:{self.mock_port}/mock/stats", timeout=10).json()
+
+    def __exit__(self, *exc):
+        for process in (self.app, self.mock):
+            if process is not None and process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def send_generate(base_url, body, timeout=600):
+    """One /generate call -> {status, elapsed, error}"""
+    start = time.perf_counter()
+    try:
+        response = requests.post(f"{base_url}/generate", json=body, timeout=timeout)
+        status = response.status_code
+        error = None if status == 200 else response.json().get("error")
+    except requests.RequestException as e:
+        status, error = "connection_error", str(e)
+    return {"status": status, "elapsed": time.perf_counter() - start, "error": error}
+
+
+def stage_report(before, after):
+    """{stage: {count, p50, p95, p99}} for the observations made during a run"""
+    report = {}
+    for stage, buckets in sorted(bucket_delta(before, after).items()):
+        count = buckets[-1][1] if buckets else 0
+        if count:
+            report[stage] = {
+                "count": int(count),
+                **{f"p{q}": round(histogram_quantile(q / 100, buckets), 3) for q in (50, 95, 99)},
+            }
+    return report
+
+
+def print_report(report):
+    print(f"\n📊 {report['requests']} requests, concurrency {report['concurrency']}, "
+          f"{report['wall_seconds']:.1f}s wall")
+    print(f"🚀 Throughput: {report['throughput_rps']:.3f} req/s ({report['throughput_rps'] * 60:.1f}/min)")
+    print(f"📬 Status codes: {report['status_codes']}")
+    e2e = report["end_to_end"]
+    print(f"⏱️  End to end: p50 {e2e['p50']}s  p95 {e2e['p95']}s  p99 {e2e['p99']}s")
+    print(f"{'stage':<22}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for stage, row in report["stages"].items():
+        print(f"{stage:<22}{row['count']:>7}{row['p50']:>9}{row['p95']:>9}{row['p99']:>9}")
+    if report["peak_rss_mb"] is not None:
+        print(f"🧠 Server peak RSS: {report['peak_rss_mb']:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=int, default=15, help="clip length per request")
+    parser.add_argument("--coalesce", action="store_true", help="let repeated prompts share a generation (default: fresh=true)")
+    parser.add_argument("--mock-port", type=int, default=8900)
+    parser.add_argument("--app-port", type=int, default=7861)
+    parser.add_argument("--output", help="also write the report as JSON here")
+    parser.add_argument("--verbose", action="store_true", help="show server logs")
+    for name in DEFAULT_PROFILES:
+        parser.add_argument(f"--{name}-latency")
+        parser.add_argument(f"--{name}-failure-rate")
+    args = parser.parse_args()
+
+    mock_args = []
+    for name in DEFAULT_PROFILES:
+        for option in ("latency", "failure_rate"):
+            value = getattr(args, f"{name}_{option}")
+            if value is not None:
+                mock_args += [f"--{name}-{option.replace('_', '-')}", value]
+
+    bodies = [
+        {"prompt": EXAMPLE_PROMPTS[i % len(EXAMPLE_PROMPTS)], "duration": args.duration, "fresh": not args.coalesce}
+        for i in range(args.requests)
+    ]
+
+    with Servers(args.mock_port, args.app_port, mock_args, quiet=not args.verbose) as servers:
+        print(f"🧪 Mock providers: {servers.mock_stats()['profiles']}")
+        before = scrape_stage_buckets(servers.base_url)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(lambda body: send_generate(servers.base_url, body), bodies))
+        wall = time.perf_counter() - start
+        after = scrape_stage_buckets(servers.base_url)
+
+        elapsed = [r["elapsed"] for r in results if r["status"] == 200]
+        report = {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "wall_seconds": round(wall, 2),
+            "throughput_rps": round(len(elapsed) / wall, 4) if wall else 0.0,
+            "status_codes": dict(Counter(str(r["status"]) for r in results)),
+            "end_to_end": {f"p{q}": round(percentile(elapsed, q), 3) if elapsed else None for q in (50, 95, 99)},
+            "stages": stage_report(before, after),
+            "peak_rss_mb": peak_rss_mb(servers.app.pid),
+            "mock": servers.mock_stats(),
+        }
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Microbenchmark: per-dimension substring scans vs the shared KeywordClassifier
+on lyric-length inputs.
+
+    python bench_keyword_classifier.py [--iterations 2000] [--repeats 5]
+
+Each timing is the best of --repeats runs, so one noisy run doesn't decide
+the ratio. The margin is smallest when an early keyword ends the substring
+scans quickly ("early hits"), and largest when they have to walk most
+keyword lists ("sparse hits").
+"""
+import argparse
+import time
+
+from example_prompts import EXAMPLE_PROMPTS
+from generate_lyrics import LYRICS_CLASSIFIER, LYRICS_KEYWORD_RULES
+
+
+SAMPLE_LYRICS = """# Neon Rain
+
+[Verse 1]
+Every sunrise brings a chance to start anew
+Every lesson learned becomes a part of what I do
+In the rhythm of the days I find my pace
+Living in this space, by the hearth where shadows race
+
+[Chorus]
+This is our moment, this is our time
+Every heartbeat tells me that you're mine
+Nothing else matters when we're together
+We'll face whatever, now and forever
+
+[Verse 2]
+Through the laughter and the tears I grow each day
+Every moment teaches me there's always another way
+Mountains high and oceans wide won't slow me down
+Every obstacle I face becomes my solid ground
+
+[Bridge]
+When the world gets complicated
+And everything feels jaded
+Your love reminds me who I am
+This is where I take my stand
+
+[Chorus]
+This is our moment, this is our time
+Every heartbeat tells me that you're mine
+Nothing else matters when we're together
+We'll face whatever, now and forever
+"""
+
+
+# Few or late keyword hits: the substring scans walk every keyword list
+SAMPLE_LYRICS_SPARSE = """# Paper Boats
+
+[Verse 1]
+Chalk lines on the pavement where the children used to play
+Paper boats in gutters drifting out toward the bay
+Grandpa's old transistor humming stations out of tune
+Streetlights flicker on before the middle of the afternoon
+
+[Chorus]
+Carry me down, carry me down
+Past the bakery, past the edge of town
+Every window has a story, every door a name
+Nothing here stays different and nothing stays the same
+
+[Verse 2]
+Bicycles in hallways, postcards on the fridge
+Footsteps on the staircase, pigeons on the bridge
+Somebody is whistling a song I almost know
+Counting all the chimneys in the orange afterglow
+
+[Chorus]
+Carry me down, carry me down
+Past the bakery, past the edge of town
+"""
+
+SAMPLES = {"early hits": SAMPLE_LYRICS, "sparse hits": SAMPLE_LYRICS_SPARSE}
+
+
+def legacy_first_match(text, rules, default):
+    """The old pattern: lowercase, then any(word in text) per label"""
+    text = text.lower()
+    for label, words in rules:
+        if any(word in text for word in words):
+            return label
+    return default
+
+
+def legacy_classify(lyrics, prompt):
+    """All five detections the way LyricsGenerator used to run them"""
+    combined = lyrics + " " + prompt
+    return {
+        "genre": legacy_first_match(prompt, LYRICS_KEYWORD_RULES["prompt_genre"], "indie"),
+        "prompt_mood": legacy_first_match(prompt, LYRICS_KEYWORD_RULES["prompt_mood"], "balanced"),
+        "prompt_theme": legacy_first_match(prompt, LYRICS_KEYWORD_RULES["prompt_theme"], "life"),
+        "theme": legacy_first_match(combined, LYRICS_KEYWORD_RULES["content_theme"], "life"),
+        "mood": legacy_first_match(combined, LYRICS_KEYWORD_RULES["content_mood"], "balanced"),
+    }
+
+
+def classifier_classify(lyrics, prompt):
+    prompt_hits = LYRICS_CLASSIFIER.scan(prompt)
+    combined_hits = LYRICS_CLASSIFIER.scan(lyrics) | prompt_hits
+    return {
+        "genre": LYRICS_CLASSIFIER.label(prompt_hits, "prompt_genre"),
+        "prompt_mood": LYRICS_CLASSIFIER.label(prompt_hits, "prompt_mood"),
+        "prompt_theme": LYRICS_CLASSIFIER.label(prompt_hits, "prompt_theme"),
+        "theme": LYRICS_CLASSIFIER.label(combined_hits, "content_theme"),
+        "mood": LYRICS_CLASSIFIER.label(combined_hits, "content_mood"),
+    }
+
+
+def bench(fn, inputs, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        lyrics, prompt = inputs[i % len(inputs)]
+        fn(lyrics, prompt)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"📏 {args.iterations} iterations per profile, best of {args.repeats}, lyrics + example prompt")
+    for name, sample in SAMPLES.items():
+        # Distinct lyric strings per call so the scan cache can't hide the work
+        inputs = [(f"{sample}\n[Outro]\nTake {i}", EXAMPLE_PROMPTS[i % len(EXAMPLE_PROMPTS)])
+                  for i in range(args.iterations)]
+        legacy_us = new_us = float("inf")
+        for _ in range(args.repeats):
+            LYRICS_CLASSIFIER.scan.cache_clear()
+            legacy_us = min(legacy_us, bench(legacy_classify, inputs, args.iterations))
+            new_us = min(new_us, bench(classifier_classify, inputs, args.iterations))
+
+        print(f"\n🎵 {name} ({len(sample)} chars)")
+        print(f"🐢 Substring scans:    {legacy_us:8.1f} µs/classification")
+        print(f"⚡ KeywordClassifier:  {new_us:8.1f} µs/classification")
+        speedup = legacy_us / new_us
+        print(f"🚀 Speedup: {speedup:.2f}x" if speedup >= 1 else f"🐌 Slower: {speedup:.2f}x")
+
+        # Where results differ it's the word-boundary fix (e.g. "hearth" is not "heart")
+        lyrics, prompt = inputs[0]
+        print(f"   legacy: {legacy_classify(lyrics, prompt)}")
+        print(f"   new:    {classifier_classify(lyrics, prompt)}")
+
+
+if __name__ == "__main__":
+    main()
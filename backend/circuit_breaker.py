@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from deadline import DeadlineExceeded
+from structured_logging import get_logger
+
+log = get_logger("circuit_breaker")
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# A call failing with less than this left of its caller's deadline ran out
+# of the caller's budget (client timeouts are derived from the deadline)
+DEADLINE_SLACK_SECONDS = 0.1
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} circuit is open, skipping call (retry in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Per-provider breaker over a rolling window of recent calls.
+    Trips when too many calls fail or run slower than slow_call_seconds,
+    fails fast while open, then lets a few probe calls through to
+    detect recovery.
+    """
+
+    def __init__(self, name, window=20, min_calls=5, failure_rate=0.5,
+                 slow_call_seconds=30.0, slow_call_rate=0.8, open_seconds=30.0, probes=2):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.probes = probes
+
+        self.state = CLOSED
+        self._calls = deque(maxlen=window)  # (failed, slow)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def check(self):
+        """Fail fast without consuming a probe (use before queueing for a slot)"""
+        with self._lock:
+            if self.state == OPEN and self.retry_after() > 0:
+                raise CircuitOpenError(self.name, self.retry_after())
+
+    def _allow(self):
+        with self._lock:
+            if self.state == OPEN:
+                if self.retry_after() > 0:
+                    raise CircuitOpenError(self.name, self.retry_after())
+                self.state = HALF_OPEN
+                self._probes_in_flight = 0
+                self._probe_successes = 0
+                log.info(f"🟡 {self.name} circuit half-open, probing")
+
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.probes:
+                    raise CircuitOpenError(self.name, 1.0)
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def _record(self, probe, failed, elapsed, neutral=False):
+        """
+        neutral: the call was cut short by the caller's deadline, which says
+        nothing about the provider unless it had already been slow
+        """
+        slow = elapsed > self.slow_call_seconds
+        with self._lock:
+            if probe:
+                self._probes_in_flight -= 1
+                if neutral and not slow:
+                    return
+                if failed or slow:
+                    self._trip("probe failed" if failed else f"probe took {elapsed:.1f}s")
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.probes:
+                        self.state = CLOSED
+                        self._calls.clear()
+                        log.info(f"🟢 {self.name} circuit closed, provider recovered")
+                return
+
+            if self.state != CLOSED or (neutral and not slow):
+                return
+            self._calls.append((failed, slow))
+            if len(self._calls) < self.min_calls:
+                return
+            failures = sum(1 for f, _ in self._calls if f) / len(self._calls)
+            slow_calls = sum(1 for _, s in self._calls if s) / len(self._calls)
+            if failures >= self.failure_rate:
+                self._trip(f"{failures:.0%} of recent calls failed")
+            elif slow_calls >= self.slow_call_rate:
+                self._trip(f"{slow_calls:.0%} of recent calls slower than {self.slow_call_seconds:.0f}s")
+
+    def _trip(self, reason):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        log.warning(f"🔴 {self.name} circuit opened: {reason} (cooling down {self.open_seconds:.0f}s)")
+
+    @contextmanager
+    def guard(self, deadline=None):
+        """
+        Wrap one provider call; raises CircuitOpenError while open.
+        DeadlineExceeded, and any error once `deadline` has run out (a client
+        timeout taken from deadline.timeout()), is the caller's budget, not a
+        provider failure: one client with a tight deadline must not open the
+        breaker for everyone.
+        """
+        probe = self._allow()
+        start = time.monotonic()
+        try:
+            yield
+        except DeadlineExceeded:
+            self._record(probe, False, time.monotonic() - start, neutral=True)
+            raise
+        except Exception:
+            out_of_time = deadline is not None and deadline.remaining() < DEADLINE_SLACK_SECONDS
+            self._record(probe, not out_of_time, time.monotonic() - start, neutral=out_of_time)
+            raise
+        self._record(probe, False, time.monotonic() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "recent_calls": len(self._calls),
+                "recent_failures": sum(1 for f, _ in self._calls if f),
+                "retry_after": round(self.retry_after(), 1) if self.state == OPEN else 0,
+            }
+
+
+# Latency past which a call counts as slow, per provider
+SLOW_CALL_DEFAULTS = {
+    "openai_chat": 20.0,
+    "openai_images": 45.0,
+    "replicate": 120.0,
+}
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """
+    Shared breaker for a provider. Thresholds come from the environment:
+    BREAKER_FAILURE_RATE, BREAKER_OPEN_SECONDS, BREAKER_WINDOW and
+    <PROVIDER>_SLOW_CALL_SECONDS (e.g. REPLICATE_SLOW_CALL_SECONDS).
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            slow = os.getenv(f"{name.upper()}_SLOW_CALL_SECONDS")
+            breaker = CircuitBreaker(
+                name,
+                window=int(os.getenv("BREAKER_WINDOW", "20")),
+                failure_rate=float(os.getenv("BREAKER_FAILURE_RATE", "0.5")),
+                open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", "30")),
+                slow_call_seconds=float(slow) if slow else SLOW_CALL_DEFAULTS[name],
+            )
+            _breakers[name] = breaker
+        return breaker
+
+
+def breaker_states():
+    """Snapshot of every breaker created so far"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
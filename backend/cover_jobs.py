@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from structured_logging import get_logger, submit_with_context
+
+log = get_logger("cover_jobs")
+
+
+class CoverJobs:
+    """
+    Background DALL·E renders. /generate answers with a placeholder cover
+    and clients poll the job until the real artwork replaces it.
+    """
+
+    def __init__(self, max_workers=None, ttl_seconds=None):
+        if max_workers is None:
+            max_workers = int(os.getenv("COVER_WORKERS", "4"))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("COVER_JOB_TTL_SECONDS", "3600"))
+        self.ttl_seconds = ttl_seconds
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cover")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        # on_finish(job) callbacks, run in the render thread once a job settles
+        self._listeners = []
+
+    def start(self, render):
+        """Run render() -> image_url in the background; returns the job id"""
+        self._evict()
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id": job_id,
+            "status": "pending",
+            "image_url": None,
+            "placeholder_url": None,
+            "error": None,
+            "retry_after": None,
+            "created_at": time.time(),
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        # The render logs under the request that started it
+        future = submit_with_context(self._executor, render)
+        job["_future"] = future
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return job_id
+
+    def _finish(self, job_id, future):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            if future.cancelled():
+                job["status"] = "cancelled"
+            elif future.exception() is not None:
+                job["status"] = "failed"
+                job["error"] = str(future.exception())
+                # Set when DALL·E is failing fast behind its circuit breaker
+                job["retry_after"] = getattr(future.exception(), "retry_after", None)
+            else:
+                job["status"] = "ready"
+                job["image_url"] = future.result()
+            view = {k: v for k, v in job.items() if not k.startswith("_")}
+        for listener in self._listeners:
+            try:
+                listener(view)
+            except Exception as e:
+                log.warning(f"⚠️ Cover job listener failed: {e}")
+
+    def on_finish(self, listener):
+        """Call listener(job) whenever a render finishes, fails or is cancelled"""
+        self._listeners.append(listener)
+
+    def set_placeholder(self, job_id, url):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]["placeholder_url"] = url
+
+    def cancel(self, job_id):
+        """Drop a render nobody will look at (only works if it hasn't started)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job["_future"].cancel()
+
+    def get(self, job_id):
+        """Public view of a job, or None if unknown/expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {k: v for k, v in job.items() if not k.startswith("_")}
+
+    def pending(self):
+        """Renders queued or running"""
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j["status"] == "pending")
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            for job_id in [k for k, j in self._jobs.items() if j["created_at"] < cutoff and j["status"] != "pending"]:
+                del self._jobs[job_id]
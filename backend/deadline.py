@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from structured_logging import get_logger, submit_with_context
+
+log = get_logger("deadline")
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage runs out of its share of the request budget"""
+
+
+class Deadline:
+    """
+    Absolute time budget for one /generate request.
+    Stages take a share of whatever is left via stage().
+    """
+
+    def __init__(self, seconds):
+        self.budget = float(seconds)
+        self.expires_at = time.monotonic() + self.budget
+
+    @classmethod
+    def for_request(cls, seconds=None):
+        """Request budget, defaulting to GENERATE_DEADLINE_SECONDS"""
+        if seconds is None:
+            seconds = float(os.getenv("GENERATE_DEADLINE_SECONDS", "150"))
+        return cls(seconds)
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self, stage):
+        if self.expired():
+            raise DeadlineExceeded(f"{stage}: request deadline of {self.budget:.0f}s exceeded")
+
+    def stage(self, fraction):
+        """Child deadline holding `fraction` of the remaining budget"""
+        child = Deadline(0)
+        child.budget = self.remaining() * fraction
+        child.expires_at = time.monotonic() + child.budget
+        return child
+
+    def timeout(self, cap=None):
+        """Remaining seconds, optionally capped, for use as a client timeout"""
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+    def expire(self):
+        """End the budget now, e.g. for a hedge that lost the race"""
+        self.expires_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling latency samples for one stage, used to pick hedge delays"""
+
+    def __init__(self, name, window=200, min_samples=10):
+        self.name = name
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q):
+        """q in [0, 100]; None until enough samples are collected"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self):
+        return {
+            "samples": len(self._samples),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+        }
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def get_tracker(name):
+    with _trackers_lock:
+        tracker = _trackers.get(name)
+        if tracker is None:
+            tracker = _trackers[name] = LatencyTracker(name)
+        return tracker
+
+
+def latency_snapshot():
+    with _trackers_lock:
+        trackers = list(_trackers.values())
+    return {t.name: t.snapshot() for t in trackers}
+
+
+_hedge_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("HEDGE_MAX_WORKERS", "16")),
+    thread_name_prefix="hedge"
+)
+
+
+class HedgedCall:
+    """
+    fn(attempt_deadline) on the hedge pool and, if it is still running past
+    the stage's p95 latency when result() is waiting, one duplicate.
+    Whichever succeeds first wins. Each attempt gets its own deadline; the
+    loser's is expired and, if it hasn't started yet, it is cancelled, so
+    it gives up at its next deadline check instead of holding a worker.
+    """
+
+    def __init__(self, fn, stage, timeout):
+        self.fn = fn
+        self.stage = stage
+        self.timeout = timeout
+        self.tracker = get_tracker(stage)
+        hedge_after = self.tracker.percentile(95)
+        if os.getenv("HEDGING_ENABLED", "1") == "0" or (hedge_after is not None and hedge_after >= timeout):
+            hedge_after = None
+        self.hedge_after = hedge_after
+        self.start = time.monotonic()
+        # Settles with the winner's result, or the last error once every attempt failed
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()
+        self._attempts = []
+        self._error = None
+        # Cancelling a loser runs its done callback on this thread, re-entering _settle
+        self._lock = threading.RLock()
+        self._launch()
+
+    def _launch(self):
+        attempt = Deadline(max(0.0, self.timeout - (time.monotonic() - self.start)))
+        with self._lock:
+            if self.future.done():
+                return
+            future = submit_with_context(_hedge_pool, self.fn, attempt)
+            self._attempts.append((future, attempt))
+        future.add_done_callback(self._settle)
+
+    def _settle(self, future):
+        with self._lock:
+            if self.future.done():
+                return
+            if not future.cancelled() and future.exception() is None:
+                self.tracker.record(time.monotonic() - self.start)
+                self.future.set_result(future.result())
+                self._cancel_others(future)
+                return
+            if not future.cancelled():
+                self._error = future.exception()
+            if all(f.done() for f, _ in self._attempts):
+                self.future.set_exception(self._error or DeadlineExceeded(f"{self.stage} was cancelled"))
+
+    def _cancel_others(self, winner=None):
+        for future, attempt in self._attempts:
+            if future is not winner:
+                attempt.expire()
+                future.cancel()
+
+    def cancel(self):
+        """Give up on every attempt still queued or running"""
+        with self._lock:
+            self._cancel_others()
+
+    def result(self, timeout=None):
+        """
+        Wait up to timeout seconds (default: the whole budget), firing the
+        hedge once past p95. Raises DeadlineExceeded if nothing finished;
+        the attempts keep their own deadlines.
+        """
+        until = self.start + (self.timeout if timeout is None else min(timeout, self.timeout))
+        if self.hedge_after is not None and len(self._attempts) == 1:
+            hedge_at = self.start + self.hedge_after
+            done, _ = wait([self.future], timeout=max(0.0, min(hedge_at, until) - time.monotonic()))
+            if not done and time.monotonic() >= hedge_at:
+                log.info(f"🪞 {self.stage} slower than p95 ({self.hedge_after:.2f}s), firing hedged request")
+                self._launch()
+        done, _ = wait([self.future], timeout=max(0.0, until - time.monotonic()))
+        if not done:
+            raise DeadlineExceeded(f"{self.stage} did not finish within {until - self.start:.1f}s")
+        return self.future.result()
+
+
+def hedged_call(fn, stage, timeout):
+    """
+    HedgedCall(fn, stage, timeout).result(), cancelling the attempts if
+    none finishes in time. fn takes the attempt's Deadline. Raises
+    DeadlineExceeded after `timeout` seconds.
+    """
+    call = HedgedCall(fn, stage, timeout)
+    try:
+        return call.result()
+    except DeadlineExceeded:
+        call.cancel()
+        raise
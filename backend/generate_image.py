@@ -1,7 +1,39 @@
 import os
 import time
-import requests
+import uuid
+import base64
 from datetime import datetime
+from rate_limit import get_limiter, is_rate_limit_error
+from circuit_breaker import CircuitOpenError, get_breaker
+from deadline import DeadlineExceeded, hedged_call
+from keyword_classifier import KeywordClassifier
+from metrics import stage_timer
+import tracing
+from structured_logging import get_logger
+
+log = get_logger("image")
+
+
+# Literal scene per prompt (first match wins) plus the setting cues each scene looks for
+LITERAL_CUES = KeywordClassifier({
+    "scene": [
+        ("dragon battle", ["dragon battle"]),
+        ("tribal", ["tribal drums and flutes"]),
+        ("piano concert", ["piano concert"]),
+        ("jazz saxophone", ["jazz saxophone"]),
+        ("guitar", ["guitar"]),
+        ("violin", ["violin"]),
+        ("electronic", ["electronic", "synthesizer"]),
+        ("harp", ["harp"]),
+        ("orchestra", ["orchestra", "orchestral"]),
+    ],
+    "setting": [
+        (cue, [cue]) for cue in (
+            "temple", "theater", "hall", "concert hall", "nightclub", "campfire",
+            "rock", "cathedral", "futuristic", "forest",
+        )
+    ],
+})
 
 
 class ImageGenerator:
@@ -10,109 +42,155 @@ class ImageGenerator:
     No abstract art, no artistic interpretation - just literal scenes.
     """
 
+    # DALL·E 3 quality tiers; "hd" roughly doubles render time
+    QUALITY_TIERS = ("standard", "hd")
+
+    # Named aspect presets accepted alongside raw "WxH" strings
+    SIZE_PRESETS = {
+        "square": "1024x1024",
+        "landscape": "1792x1024",
+        "portrait": "1024x1792",
+    }
+    # How each preset is described to DALL·E
+    COMPOSITIONS = {
+        "1024x1024": "square composition",
+        "1792x1024": "wide landscape composition",
+        "1024x1792": "tall portrait composition",
+    }
+
+    # Previews use standard quality unless a request asks for HD
+    default_quality = os.getenv("IMAGE_DEFAULT_QUALITY", "standard").strip().lower()
+
     def __init__(self):
-        print("🎨 Initializing LITERAL OpenAI (DALL·E) generator...")
+        log.info("🎨 Initializing LITERAL OpenAI (DALL·E) generator...")
         self._init_openai_client()
+        # b64_json returns the image inline and skips the second download
+        self.response_format = os.getenv("IMAGE_RESPONSE_FORMAT", "b64_json")
+        # Shared DALL·E limits (OPENAI_IMAGES_RPM / _MAX_CONCURRENCY)
+        self._limiter = get_limiter("openai_images")
+        # Fail fast to "no artwork" while DALL·E is degraded
+        self._breaker = get_breaker("openai_images")
 
     def _init_openai_client(self):
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise RuntimeError("❌ OPENAI_API_KEY not found")
 
+        # OPENAI_IMAGES_BASE_URL / OPENAI_BASE_URL point at a compatible server (e.g. mock_providers.py)
+        base_url = os.getenv("OPENAI_IMAGES_BASE_URL") or os.getenv("OPENAI_BASE_URL") or None
         try:
             from openai import OpenAI
-            self._openai_client = OpenAI(api_key=api_key)
+            self._openai_client = OpenAI(api_key=api_key, base_url=base_url)
             self._api_mode = "new"
-            print("✅ OpenAI client initialized")
+            log.info("✅ OpenAI client initialized")
         except ImportError:
             import openai
             openai.api_key = api_key
+            if base_url:
+                openai.api_base = base_url
             self._openai = openai
             self._api_mode = "legacy"
-            print("✅ OpenAI legacy client initialized")
+            log.info("✅ OpenAI legacy client initialized")
 
-    def generate(self, prompt, chaos=0, size=1024):
+    def generate(self, prompt, chaos=0, size=1024, deadline=None, quality=None):
         """
         Generate LITERAL album cover - shows exactly what you describe.
         chaos=0 for maximum literalness
+        size is a pixel count (square), "WxH" or a SIZE_PRESETS name
+        quality is "standard" or "hd" (defaults to IMAGE_DEFAULT_QUALITY)
+        Sizes and qualities DALL·E 3 doesn't offer raise ValueError
+        deadline bounds the render and download when given
         """
+        size = self.resolve_size(size)
+        quality = self.resolve_quality(quality)
         # Force literal interpretation
-        dalle_prompt = self._force_literal_prompt(prompt)
+        dalle_prompt = self._force_literal_prompt(prompt, size)
         
-        print(f"🎭 LITERAL Prompt → {dalle_prompt}")
+        log.debug(f"🎭 LITERAL Prompt ({quality}, {size}) → {dalle_prompt}")
         start = time.time()
 
         try:
+            self._breaker.check()
             if self._api_mode == "new":
-                image_bytes = self._generate_new_api(dalle_prompt, size)
+                image_bytes = self._generate_new_api(dalle_prompt, size, quality, deadline)
             else:
-                image_bytes = self._generate_legacy_api(dalle_prompt, size)
+                image_bytes = self._generate_legacy_api(dalle_prompt, size, quality, deadline)
+        except (CircuitOpenError, DeadlineExceeded):
+            # Callers map these to 503 + Retry-After / 504; keep them recognizable
+            raise
         except Exception as e:
+            if is_rate_limit_error(e):
+                self._limiter.backoff(10)
             raise RuntimeError(f"❌ Generation failed: {e}")
 
         # Save image
         os.makedirs("assets", exist_ok=True)
         ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-        filename = f"assets/literal_{ts}.png"
+        filename = f"assets/literal_{ts}_{uuid.uuid4().hex[:8]}.png"
         
-        with open(filename, "wb") as f:
+        with tracing.span("file_write", bytes=len(image_bytes)), open(filename, "wb") as f:
             f.write(image_bytes)
 
-        print(f"✅ LITERAL image saved → {filename} ({time.time()-start:.2f}s)")
+        log.info(f"✅ LITERAL image saved → {filename} ({time.time()-start:.2f}s)")
         return filename
 
-    def _force_literal_prompt(self, music_prompt):
+    def _force_literal_prompt(self, music_prompt, size="1024x1024"):
         """
         Force DALL-E to create literal scenes, not abstract art.
+        size is the resolved "WxH" the composition is described for.
         """
         # Remove abstract trigger words and force photorealistic scene
         dalle_prompt = "Photorealistic movie scene showing "
         
+        # One scan finds the scene and every setting cue
+        hits = LITERAL_CUES.scan(music_prompt)
+        scene = LITERAL_CUES.label(hits, "scene")
+        
         # Parse the music prompt literally
-        if "dragon battle" in music_prompt.lower():
+        if scene == "dragon battle":
             dalle_prompt += "a large dragon fighting knights in a stone mountain fortress, "
             dalle_prompt += "with a full symphony orchestra playing instruments in the background, "
             
-        elif "tribal drums and flutes" in music_prompt.lower():
+        elif scene == "tribal":
             dalle_prompt += "actual wooden tribal drums and bamboo flutes "
-            if "temple" in music_prompt.lower():
+            if "temple" in hits:
                 dalle_prompt += "inside an ancient stone temple with carved pillars, "
                 
-        elif "piano concert" in music_prompt.lower():
+        elif scene == "piano concert":
             dalle_prompt += "a grand piano with a pianist performing "
-            if "theater" in music_prompt.lower() or "hall" in music_prompt.lower():
+            if "theater" in hits or "hall" in hits:
                 dalle_prompt += "on stage in an elegant concert hall with audience, "
                 
-        elif "jazz saxophone" in music_prompt.lower():
+        elif scene == "jazz saxophone":
             dalle_prompt += "a saxophone player performing "
-            if "nightclub" in music_prompt.lower():
+            if "nightclub" in hits:
                 dalle_prompt += "in a dimly lit jazz club with tables and smoke, "
                 
-        elif "guitar" in music_prompt.lower():
+        elif scene == "guitar":
             dalle_prompt += "a person playing guitar "
-            if "campfire" in music_prompt.lower():
+            if "campfire" in hits:
                 dalle_prompt += "around a campfire under starry night sky, "
-            elif "rock" in music_prompt.lower():
+            elif "rock" in hits:
                 dalle_prompt += "on a concert stage with amplifiers and lights, "
                 
-        elif "violin" in music_prompt.lower():
+        elif scene == "violin":
             dalle_prompt += "a violinist playing violin "
-            if "cathedral" in music_prompt.lower():
+            if "cathedral" in hits:
                 dalle_prompt += "inside a gothic cathedral with stained glass windows, "
                 
-        elif "electronic" in music_prompt.lower() or "synthesizer" in music_prompt.lower():
+        elif scene == "electronic":
             dalle_prompt += "electronic synthesizer keyboards and DJ equipment "
-            if "futuristic" in music_prompt.lower():
+            if "futuristic" in hits:
                 dalle_prompt += "in a high-tech studio with neon lights, "
                 
-        elif "harp" in music_prompt.lower():
+        elif scene == "harp":
             dalle_prompt += "a large golden harp being played "
-            if "forest" in music_prompt.lower():
+            if "forest" in hits:
                 dalle_prompt += "in a sunlit forest clearing with trees, "
                 
-        elif "orchestra" in music_prompt.lower():
+        elif scene == "orchestra":
             dalle_prompt += "a full symphony orchestra with musicians playing various instruments "
-            if "concert hall" in music_prompt.lower():
+            if "concert hall" in hits:
                 dalle_prompt += "on stage in an elegant concert hall, "
                 
         else:
@@ -122,40 +200,96 @@ class ImageGenerator:
         # Force photorealistic style, prevent abstract art
         dalle_prompt += "cinematic lighting, detailed and realistic, "
         dalle_prompt += "NOT abstract art, NOT artistic interpretation, "
-        dalle_prompt += "photorealistic movie scene style, album cover format, square composition"
+        dalle_prompt += f"photorealistic movie scene style, album cover format, {self.COMPOSITIONS[size]}"
         
         return dalle_prompt
 
-    def _generate_new_api(self, prompt, size):
+    @classmethod
+    def resolve_size(cls, size):
+        """
+        Normalize a size argument to the "WxH" string the API expects;
+        ValueError for anything DALL·E 3 can't render
+        """
+        if isinstance(size, int) and not isinstance(size, bool):
+            size = f"{size}x{size}"
+        size = str(size or "square").strip().lower()
+        size = cls.SIZE_PRESETS.get(size, size)
+        if size not in cls.SIZE_PRESETS.values():
+            raise ValueError(
+                f"image_size must be one of {', '.join(cls.SIZE_PRESETS)} or {', '.join(cls.SIZE_PRESETS.values())}"
+            )
+        return size
+
+    @classmethod
+    def resolve_quality(cls, quality):
+        """Normalize a quality tier (None = IMAGE_DEFAULT_QUALITY); ValueError for unknown tiers"""
+        quality = str(quality or cls.default_quality).strip().lower()
+        if quality not in cls.QUALITY_TIERS:
+            raise ValueError(f"image_quality must be one of {', '.join(cls.QUALITY_TIERS)}")
+        return quality
+
+    def _generate_new_api(self, prompt, size, quality, deadline=None):
         """New OpenAI API"""
-        response = self._openai_client.images.generate(
-            model="dall-e-3",
-            prompt=prompt,
-            size=f"{size}x{size}",
-            quality="hd",
-            n=1,
-        )
+        timeout = deadline.timeout() if deadline else 120.0
+        with stage_timer("image_render"), self._limiter.slot(timeout=timeout), self._breaker.guard(deadline):
+            response = self._openai_client.images.generate(
+                model="dall-e-3",
+                prompt=prompt,
+                size=size,
+                quality=quality,
+                n=1,
+                response_format=self.response_format,
+                timeout=timeout,
+            )
         
-        image_url = response.data[0].url
-        img_response = requests.get(image_url, timeout=60)
-        img_response.raise_for_status()
-        return img_response.content
+        image = response.data[0]
+        if getattr(image, "b64_json", None):
+            return base64.b64decode(image.b64_json)
+        return self._download_image(image.url, deadline)
 
-    def _generate_legacy_api(self, prompt, size):
+    def _generate_legacy_api(self, prompt, size, quality, deadline=None):
         """Legacy OpenAI API"""
-        response = self._openai.Image.create(
-            prompt=prompt,
-            model="dall-e-3",
-            n=1,
-            size=f"{size}x{size}",
-            quality="hd"
-        )
+        timeout = deadline.timeout() if deadline else 120.0
+        with stage_timer("image_render"), self._limiter.slot(timeout=timeout), self._breaker.guard(deadline):
+            response = self._openai.Image.create(
+                prompt=prompt,
+                model="dall-e-3",
+                n=1,
+                size=size,
+                quality=quality,
+                response_format=self.response_format,
+                request_timeout=timeout
+            )
         
-        image_url = response['data'][0]['url']
-        img_response = requests.get(image_url, timeout=60)
-        img_response.raise_for_status()
-        return img_response.content
+        image = response['data'][0]
+        if image.get('b64_json'):
+            return base64.b64decode(image['b64_json'])
+        return self._download_image(image['url'], deadline)
+
+    def _download_image(self, image_url, deadline=None):
+        """Fetch the rendered image, hedging the download if it stalls"""
+        # Only url responses need it; the b64_json default never downloads
+        import requests
+
+        timeout = deadline.timeout(cap=60) if deadline else 60.0
+
+        def fetch(attempt):
+            attempt.check("image_download")
+            img_response = requests.get(image_url, timeout=attempt.timeout())
+            img_response.raise_for_status()
+            return img_response.content
+
+        with stage_timer("image_download"):
+            return hedged_call(fetch, "image_download", timeout)
+
 
+# A bad IMAGE_DEFAULT_QUALITY would fail validation on every request that
+# doesn't pick a quality; refuse to start instead
+if ImageGenerator.default_quality not in ImageGenerator.QUALITY_TIERS:
+    raise ValueError(
+        f"IMAGE_DEFAULT_QUALITY must be one of {', '.join(ImageGenerator.QUALITY_TIERS)}, "
+        f"got {ImageGenerator.default_quality!r}"
+    )
 
 def test_literal_prompts():
     """Test with problematic prompts"""
@@ -1,28 +1,192 @@
 import os
 import random
 import re
+import threading
+import time
 from datetime import datetime
+from rate_limit import get_limiter, is_rate_limit_error
+from circuit_breaker import get_breaker
+from deadline import DeadlineExceeded, HedgedCall
+from keyword_classifier import KeywordClassifier
+from lyrics_variants import LyricsVariantCache
+from lyrics_document import build_lyrics_document
+from lyrics_engine import get_engine
+from metrics import FALLBACKS, STAGE_SECONDS, cache_result, stage_timer
+from structured_logging import get_logger
+import tracing
+
+log = get_logger("lyrics")
+
+
+# Keyword rules per dimension, in priority order (first matching label wins).
+# prompt_* dimensions look at the prompt only, content_* at lyrics + prompt.
+LYRICS_KEYWORD_RULES = {
+    "prompt_genre": [
+        ("jazz", ["jazz", "blues", "saxophone"]),
+        ("rock", ["rock", "metal", "guitar"]),
+        ("electronic", ["electronic", "edm", "synth"]),
+        ("pop", ["pop", "catchy", "mainstream"]),
+        ("classical", ["classical", "orchestral", "piano"]),
+        ("hip-hop", ["hip hop", "rap", "urban"]),
+    ],
+    "prompt_mood": [
+        ("calm", ["calm", "chill", "peaceful", "study"]),
+        ("happy", ["happy", "joyful", "upbeat"]),
+        ("sad", ["sad", "melancholy", "emotional"]),
+        ("energetic", ["energetic", "intense", "powerful"]),
+        ("romantic", ["romantic", "love", "tender"]),
+    ],
+    "prompt_theme": [
+        ("love", ["love", "romantic", "heart"]),
+        ("dreams", ["dream", "future", "hope"]),
+        ("calm", ["calm", "chill", "study", "peaceful"]),
+        ("life", ["life", "living", "experience"]),
+    ],
+    "content_theme": [
+        ("love", ["love", "heart", "forever", "together", "romance"]),
+        ("dreams", ["dream", "hope", "future", "tomorrow", "aspire"]),
+        ("freedom", ["free", "escape", "liberty", "break", "fly"]),
+        ("life", ["life", "living", "moment", "time", "experience"]),
+        ("calm", ["peace", "quiet", "serene", "tranquil", "gentle"]),
+    ],
+    "content_mood": [
+        ("calm", ["calm", "peace", "quiet", "gentle", "serene", "study", "chill"]),
+        ("happy", ["happy", "joy", "bright", "celebrate", "smile"]),
+        ("sad", ["sad", "melancholy", "tears", "lonely", "empty"]),
+        ("energetic", ["energy", "power", "strong", "intense", "electric"]),
+        ("romantic", ["love", "heart", "tender", "sweet", "romantic"]),
+    ],
+}
+
+LYRICS_CLASSIFIER = KeywordClassifier(LYRICS_KEYWORD_RULES, defaults={
+    "prompt_genre": "indie",
+    "prompt_mood": "balanced",
+    "prompt_theme": "life",
+    "content_theme": "life",
+    "content_mood": "balanced",
+})
+
+# Lyric budget per song_length tier: completion token cap, section layout
+# and line count. Short fits a 15s clip and comes back in a fraction of
+# the time of a full song.
+SONG_LENGTHS = {
+    "short": {
+        "max_tokens": 200,
+        "structure": ["Verse 1", "Chorus"],
+        "lines": "8 lines total, 4 per section",
+    },
+    "medium": {
+        "max_tokens": 450,
+        "structure": ["Verse 1", "Chorus", "Verse 2", "Chorus", "Bridge", "Chorus"],
+        "lines": "4 lines per section",
+    },
+    "long": {
+        "max_tokens": 700,
+        "structure": ["Verse 1", "Chorus", "Verse 2", "Chorus", "Verse 3", "Bridge", "Chorus", "Outro"],
+        "lines": "4 lines per section, 2 for the outro",
+    },
+}
+
+DEFAULT_SONG_LENGTH = "medium"
+
+# Built once; only the user message changes between calls
+SYSTEM_PROMPT = """You are a professional songwriter and lyricist who has written hits for major artists.
+Write memorable, singable, radio-friendly lyrics with emotional depth, a catchy repeatable chorus and rhyme schemes that work.
+Output only the song: a "# Song Title" line, then each section under its [Label] (e.g. [Verse 1], [Chorus]) with one lyric line per line.
+Follow the requested sections and line counts exactly."""
+
+
+def resolve_song_length(song_length=None):
+    """Normalize a song_length value; DEFAULT_SONG_LENGTH when it's omitted"""
+    if not song_length:
+        return DEFAULT_SONG_LENGTH
+    tier = str(song_length).strip().lower()
+    if tier not in SONG_LENGTHS:
+        raise ValueError(f"song_length must be one of {', '.join(SONG_LENGTHS)}")
+    return tier
+
+
+def build_user_prompt(enhanced_prompt, song_length):
+    """Per-request instructions: the prompt plus the tier's structure"""
+    spec = SONG_LENGTHS[song_length]
+    sections = ", ".join(f"[{label}]" for label in spec["structure"])
+    return (
+        f'Write song lyrics for: "{enhanced_prompt}"\n'
+        f"Sections, in order: {sections}\n"
+        f"Length: {spec['lines']}. Give it a compelling title that fits the theme."
+    )
+
+
+def build_album_prompt(album_prompt, track_prompts, song_length):
+    """One request for every track of an album, so the prompt is paid once"""
+    spec = SONG_LENGTHS[song_length]
+    sections = ", ".join(f"[{label}]" for label in spec["structure"])
+    tracks = "\n".join(f"{i}. {p}" for i, p in enumerate(track_prompts, 1))
+    return (
+        f'Write an album of {len(track_prompts)} songs for: "{album_prompt}". '
+        f"They share one theme, voice and imagery but each tells its own part.\n"
+        f'First line: "Album: <album title>". Then every song in this order:\n{tracks}\n'
+        f"Each song starts with its own \"# Song Title\" line. Sections, in order: {sections}\n"
+        f"Length: {spec['lines']} per song."
+    )
+
 
 class LyricsGenerator:
     def __init__(self):
-        print("🎤 Initializing OpenAI-powered Lyrics Generator...")
+        log.info("🎤 Initializing OpenAI-powered Lyrics Generator...")
+        
+        # OpenAI client, created on first use (see client): without a key the
+        # local engine still writes lyrics
+        self._client = None
+        self._client_lock = threading.Lock()
+        
+        # Shared OpenAI chat limits (OPENAI_CHAT_RPM / _TPM / _MAX_CONCURRENCY)
+        self.limiter = get_limiter("openai_chat")
+        # Skip straight to the synthetic fallback while OpenAI is degraded
+        self.breaker = get_breaker("openai_chat")
+        
+        # Token spend and completion latency per song_length tier
+        self._usage = {
+            tier: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency_seconds": 0.0}
+            for tier in SONG_LENGTHS
+        }
+        self._usage_lock = threading.Lock()
         
-        # Initialize OpenAI client (new API)
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            print("❌ OPENAI_API_KEY not found in environment variables!")
-            raise ValueError("OpenAI API key is required")
+        # Choices per /generate completion. Spares cost tokens most users never
+        # use, so they are only fetched once someone asks for new lyrics:
+        # a regenerate miss asks for LYRICS_REGENERATE_VARIANTS and caches the rest
+        self.variants = int(os.getenv("LYRICS_VARIANTS", "1"))
+        self.regenerate_variants = int(os.getenv("LYRICS_REGENERATE_VARIANTS", "3"))
+        self.variant_cache = LyricsVariantCache()
         
-        try:
-            from openai import OpenAI
-            self.client = OpenAI(api_key=api_key)
-            print("✅ OpenAI client initialized (new API)")
-        except Exception as e:
-            print(f"❌ Failed to initialize OpenAI client: {e}")
-            raise
+        # Offline lyrics engine (corpus loads on first use): fallback, and a
+        # hedge when OpenAI takes longer than LYRICS_LOCAL_HEDGE_SECONDS (0 = off)
+        self.local_engine = get_engine()
+        self.local_hedge_seconds = float(os.getenv("LYRICS_LOCAL_HEDGE_SECONDS", "15"))
         
         self.load_synthetic_data_patterns()
 
+    @property
+    def client(self):
+        """OpenAI chat client; raises ValueError while OPENAI_API_KEY is unset"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._init_openai_client()
+        return self._client
+
+    def _init_openai_client(self):
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OpenAI API key is required (OPENAI_API_KEY)")
+        
+        from openai import OpenAI
+        # OPENAI_CHAT_BASE_URL / OPENAI_BASE_URL point at a compatible server (e.g. mock_providers.py)
+        base_url = os.getenv("OPENAI_CHAT_BASE_URL") or os.getenv("OPENAI_BASE_URL") or None
+        client = OpenAI(api_key=api_key, base_url=base_url)
+        log.info(f"✅ OpenAI client initialized (new API{', ' + base_url if base_url else ''})")
+        return client
+
     def load_synthetic_data_patterns(self):
         """Load synthetic data generation patterns for lyrics enhancement"""
         self.genre_styles = {
@@ -52,9 +216,10 @@ class LyricsGenerator:
 
     def generate_synthetic_prompt_variations(self, original_prompt):
         """Generate enhanced prompt variations using synthetic data techniques"""
-        detected_genre = self.detect_genre_from_prompt(original_prompt)
-        detected_mood = self.detect_mood_from_prompt(original_prompt)
-        detected_theme = self.extract_theme_from_prompt(original_prompt)
+        analysis = self.analyze_prompt(original_prompt)
+        detected_genre = analysis["genre"]
+        detected_mood = analysis["mood"]
+        detected_theme = analysis["theme"]
         
         variations = []
         
@@ -89,174 +254,284 @@ class LyricsGenerator:
         
         return variations
 
-    def generate_lyrics(self, prompt, song_length="medium"):
-        """Generate professional lyrics using OpenAI GPT-4 with synthetic data enhancement"""
-        print(f"🎤 Generating professional lyrics for: '{prompt}'")
+    def generate_lyrics(self, prompt, song_length="medium", deadline=None, variants=None):
+        """
+        Generate professional lyrics using OpenAI GPT-4 with synthetic data enhancement.
+        deadline bounds the completion call (and its hedge) when given.
+        variants > 1 asks for that many choices in the same completion; the
+        first is returned and the rest are cached for regenerate_lyrics().
+        """
+        log.info(f"🎤 Generating professional lyrics for: '{prompt}'")
         
         # Generate synthetic prompt variations for better results
         prompt_variations = self.generate_synthetic_prompt_variations(prompt)
         enhanced_prompt = random.choice(prompt_variations)
         
-        print(f"✨ Using enhanced prompt variation: '{enhanced_prompt}'")
+        log.debug(f"✨ Using enhanced prompt variation: '{enhanced_prompt}'")
+        
+        tier = resolve_song_length(song_length)
+        spec = SONG_LENGTHS[tier]
+        n = max(1, int(variants if variants is not None else self.variants))
         
         try:
-            # Create comprehensive prompt for OpenAI
-            system_prompt = """You are a professional songwriter and lyricist who has written hits for major artists. 
-            Create complete song lyrics with proper structure including verses, chorus, and bridge.
-            
-            Requirements:
-            - Use proper song structure with [Verse 1], [Chorus], [Bridge] labels
-            - Create memorable, singable lyrics with good rhythm
-            - Include emotional depth and storytelling
-            - Make the chorus catchy and repeatable
-            - Ensure rhyme schemes work well
-            - Keep it radio-friendly and commercially viable
-            
-            Format example:
-            # Song Title
+            user_prompt = build_user_prompt(enhanced_prompt, tier)
             
-            [Verse 1]
-            Line 1 of verse
-            Line 2 of verse
-            Line 3 of verse
-            Line 4 of verse
+            # Reserve prompt (~4 chars per token) + completion tokens up front
+            max_tokens = spec["max_tokens"]
+            # The prompt is billed once however many choices come back
+            estimated_tokens = (len(SYSTEM_PROMPT) + len(user_prompt)) // 4 + max_tokens * n
             
-            [Chorus]
-            Chorus line 1
-            Chorus line 2
-            Chorus line 3
-            Chorus line 4"""
-            
-            user_prompt = f"""Write complete song lyrics for: "{enhanced_prompt}"
-            
-            Create a song that captures the essence of this prompt with:
-            - A compelling title that fits the theme
-            - 2-3 verses that tell a story
-            - A memorable chorus that people will sing along to
-            - A bridge that adds depth or a new perspective
-            - Appropriate mood and emotion for the theme
+            messages = [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ]
+            timeout = deadline.timeout() if deadline else 60.0
             
-            Make it professional quality, like something you'd hear on Spotify or Apple Music."""
-
-            # Use new OpenAI API
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=600,
-                temperature=0.8,
-                presence_penalty=0.3,
-                frequency_penalty=0.3
+            # Completions are cheap: a duplicate is hedged when the first one is
+            # slow. Each attempt runs on the shared hedge pool under its own deadline.
+            start = time.time()
+            call = HedgedCall(
+                lambda attempt: self._request_completion(
+                    messages, max_tokens, estimated_tokens, attempt.timeout(), n, attempt
+                ),
+                "lyrics_completion",
+                timeout
             )
             
-            full_lyrics = response.choices[0].message.content.strip()
-            print("✅ OpenAI generated high-quality lyrics!")
+            # The local engine answers in milliseconds: if OpenAI is slower than
+            # the hedge delay, ship local lyrics and keep OpenAI's for regenerate
+            hedge_after = self.local_hedge_seconds
+            try:
+                with stage_timer("lyrics_completion"):
+                    response = call.result(hedge_after if hedge_after and hedge_after < timeout else None)
+            except DeadlineExceeded:
+                # Out of budget (or the call itself gave up), not just slower than the local hedge
+                if call.future.done() or not (hedge_after and hedge_after < timeout):
+                    call.cancel()
+                    raise
+                log.info(f"🪞 OpenAI lyrics slower than {hedge_after:.1f}s, answering with local lyrics")
+                call.future.add_done_callback(lambda f: self._cache_late_variants(prompt, tier, f, start))
+                FALLBACKS.inc("lyrics_hedge")
+                return dict(self.generate_local_lyrics(prompt, tier), hedged=True)
             
-            # Parse the generated lyrics
-            parsed_data = self.parse_openai_lyrics(full_lyrics, prompt)
-            
-            return parsed_data
+            parsed = self._parse_variants(prompt, tier, response, time.time() - start)
+            self.variant_cache.put(self.variant_cache.key(prompt, tier), parsed[1:])
+            return parsed[0]
             
         except Exception as e:
-            print(f"❌ OpenAI lyrics generation failed: {e}")
-            print("🔄 Attempting synthetic data recovery...")
-            return self.generate_synthetic_lyrics_fallback(prompt)
+            log.warning(f"❌ OpenAI lyrics generation failed: {e}")
+            log.info("🔄 Falling back to the local lyrics engine...")
+            FALLBACKS.inc("lyrics_local")
+            return self.generate_synthetic_lyrics_fallback(prompt, tier)
 
-    def generate_synthetic_lyrics_fallback(self, prompt):
-        """Generate lyrics using synthetic data techniques when API fails"""
-        print("🔄 Generating synthetic data-based lyrics...")
-        
-        # Analyze prompt for synthetic data generation
-        detected_genre = self.detect_genre_from_prompt(prompt)
-        detected_mood = self.detect_mood_from_prompt(prompt)
-        detected_theme = self.extract_theme_from_prompt(prompt)
-        
-        # Generate synthetic title using detected characteristics
-        genre_words = self.genre_styles.get(detected_genre, ["musical"])
-        mood_words = self.mood_descriptors.get(detected_mood, ["emotional"])
-        theme_words = self.theme_contexts.get(detected_theme, ["expressive"])
-        
-        title_components = [
-            random.choice(genre_words).title(),
-            random.choice(theme_words).title().split()[0],
-            random.choice(mood_words).title()
-        ]
-        synthetic_title = " ".join(title_components[:2])
-        
-        # Generate synthetic lyrics structure
-        verse_themes = self.generate_synthetic_verse_themes(detected_theme, detected_mood)
-        chorus_theme = self.generate_synthetic_chorus_theme(detected_theme, detected_mood)
-        bridge_theme = self.generate_synthetic_bridge_theme(detected_theme)
-        
-        synthetic_lyrics = f"""# {synthetic_title}
+    def _parse_variants(self, prompt, tier, response, elapsed):
+        """Record usage and parse every choice of a completion; returns the parsed variants"""
+        usage = self._record_usage(tier, response, elapsed)
+        
+        log.info(f"✅ OpenAI generated high-quality lyrics! ({tier}, {len(response.choices)} variant(s), "
+              f"{usage['completion_tokens']} tokens, {usage['latency_ms']}ms)")
+        
+        # Parse every choice; the caller keeps the spares for "regenerate lyrics"
+        with tracing.span("lyrics_parse", variants=len(response.choices)):
+            parsed = self.parse_openai_variants(response, prompt)
+        for variant in parsed:
+            variant["song_length"] = tier
+        parsed[0]["usage"] = usage
+        return parsed
 
-[Verse 1]
-{verse_themes[0]}
+    def _cache_late_variants(self, prompt, tier, future, start):
+        """OpenAI lost the race to the local engine; its lyrics become regenerate variants"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        elapsed = time.time() - start
+        STAGE_SECONDS.observe("lyrics_completion", value=elapsed)
+        self.variant_cache.put(self.variant_cache.key(prompt, tier), self._parse_variants(prompt, tier, future.result(), elapsed))
 
-[Chorus]
-{chorus_theme}
-
-[Verse 2]
-{verse_themes[1] if len(verse_themes) > 1 else verse_themes[0]}
+    def generate_album_lyrics(self, album_prompt, track_prompts, song_length="medium", deadline=None):
+        """
+        Lyrics for every track of an album from a single completion.
+        Returns (album_title, [lyrics_data per track], completions made);
+        tracks the model skipped, or all of them if the call fails or the
+        breaker is open, come from the local engine.
+        """
+        tier = resolve_song_length(song_length)
+        spec = SONG_LENGTHS[tier]
+        log.info(f"💿 Writing {len(track_prompts)} album tracks in one completion for: '{album_prompt}'")
+        
+        album_title = None
+        songs = []
+        completions = 0
+        try:
+            user_prompt = build_album_prompt(album_prompt, track_prompts, tier)
+            max_tokens = spec["max_tokens"] * len(track_prompts) + 20
+            estimated_tokens = (len(SYSTEM_PROMPT) + len(user_prompt)) // 4 + max_tokens
+            messages = [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ]
+            timeout = deadline.timeout() if deadline else 90.0
+            
+            start = time.time()
+            with stage_timer("lyrics_completion"):
+                response = self._request_completion(messages, max_tokens, estimated_tokens, timeout, deadline=deadline)
+            completions = 1
+            usage = self._record_usage(tier, response, time.time() - start)
+            log.info(f"✅ Album lyrics written ({usage['completion_tokens']} tokens, {usage['latency_ms']}ms)")
+            
+            album_title, songs = self.split_album_lyrics(response.choices[0].message.content or "")
+        except Exception as e:
+            log.warning(f"❌ Album lyrics completion failed: {e}")
+        
+        tracks = []
+        for i, track_prompt in enumerate(track_prompts):
+            if i < len(songs):
+                lyrics_data = self.parse_openai_lyrics(songs[i], track_prompt)
+                lyrics_data["song_length"] = tier
+            else:
+                FALLBACKS.inc("album_local_track")
+                lyrics_data = self.generate_local_lyrics(track_prompt, tier)
+            tracks.append(lyrics_data)
+        
+        return album_title or tracks[0]["title"], tracks, completions
 
-[Chorus]
-{chorus_theme}
+    @staticmethod
+    def split_album_lyrics(text):
+        """("Album: X" title or None, [song text, ...]) split on "# Title" lines"""
+        album_title = None
+        songs = []
+        for line in text.strip().split("\n"):
+            stripped = line.strip()
+            if album_title is None and not songs and stripped.lower().startswith("album:"):
+                album_title = stripped.split(":", 1)[1].strip().strip('"') or None
+            elif stripped.startswith("# "):
+                songs.append(stripped)
+            elif songs:
+                songs[-1] += "\n" + line
+        return album_title, [song.strip() for song in songs]
 
-[Bridge]
-{bridge_theme}
+    def regenerate_lyrics(self, prompt, song_length="medium", deadline=None):
+        """
+        Another take on the same prompt: a cached spare variant when there
+        is one (no API call), otherwise a new completion with
+        LYRICS_REGENERATE_VARIANTS choices whose spares serve the next clicks.
+        """
+        tier = resolve_song_length(song_length)
+        variant = self.variant_cache.take(self.variant_cache.key(prompt, tier))
+        cache_result("lyrics_variant", variant is not None)
+        if variant is not None:
+            log.info(f"♻️ Serving cached lyrics variant for: '{prompt}'")
+            return dict(variant, cached=True)
+        lyrics_data = self.generate_lyrics(prompt, tier, deadline=deadline, variants=self.regenerate_variants)
+        return dict(lyrics_data, cached=False)
 
-[Chorus]
-{chorus_theme}"""
+    def _request_completion(self, messages, max_tokens, estimated_tokens, timeout, n=1, deadline=None):
+        """
+        One rate-limited, breaker-guarded chat completion call. deadline is
+        the budget timeout came from, so running out of it isn't held
+        against OpenAI.
+        """
+        try:
+            if deadline is not None:
+                # A hedge that already lost the race stops before taking a slot
+                deadline.check("lyrics_completion")
+            self.breaker.check()
+            client = self.client
+            with self.limiter.slot(tokens=estimated_tokens, timeout=timeout) as reserved_tokens, self.breaker.guard(deadline):
+                response = client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    n=n,
+                    temperature=0.8,
+                    presence_penalty=0.3,
+                    frequency_penalty=0.3,
+                    timeout=timeout
+                )
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self.limiter.backoff(5)
+            raise
+        
+        usage = getattr(response, "usage", None)
+        self.limiter.settle(reserved_tokens, getattr(usage, "total_tokens", None))
+        return response
 
+    def _record_usage(self, tier, response, elapsed):
+        """Add one completion's tokens and latency to the per-tier totals"""
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        with self._usage_lock:
+            totals = self._usage[tier]
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["latency_seconds"] += elapsed
         return {
-            "title": synthetic_title,
-            "lyrics": synthetic_lyrics,
-            "theme": detected_theme,
-            "genre": detected_genre,
-            "mood": detected_mood,
-            "source": "synthetic_data"
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_ms": int(elapsed * 1000),
         }
 
-    def generate_synthetic_verse_themes(self, theme, mood):
-        """Generate synthetic verse content based on theme and mood"""
-        synthetic_verses = {
-            "love": [
-                "Every moment with you feels like a dream come true\nIn your eyes I see the future that we're walking to\nTime moves differently when you're by my side\nIn this feeling I can't hide",
-                "Through the storms and sunny days we'll find our way\nEvery challenge that we face just makes us stronger every day\nHand in hand we'll write our story in the stars\nNothing can keep us apart"
-            ],
-            "dreams": [
-                "Looking up at the endless sky I see my path\nEvery step I take today will be worth the aftermath\nThe future's calling out my name with crystal clarity\nI'm ready for this journey",
-                "Mountains high and oceans wide won't slow me down\nEvery obstacle I face becomes my solid ground\nWith determination burning bright inside my soul\nI'm moving toward my goal"
-            ],
-            "life": [
-                "Every sunrise brings a chance to start anew\nEvery lesson learned becomes a part of what I do\nIn the rhythm of the days I find my pace\nLiving in this space",
-                "Through the laughter and the tears I grow each day\nEvery moment teaches me there's always another way\nIn the simple things I find the greatest joy\nNothing can destroy"
-            ]
-        }
-        
-        return synthetic_verses.get(theme, synthetic_verses["life"])
+    def usage_snapshot(self):
+        """Per-tier token spend and average completion latency"""
+        with self._usage_lock:
+            snapshot = {}
+            for tier, totals in self._usage.items():
+                calls = totals["calls"]
+                snapshot[tier] = {
+                    "calls": calls,
+                    "max_tokens": SONG_LENGTHS[tier]["max_tokens"],
+                    "prompt_tokens": totals["prompt_tokens"],
+                    "completion_tokens": totals["completion_tokens"],
+                    "avg_completion_tokens": round(totals["completion_tokens"] / calls, 1) if calls else None,
+                    "avg_latency_ms": int(totals["latency_seconds"] / calls * 1000) if calls else None,
+                }
+            return snapshot
 
-    def generate_synthetic_chorus_theme(self, theme, mood):
-        """Generate synthetic chorus content"""
-        synthetic_choruses = {
-            "love": "This is our moment, this is our time\nEvery heartbeat tells me that you're mine\nNothing else matters when we're together\nWe'll face whatever, now and forever",
-            "dreams": "I'm reaching higher than I've ever been before\nEvery dream I chase just opens up another door\nNothing's gonna stop me from becoming who I'm meant to be\nThis is my destiny",
-            "life": "Every day's a gift, every breath's a chance\nTo live with purpose, to join the dance\nOf life and love and everything between\nLiving in the scene"
-        }
-        
-        return synthetic_choruses.get(theme, synthetic_choruses["life"])
+    def generate_local_lyrics(self, prompt, song_length="medium", seed=None):
+        """Structured lyrics from the offline Markov engine, no API call"""
+        with tracing.span("lyrics_local", song_length=song_length):
+            return self._generate_local_lyrics(prompt, song_length, seed)
 
-    def generate_synthetic_bridge_theme(self, theme):
-        """Generate synthetic bridge content"""
-        synthetic_bridges = {
-            "love": "When the world gets complicated\nAnd everything feels jaded\nYour love reminds me who I am\nThis is where I take my stand",
-            "dreams": "Sometimes the path gets unclear\nSometimes I'm filled with fear\nBut deep inside I know it's true\nThere's nothing I can't do",
-            "life": "In the quiet moments when I reflect\nOn all the ways that I connect\nWith the beauty that surrounds us all\nI hear the call"
-        }
+    def _generate_local_lyrics(self, prompt, song_length, seed):
+        start = time.time()
+        analysis = self.analyze_prompt(prompt)
+        tier = resolve_song_length(song_length)
+        
+        title, lyrics = self.local_engine.generate_song(
+            SONG_LENGTHS[tier]["structure"], theme=analysis["theme"], mood=analysis["mood"], seed=seed
+        )
+        # Theme and mood are re-read from what was actually written
+        content = self.analyze_lyrics(lyrics, prompt)
+        log.info(f"📝 Local lyrics engine wrote '{title}' ({(time.time()-start)*1000:.1f}ms)")
         
-        return synthetic_bridges.get(theme, synthetic_bridges["life"])
+        return {
+            "title": title,
+            "lyrics": lyrics,
+            "document": build_lyrics_document(lyrics),
+            "theme": content["theme"],
+            "genre": analysis["genre"],
+            "mood": content["mood"],
+            "source": "local_markov",
+            "song_length": tier
+        }
+
+    def generate_synthetic_lyrics_fallback(self, prompt, song_length="medium"):
+        """Lyrics when the API fails or the breaker is open"""
+        log.info("🔄 Generating lyrics with the local engine...")
+        return self.generate_local_lyrics(prompt, song_length)
+
+    def parse_openai_variants(self, response, original_prompt):
+        """Parse every non-empty choice of a completion into a list of lyrics"""
+        variants = []
+        for choice in response.choices:
+            full_lyrics = (choice.message.content or "").strip()
+            if full_lyrics:
+                variants.append(self.parse_openai_lyrics(full_lyrics, original_prompt))
+        if not variants:
+            raise ValueError("OpenAI returned no lyrics")
+        return variants
 
     def parse_openai_lyrics(self, full_lyrics, original_prompt):
         """Parse OpenAI-generated lyrics into structured format"""
@@ -276,106 +551,57 @@ class LyricsGenerator:
             title = title[:50].strip()
         
         # Detect theme, genre, mood from the generated content and original prompt
-        theme = self.detect_theme_from_lyrics(full_lyrics, original_prompt)
+        content = self.analyze_lyrics(full_lyrics, original_prompt)
+        theme = content["theme"]
         genre = self.detect_genre_from_prompt(original_prompt)
-        mood = self.detect_mood_from_lyrics(full_lyrics, original_prompt)
+        mood = content["mood"]
         
         return {
             "title": title,
             "lyrics": full_lyrics,
+            "document": build_lyrics_document(full_lyrics),
             "theme": theme,
             "genre": genre,
             "mood": mood,
             "source": "openai_gpt4"
         }
 
+    def analyze_prompt(self, prompt):
+        """Genre, mood and theme of a prompt from one classifier scan"""
+        hits = LYRICS_CLASSIFIER.scan(prompt)
+        return {
+            "genre": LYRICS_CLASSIFIER.label(hits, "prompt_genre"),
+            "mood": LYRICS_CLASSIFIER.label(hits, "prompt_mood"),
+            "theme": LYRICS_CLASSIFIER.label(hits, "prompt_theme"),
+        }
+
+    def analyze_lyrics(self, lyrics, prompt):
+        """Theme and mood of generated lyrics plus prompt, one scan each"""
+        hits = LYRICS_CLASSIFIER.scan(lyrics) | LYRICS_CLASSIFIER.scan(prompt)
+        return {
+            "theme": LYRICS_CLASSIFIER.label(hits, "content_theme"),
+            "mood": LYRICS_CLASSIFIER.label(hits, "content_mood"),
+        }
+
     def detect_theme_from_lyrics(self, lyrics, prompt):
         """Detect theme from generated lyrics content"""
-        lyrics_lower = lyrics.lower()
-        prompt_lower = prompt.lower()
-        
-        themes = {
-            "love": ["love", "heart", "forever", "together", "romance"],
-            "dreams": ["dream", "hope", "future", "tomorrow", "aspire"],
-            "freedom": ["free", "escape", "liberty", "break", "fly"],
-            "life": ["life", "living", "moment", "time", "experience"],
-            "calm": ["peace", "quiet", "serene", "tranquil", "gentle"]
-        }
-        
-        combined_text = lyrics_lower + " " + prompt_lower
-        
-        for theme, keywords in themes.items():
-            if any(keyword in combined_text for keyword in keywords):
-                return theme
-        return "life"
+        return self.analyze_lyrics(lyrics, prompt)["theme"]
 
     def detect_genre_from_prompt(self, prompt):
         """Detect genre from original prompt"""
-        prompt_lower = prompt.lower()
-        
-        if any(word in prompt_lower for word in ["jazz", "blues", "saxophone"]):
-            return "jazz"
-        elif any(word in prompt_lower for word in ["rock", "metal", "guitar"]):
-            return "rock"
-        elif any(word in prompt_lower for word in ["electronic", "edm", "synth"]):
-            return "electronic"
-        elif any(word in prompt_lower for word in ["pop", "catchy", "mainstream"]):
-            return "pop"
-        elif any(word in prompt_lower for word in ["classical", "orchestral", "piano"]):
-            return "classical"
-        elif any(word in prompt_lower for word in ["hip hop", "rap", "urban"]):
-            return "hip-hop"
-        else:
-            return "indie"
+        return self.analyze_prompt(prompt)["genre"]
 
     def detect_mood_from_lyrics(self, lyrics, prompt):
         """Detect mood from lyrics and prompt"""
-        combined_text = (lyrics + " " + prompt).lower()
-        
-        mood_keywords = {
-            "calm": ["calm", "peace", "quiet", "gentle", "serene", "study", "chill"],
-            "happy": ["happy", "joy", "bright", "celebrate", "smile"],
-            "sad": ["sad", "melancholy", "tears", "lonely", "empty"],
-            "energetic": ["energy", "power", "strong", "intense", "electric"],
-            "romantic": ["love", "heart", "tender", "sweet", "romantic"]
-        }
-        
-        for mood, keywords in mood_keywords.items():
-            if any(keyword in combined_text for keyword in keywords):
-                return mood
-        return "balanced"
+        return self.analyze_lyrics(lyrics, prompt)["mood"]
 
     def extract_theme_from_prompt(self, prompt):
         """Extract theme from original prompt"""
-        prompt_lower = prompt.lower()
-        
-        if any(word in prompt_lower for word in ["love", "romantic", "heart"]):
-            return "love"
-        elif any(word in prompt_lower for word in ["dream", "future", "hope"]):
-            return "dreams"
-        elif any(word in prompt_lower for word in ["calm", "chill", "study", "peaceful"]):
-            return "calm"
-        elif any(word in prompt_lower for word in ["life", "living", "experience"]):
-            return "life"
-        else:
-            return "life"
+        return self.analyze_prompt(prompt)["theme"]
 
     def detect_mood_from_prompt(self, prompt):
         """Detect mood from original prompt"""
-        prompt_lower = prompt.lower()
-        
-        if any(word in prompt_lower for word in ["calm", "chill", "peaceful", "study"]):
-            return "calm"
-        elif any(word in prompt_lower for word in ["happy", "joyful", "upbeat"]):
-            return "happy"
-        elif any(word in prompt_lower for word in ["sad", "melancholy", "emotional"]):
-            return "sad"
-        elif any(word in prompt_lower for word in ["energetic", "intense", "powerful"]):
-            return "energetic"
-        elif any(word in prompt_lower for word in ["romantic", "love", "tender"]):
-            return "romantic"
-        else:
-            return "balanced"
+        return self.analyze_prompt(prompt)["mood"]
 
     def save_lyrics(self, lyrics_data):
         """Save lyrics to file"""
@@ -386,5 +612,5 @@ class LyricsGenerator:
         with open(filename, 'w', encoding='utf-8') as f:
             f.write(lyrics_data["lyrics"])
         
-        print(f"💾 Lyrics saved to: {filename}")
+        log.info(f"💾 Lyrics saved to: {filename}")
         return filename
\ No newline at end of file
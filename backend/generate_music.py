@@ -1,14 +1,27 @@
-import replicate
 import os
-import requests
 import time
+import uuid
+from contextlib import ExitStack
 from datetime import datetime
 import random
 from dotenv import load_dotenv
+from rate_limit import get_limiter, is_rate_limit_error
+from circuit_breaker import get_breaker
+from deadline import DeadlineExceeded
+from keyword_classifier import KeywordClassifier
+from metrics import stage_timer
+import tracing
+from structured_logging import get_logger
+
+log = get_logger("music")
+
+
+MUSICGEN_VERSION = "671ac645ce5e552cc63a54a2bbff63fcf798043055d2dac5fc9e36a837eedcfb"
+
 
 class MusicGenerator:
     def __init__(self):
-        print("🎵 Initializing Replicate MusicGen Large...")
+        log.info("🎵 Initializing Replicate MusicGen Large...")
         
         # Load environment variables
         load_dotenv()
@@ -17,14 +30,24 @@ class MusicGenerator:
         replicate_token = os.getenv("REPLICATE_API_TOKEN")
         
         if not replicate_token:
-            print("❌ REPLICATE_API_TOKEN not found in environment!")
-            print("💡 Add to .env file: REPLICATE_API_TOKEN=r8_your-token-here")
-            print("🌐 Get your token from: https://replicate.com/account/api-tokens")
+            log.error("❌ REPLICATE_API_TOKEN not found in environment!")
+            log.error("💡 Add to .env file: REPLICATE_API_TOKEN=r8_your-token-here")
+            log.error("🌐 Get your token from: https://replicate.com/account/api-tokens")
             raise ValueError("Replicate API token is required")
         
         # Set environment variable for replicate
         os.environ["REPLICATE_API_TOKEN"] = replicate_token
-        print("✅ Replicate API configured for MusicGen Large")
+        # Imported here so the server starts without paying for the SDK
+        import replicate
+        # REPLICATE_BASE_URL points at a compatible server (e.g. mock_providers.py)
+        self.base_url = os.getenv("REPLICATE_BASE_URL") or None
+        self.client = replicate.Client(api_token=replicate_token, base_url=self.base_url)
+        log.info(f"✅ Replicate API configured for MusicGen Large{f' ({self.base_url})' if self.base_url else ''}")
+        
+        # Shared Replicate limits (REPLICATE_RPM / _MAX_CONCURRENCY)
+        self.limiter = get_limiter("replicate")
+        # Fail fast instead of waiting out timeouts while Replicate is degraded
+        self.breaker = get_breaker("replicate")
         
         # Load prompt optimization
         self.load_prompt_patterns()
@@ -47,6 +70,12 @@ class MusicGenerator:
             "calm": ["peaceful", "gentle", "serene", "relaxing"],
             "romantic": ["tender", "intimate", "smooth", "loving"]
         }
+        
+        # Genre/mood names are the keywords; one scan finds both
+        self._classifier = KeywordClassifier({
+            "genre": [(g, [g]) for g in self.genre_enhancers],
+            "mood": [(m, [m]) for m in self.mood_enhancers],
+        })
 
     def optimize_prompt(self, prompt):
         """Optimize prompt for MusicGen Large"""
@@ -57,82 +86,148 @@ class MusicGenerator:
         # Add enhancements for basic prompts
         prompt_lower = prompt.lower()
         enhanced = prompt
+        detected = self._classifier.classify(prompt)
         
         # Add genre enhancement
-        for genre, enhancers in self.genre_enhancers.items():
-            if genre in prompt_lower:
-                enhancer = random.choice(enhancers)
-                if enhancer not in prompt_lower:
-                    enhanced = f"{enhancer} {enhanced}"
-                break
+        genre = detected["genre"]
+        if genre:
+            enhancer = random.choice(self.genre_enhancers[genre])
+            if enhancer not in prompt_lower:
+                enhanced = f"{enhancer} {enhanced}"
         
         # Add mood enhancement
-        for mood, enhancers in self.mood_enhancers.items():
-            if mood in prompt_lower:
-                enhancer = random.choice(enhancers)
-                if enhancer not in prompt_lower:
-                    enhanced = f"{enhancer} {enhanced}"
-                break
+        mood = detected["mood"]
+        if mood:
+            enhancer = random.choice(self.mood_enhancers[mood])
+            if enhancer not in prompt_lower:
+                enhanced = f"{enhancer} {enhanced}"
         
         return enhanced
 
-    def generate(self, prompt, duration=15):
-        """Generate music using Replicate MusicGen Large"""
-        print(f"🚀 Generating with Replicate MusicGen Large: '{prompt}' ({duration}s)")
+    def style_profile(self, prompt):
+        """
+        Genre/mood and one fixed set of descriptors for a prompt, so several
+        tracks (an album) can be rendered with the same sound.
+        """
+        detected = self._classifier.classify(prompt)
+        genre = detected["genre"] or "ambient"
+        mood = detected["mood"] or "calm"
+        return {
+            "genre": genre,
+            "mood": mood,
+            "descriptors": [self.genre_enhancers[genre][0], self.mood_enhancers[mood][0]],
+        }
+
+    def generate(self, prompt, duration=15, deadline=None, style=None):
+        """
+        Generate music using Replicate MusicGen Large.
+        With a deadline the prediction is cancelled once the budget runs out.
+        style (from style_profile) replaces the random prompt enhancers.
+        """
+        log.info(f"🚀 Generating with Replicate MusicGen Large: '{prompt}' ({duration}s)")
         
         # Optimize prompt
-        optimized_prompt = self.optimize_prompt(prompt)
-        print(f"✨ Optimized prompt: '{optimized_prompt}'")
+        if style:
+            optimized_prompt = f"{prompt}, {', '.join(style['descriptors'])}"
+        else:
+            optimized_prompt = self.optimize_prompt(prompt)
+        log.debug(f"✨ Optimized prompt: '{optimized_prompt}'")
         
         try:
             start_time = time.time()
             
             # Call Replicate MusicGen Large
-            output = replicate.run(
-                "meta/musicgen:671ac645ce5e552cc63a54a2bbff63fcf798043055d2dac5fc9e36a837eedcfb",
-                input={
-                    "prompt": optimized_prompt,
-                    "model_version": "stereo-large",
-                    "output_format": "wav", 
-                    "normalization_strategy": "loudness",
-                    "duration": duration
-                }
-            )
-            
-            generation_time = time.time() - start_time
-            print(f"⚡ Replicate generation completed in {generation_time:.2f} seconds")
-            
-            # Download and save the audio
-            if output:
-                return self.download_audio(output)
-            else:
-                raise Exception("No audio output from Replicate")
+            self.breaker.check()
+            timeout = deadline.timeout() if deadline else None
+            with ExitStack() as prediction:
+                # The Replicate slot (and its queueing) covers the prediction only
+                prediction.enter_context(stage_timer("musicgen_prediction"))
+                prediction.enter_context(self.limiter.slot(timeout=timeout))
+                # One breaker call for prediction + download, so a half-open
+                # probe is one whole song and a bad download counts once
+                with self.breaker.guard(deadline):
+                    output = self._run_prediction(optimized_prompt, duration, deadline)
+                    prediction.close()
+                    
+                    generation_time = time.time() - start_time
+                    log.info(f"⚡ Replicate generation completed in {generation_time:.2f} seconds")
+                    
+                    # Download and save the audio
+                    if output:
+                        return self.download_audio(output, deadline)
+                    else:
+                        raise Exception("No audio output from Replicate")
                 
         except Exception as e:
-            print(f"❌ Replicate generation failed: {e}")
+            log.error(f"❌ Replicate generation failed: {e}")
+            if is_rate_limit_error(e):
+                self.limiter.backoff(10)
             raise e
 
-    def download_audio(self, audio_url):
-        """Download audio file from Replicate"""
-        print(f"📥 Downloading audio from Replicate...")
+    def _run_prediction(self, optimized_prompt, duration, deadline=None):
+        """Create a MusicGen prediction and poll it until done or out of budget"""
+        prediction = self.client.predictions.create(
+            version=MUSICGEN_VERSION,
+            input={
+                "prompt": optimized_prompt,
+                "model_version": "stereo-large",
+                "output_format": "wav", 
+                "normalization_strategy": "loudness",
+                "duration": duration
+            }
+        )
+        
+        # Trace Replicate's own queue ("starting") apart from compute ("processing")
+        created = time.monotonic()
+        started = None
+        while prediction.status not in ("succeeded", "failed", "canceled"):
+            if started is None and prediction.status != "starting":
+                started = time.monotonic()
+                tracing.record_span("provider_queue", started - created, provider="replicate")
+            if deadline is not None and deadline.expired():
+                # Stop paying for a result nobody will wait for
+                prediction.cancel()
+                raise DeadlineExceeded(f"MusicGen prediction exceeded its {deadline.budget:.0f}s budget")
+            time.sleep(1.0)
+            prediction.reload()
+        
+        finished = time.monotonic()
+        if started is None:
+            started = finished
+            tracing.record_span("provider_queue", started - created, provider="replicate")
+        tracing.record_span("provider_compute", finished - started, provider="replicate",
+                            prediction_id=getattr(prediction, "id", None), status=prediction.status)
         
+        if prediction.status != "succeeded":
+            raise Exception(f"Replicate prediction {prediction.status}: {prediction.error}")
+        return prediction.output
+
+    def download_audio(self, audio_url, deadline=None):
+        """Download audio file from Replicate (generate() holds the breaker call)"""
+        log.debug("📥 Downloading audio from Replicate...")
+        
+        import requests
+
         try:
-            response = requests.get(audio_url, timeout=60)
-            response.raise_for_status()
+            timeout = deadline.timeout(cap=60) if deadline else 60
+            with stage_timer("audio_download"):
+                response = requests.get(audio_url, timeout=timeout)
+                response.raise_for_status()
             
-            # Save the audio file
+            # Save the audio file (random suffix: concurrent batch items
+            # finish within the same second)
             timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-            filename = f"assets/audio_{timestamp}_replicate.wav"
+            filename = f"assets/audio_{timestamp}_{uuid.uuid4().hex[:8]}_replicate.wav"
             os.makedirs("assets", exist_ok=True)
             
-            with open(filename, 'wb') as f:
+            with tracing.span("file_write", bytes=len(response.content)), open(filename, 'wb') as f:
                 f.write(response.content)
             
             file_size = len(response.content) / 1024 / 1024
-            print(f"✅ Downloaded Replicate audio: {filename} ({file_size:.2f} MB)")
+            log.info(f"✅ Downloaded Replicate audio: {filename} ({file_size:.2f} MB)")
             
             return filename
             
         except Exception as e:
-            print(f"❌ Failed to download audio: {e}")
+            log.error(f"❌ Failed to download audio: {e}")
             raise e
\ No newline at end of file
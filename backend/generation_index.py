@@ -0,0 +1,258 @@
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from structured_logging import get_logger
+
+log = get_logger("generation_index")
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    kind TEXT NOT NULL,                 -- song | album_track
+    prompt TEXT NOT NULL,
+    duration INTEGER,
+    options TEXT,                       -- JSON: song_length, image quality/size
+    title TEXT,
+    genre TEXT,
+    mood TEXT,
+    theme TEXT,
+    lyrics TEXT,                        -- JSON: client lyrics payload
+    lyrics_source TEXT,
+    audio_file TEXT,                    -- basename in assets/ and STATIC_DIR
+    audio_bytes INTEGER,
+    image_file TEXT,                    -- final cover, once rendered
+    image_bytes INTEGER,
+    placeholder_file TEXT,
+    cover_job_id TEXT,
+    cover_status TEXT,
+    elapsed REAL,
+    timings TEXT,                       -- JSON: seconds per stage
+    album_id TEXT,
+    track_index INTEGER,
+    request_id TEXT,
+    job_id TEXT,
+    trace_id TEXT,
+    pinned INTEGER NOT NULL DEFAULT 0,  -- favorites, never evicted
+    last_accessed_at REAL               -- last /static download, for LRU retention
+);
+CREATE INDEX IF NOT EXISTS generations_recent ON generations (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS generations_gallery ON generations (created_at DESC, id DESC) WHERE image_file IS NOT NULL;
+CREATE INDEX IF NOT EXISTS generations_cover_job ON generations (cover_job_id);
+"""
+
+# Created after MIGRATIONS so indexes on added columns work on older files
+INDEXES = """
+CREATE INDEX IF NOT EXISTS generations_audio_file ON generations (audio_file);
+CREATE INDEX IF NOT EXISTS generations_image_file ON generations (image_file);
+CREATE INDEX IF NOT EXISTS generations_placeholder_file ON generations (placeholder_file);
+CREATE INDEX IF NOT EXISTS generations_lru ON generations (COALESCE(last_accessed_at, created_at)) WHERE pinned = 0;
+"""
+
+# Columns added after the first release: (name, definition)
+MIGRATIONS = [
+    ("pinned", "INTEGER NOT NULL DEFAULT 0"),
+    ("last_accessed_at", "REAL"),
+]
+
+# Every asset column a generation can reference
+FILE_COLUMNS = ("audio_file", "image_file", "placeholder_file")
+
+# Columns returned by list endpoints; lyrics and timings only come with get()
+LIST_COLUMNS = (
+    "id, created_at, kind, prompt, duration, title, genre, mood, theme, lyrics_source, "
+    "audio_file, image_file, placeholder_file, cover_status, elapsed, album_id, track_index, pinned"
+)
+JSON_COLUMNS = ("options", "lyrics", "timings")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, generation_id):
+    return base64.urlsafe_b64encode(f"{created_at!r}|{generation_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, generation_id = raw.split("|", 1)
+        return float(created_at), generation_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+class GenerationIndex:
+    """
+    SQLite catalog of every generation, so history and gallery pages are
+    index range scans instead of directory listings. WAL mode lets the API
+    read while a generation is being written; each thread gets its own
+    connection and writes are serialized by a lock. Pages use keyset
+    pagination on (created_at, id), so page N costs the same as page 1.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("GENERATION_INDEX_PATH", "generations.db")
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._write_lock:
+            connection = self._connection()
+            connection.executescript(SCHEMA)
+            existing = {row["name"] for row in connection.execute("PRAGMA table_info(generations)")}
+            for column, definition in MIGRATIONS:
+                if column not in existing:
+                    connection.execute(f"ALTER TABLE generations ADD COLUMN {column} {definition}")
+            connection.executescript(INDEXES)
+        log.info(f"🗂️ Generation index: {self.path}")
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: durable across app crashes, one fsync per checkpoint
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _write(self, sql, params=()):
+        with self._write_lock:
+            return self._connection().execute(sql, params).rowcount
+
+    def record(self, **fields):
+        """Insert one generation; returns its id"""
+        fields.setdefault("id", uuid.uuid4().hex[:16])
+        fields.setdefault("created_at", time.time())
+        for column in JSON_COLUMNS:
+            if fields.get(column) is not None:
+                fields[column] = json.dumps(fields[column], ensure_ascii=False)
+        columns = ", ".join(fields)
+        placeholders = ", ".join("?" for _ in fields)
+        self._write(f"INSERT INTO generations ({columns}) VALUES ({placeholders})", tuple(fields.values()))
+        return fields["id"]
+
+    def set_cover(self, cover_job_id, status, image_file=None, image_bytes=None):
+        """Attach a finished (or failed) cover render to every generation sharing it"""
+        return self._write(
+            "UPDATE generations SET cover_status = ?, image_file = COALESCE(?, image_file), "
+            "image_bytes = COALESCE(?, image_bytes) WHERE cover_job_id = ?",
+            (status, image_file, image_bytes, cover_job_id),
+        )
+
+    def get(self, generation_id):
+        row = self._connection().execute("SELECT * FROM generations WHERE id = ?", (generation_id,)).fetchone()
+        if row is None:
+            return None
+        item = dict(row)
+        for column in JSON_COLUMNS:
+            if item.get(column):
+                item[column] = json.loads(item[column])
+        return item
+
+    def page(self, limit=50, cursor=None, with_cover=False):
+        """
+        Newest-first page of generations -> (items, next_cursor).
+        with_cover restricts to generations whose final cover is rendered.
+        """
+        where = ["image_file IS NOT NULL"] if with_cover else []
+        params = []
+        if cursor:
+            created_at, generation_id = decode_cursor(cursor)
+            where.append("(created_at, id) < (?, ?)")
+            params += [created_at, generation_id]
+        sql = f"SELECT {LIST_COLUMNS} FROM generations"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        rows = self._connection().execute(sql, params + [limit + 1]).fetchall()
+        items = [dict(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(items[-1]["created_at"], items[-1]["id"]) if len(rows) > limit else None
+        return items, next_cursor
+
+    def set_pinned(self, generation_id, pinned):
+        """Pin (favorite) or unpin a generation; False if it doesn't exist"""
+        return self._write("UPDATE generations SET pinned = ? WHERE id = ?", (int(bool(pinned)), generation_id)) > 0
+
+    def touch(self, accessed):
+        """Record last access times, {filename: timestamp}, batched in one transaction"""
+        if not accessed:
+            return
+        with self._write_lock:
+            connection = self._connection()
+            connection.execute("BEGIN")
+            try:
+                for filename, at in accessed.items():
+                    for column in ("audio_file", "image_file"):
+                        connection.execute(
+                            f"UPDATE generations SET last_accessed_at = MAX(COALESCE(last_accessed_at, 0), ?) WHERE {column} = ?",
+                            (at, filename),
+                        )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+    def eviction_candidates(self, older_than, limit=200, after=None):
+        """
+        Unpinned generations created before older_than, least recently used
+        first: [(id, last_used, files)]. after=(last_used, id) of the last
+        row already seen pages past rows the caller chose to keep.
+        """
+        where, params = "pinned = 0 AND created_at < ?", [older_than]
+        if after is not None:
+            where += " AND (COALESCE(last_accessed_at, created_at), id) > (?, ?)"
+            params += list(after)
+        rows = self._connection().execute(
+            f"SELECT id, COALESCE(last_accessed_at, created_at) AS last_used, {', '.join(FILE_COLUMNS)} "
+            f"FROM generations WHERE {where} "
+            "ORDER BY COALESCE(last_accessed_at, created_at), id LIMIT ?",
+            params + [limit],
+        ).fetchall()
+        return [(row["id"], row["last_used"], [row[c] for c in FILE_COLUMNS if row[c]]) for row in rows]
+
+    def referenced_files(self):
+        """Every asset filename some generation still points at"""
+        union = " UNION ".join(f"SELECT {c} FROM generations WHERE {c} IS NOT NULL" for c in FILE_COLUMNS)
+        return {row[0] for row in self._connection().execute(union)}
+
+    @contextmanager
+    def deleting(self, generation_id):
+        """
+        Transaction that deletes one generation and yields the filenames it
+        alone referenced (shared album covers stay while another row uses
+        them). The caller moves those files aside inside the block; an
+        exception rolls the row back.
+        """
+        with self._write_lock:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    f"SELECT {', '.join(FILE_COLUMNS)} FROM generations WHERE id = ? AND pinned = 0", (generation_id,)
+                ).fetchone()
+                files = []
+                if row is not None:
+                    connection.execute("DELETE FROM generations WHERE id = ?", (generation_id,))
+                    for filename in {row[c] for c in FILE_COLUMNS if row[c]}:
+                        still_used = any(
+                            connection.execute(f"SELECT 1 FROM generations WHERE {c} = ? LIMIT 1", (filename,)).fetchone()
+                            for c in FILE_COLUMNS
+                        )
+                        if not still_used:
+                            files.append(filename)
+                yield row is not None, files
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
@@ -0,0 +1,83 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from structured_logging import get_logger
+
+log = get_logger("idempotency")
+
+
+class IdempotencyConflict(Exception):
+    """Raised when an Idempotency-Key is reused with a different request body"""
+
+
+class _Entry:
+    __slots__ = ("created_at", "fingerprint", "task")
+
+    def __init__(self, created_at, fingerprint, task):
+        self.created_at = created_at
+        self.fingerprint = fingerprint
+        self.task = task
+
+
+class IdempotencyStore:
+    """
+    Maps Idempotency-Key values to a single generation job.
+    Retries of the same click attach to the in-flight or finished job
+    instead of starting another Replicate + DALL·E + GPT run. Keys are
+    scoped per client, so two clients that happen to pick the same key
+    never see each other's results.
+    """
+
+    def __init__(self, ttl_seconds=None, max_entries=2048):
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "900"))
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+
+    @staticmethod
+    def fingerprint(payload):
+        """Stable hash of the request parameters a key is bound to"""
+        raw = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def run(self, key, fingerprint, job, scope=None):
+        """
+        Run job() once per (scope, key) within the TTL window.
+        Returns (result, replayed) where replayed is True for duplicates.
+        """
+        self._evict()
+
+        entry = self._entries.get((scope, key))
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyConflict(f"Idempotency-Key '{key}' was already used with a different request")
+            log.info(f"♻️ Idempotency-Key '{key}' matched an existing job")
+            return await asyncio.shield(entry.task), True
+
+        task = asyncio.ensure_future(job())
+        self._entries[(scope, key)] = _Entry(time.monotonic(), fingerprint, task)
+        task.add_done_callback(lambda t: self._forget_failed((scope, key), t))
+        return await asyncio.shield(task), False
+
+    def _forget_failed(self, entry_key, task):
+        """Failed jobs are not remembered so the client can retry them"""
+        if task.cancelled() or task.exception() is not None:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry.task is task:
+                del self._entries[entry_key]
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [k for k, e in self._entries.items()
+                   if e.task.done() and now - e.created_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+        # Bound memory: drop the oldest finished entries first
+        if len(self._entries) > self.max_entries:
+            finished = sorted((e.created_at, k) for k, e in self._entries.items() if e.task.done())
+            for _, key in finished[:len(self._entries) - self.max_entries]:
+                del self._entries[key]
@@ -0,0 +1,110 @@
+import re
+from functools import lru_cache
+
+
+# Light inflections so "dream" still matches "dreams"/"dreaming"
+# without "heart" matching "hearth"
+DEFAULT_SUFFIXES = ("", "s", "es", "d", "ed", "ing", "er", "ers", "est", "y", "ly", "ful", "ness")
+
+# Words are runs of Unicode letters/digits, so curly quotes and dashes
+# ("heart’s", "love—forever") split like their ASCII counterparts, and a
+# possessive 's / ’s is dropped ("heart’s" -> "heart")
+_WORD_RE = re.compile(r"([^\W_]+)(?:['’]s\b)?")
+# ASCII text (most prompts) skips the regex: one C-level translate + split,
+# with punctuation, whitespace and "_" turned into spaces
+_ASCII_TABLE = bytes(c if chr(c).isalnum() else 0x20 for c in range(128)) + bytes(range(128, 256))
+
+
+def _inflect(word, suffix):
+    """word + suffix, dropping a silent final "e" before -ing/-ed/-er ("love" -> "loving", "lover")"""
+    if suffix[:1] in ("e", "i") and word.endswith("e") and not word.endswith("ee"):
+        return word[:-1] + suffix
+    return word + suffix
+
+
+class KeywordClassifier:
+    """
+    Precompiled multi-pattern keyword matcher.
+
+    rules maps a dimension (e.g. "genre") to an ordered list of
+    (label, keywords) pairs; the first label with a hit wins, matching the
+    if/elif chains it replaces. Every inflected form of every keyword is
+    compiled into one lookup table, so a text is tokenized once and matched
+    on whole words with set intersections, no matter how many dimensions
+    are classified from it.
+    """
+
+    def __init__(self, rules, defaults=None, suffixes=DEFAULT_SUFFIXES, cache_size=1024):
+        self.rules = rules
+        self.defaults = defaults or {}
+        self._label_sets = {
+            dimension: [(label, frozenset(w.lower() for w in words)) for label, words in pairs]
+            for dimension, pairs in rules.items()
+        }
+
+        keywords = {k.lower() for pairs in rules.values() for _, words in pairs for k in words}
+
+        # surface form -> keyword, e.g. "dreaming" -> "dream", "hip hops" -> "hip hop"
+        self._forms = {}
+        self._phrase_lengths = set()
+        self._phrase_starts = set()
+        for keyword in keywords:
+            words = self._tokenize(keyword)
+            for suffix in suffixes:
+                form = " ".join(words[:-1] + [_inflect(words[-1], suffix)])
+                self._forms.setdefault(form, keyword)
+            if len(words) > 1:
+                self._phrase_lengths.add(len(words))
+                self._phrase_starts.add(words[0])
+        self._single_forms = frozenset(f for f in self._forms if " " not in f)
+        self._phrase_lengths = sorted(self._phrase_lengths)
+
+        # A phrase match also counts every keyword spelled out inside it
+        # ("jazz saxophone" -> jazz, saxophone)
+        self._expansions = {}
+        for phrase in (k for k in keywords if " " in k):
+            padded = f" {phrase} "
+            self._expansions[phrase] = frozenset(k for k in keywords if f" {k} " in padded)
+
+        if cache_size:
+            self.scan = lru_cache(maxsize=cache_size)(self.scan)
+
+    @staticmethod
+    def _tokenize(text):
+        text = (text or "").lower()
+        if not text.isascii():
+            return _WORD_RE.findall(text)
+        # "heart's" splits into "heart" + "s"; no form is a lone "s", so the
+        # leftover never matches and isn't worth a second pass to remove
+        return text.encode().translate(_ASCII_TABLE).decode().split()
+
+    def scan(self, text):
+        """Single pass over text; returns the frozenset of matched keywords"""
+        tokens = self._tokenize(text)
+        forms = self._forms
+        # Probing the form set with each token beats building a set of tokens
+        hits = {forms[t] for t in self._single_forms.intersection(tokens)}
+
+        # Phrases are rare: only walk the tokens when one could start here
+        if self._phrase_starts and not self._phrase_starts.isdisjoint(tokens):
+            starts = self._phrase_starts
+            for i, token in enumerate(tokens):
+                if token not in starts:
+                    continue
+                for n in self._phrase_lengths:
+                    keyword = forms.get(" ".join(tokens[i:i + n]))
+                    if keyword is not None:
+                        hits.update(self._expansions[keyword])
+        return frozenset(hits)
+
+    def label(self, hits, dimension):
+        """First label of a dimension whose keywords intersect hits"""
+        for label, words in self._label_sets[dimension]:
+            if not words.isdisjoint(hits):
+                return label
+        return self.defaults.get(dimension)
+
+    def classify(self, text, dimensions=None):
+        """Classify text for the given dimensions (all by default) in one scan"""
+        hits = self.scan(text)
+        return {d: self.label(hits, d) for d in (dimensions or self.rules)}
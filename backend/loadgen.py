@@ -0,0 +1,414 @@
+"""
+Traffic replay load generator for /generate.
+
+Builds a prompt mix from EXAMPLE_PROMPTS, the client's Surprise Me list and
+recorded server logs, sends it on an open-loop arrival schedule (Poisson,
+bursty or the recorded timing) with realistic clip durations, and saves the
+run as JSON so results can be compared across commits.
+
+    python loadgen.py --arrival poisson --rate 0.5 --requests 60
+    python loadgen.py --arrival bursty --rate 0.2 --burst-factor 8 --mix examples=1,surprise=1,logs=2 --log server.log
+    python loadgen.py --arrival replay --log server.log --speed 4
+    python loadgen.py --compare loadgen_results/abc123-....json loadgen_results/def456-....json
+
+Without --target it starts mock_providers.py and the API server itself
+(see bench_generate.py); mock latency flags are passed through.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bench_generate import Servers, peak_rss_mb, percentile, scrape_stage_buckets, send_generate, stage_report
+from example_prompts import EXAMPLE_PROMPTS
+from mock_providers import DEFAULT_PROFILES
+
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_JS = os.path.join(BACKEND_DIR, "..", "client", "src", "App.js")
+RESULTS_DIR = "loadgen_results"
+
+# What people pick in the client: 15s is the default, 10/15/30 are buttons,
+# the slider covers 10-60 in steps of 5
+DEFAULT_DURATION_WEIGHTS = {10: 0.2, 15: 0.45, 20: 0.05, 30: 0.2, 45: 0.05, 60: 0.05}
+
+# `🎵 Generating complete song for: '<prompt>' (15s, 150s budget)` from the server log
+LOG_LINE_RE = re.compile(r"Generating complete song for: '(.+)' \((\d+)s")
+
+
+def surprise_prompts(app_js=APP_JS):
+    """The client's SURPRISE_PROMPTS list, read from App.js"""
+    with open(app_js, encoding="utf-8") as f:
+        source = f.read()
+    block = re.search(r"const SURPRISE_PROMPTS = \[(.*?)\];", source, re.S)
+    if not block:
+        raise ValueError(f"No SURPRISE_PROMPTS list in {app_js}")
+    return re.findall(r'"((?:[^"\\]|\\.)*)"', block.group(1))
+
+
+def _parse_timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def recorded_requests(paths):
+    """
+    [{prompt, duration, ts}] from server logs: JSON lines with a "prompt"
+    field (duration and ts/timestamp optional) or the plain-text
+    "Generating complete song for" lines. ts is None without timestamps.
+    """
+    recorded = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("{"):
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(entry, dict) and entry.get("prompt"):
+                        duration = entry.get("duration")
+                        recorded.append({
+                            "prompt": entry["prompt"],
+                            "duration": int(duration) if duration else None,
+                            "ts": _parse_timestamp(entry.get("ts", entry.get("timestamp"))),
+                        })
+                    continue
+                match = LOG_LINE_RE.search(line)
+                if match:
+                    recorded.append({"prompt": match.group(1), "duration": int(match.group(2)), "ts": None})
+    return recorded
+
+
+def parse_weights(spec, cast=str):
+    """ "a=1,b=2" -> {a: 1.0, b: 2.0} """
+    weights = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, weight = part.partition("=")
+        weights[cast(name.strip())] = float(weight or 1)
+    return weights
+
+
+class PromptMix:
+    """Weighted draw over prompt sources, then a clip duration"""
+
+    def __init__(self, sources, weights, duration_weights, repeat_rate=0.0):
+        self.sources = {name: items for name, items in sources.items() if items and weights.get(name, 0) > 0}
+        if not self.sources:
+            raise ValueError("The prompt mix is empty (check --mix and --log)")
+        self.names = list(self.sources)
+        self.weights = [weights[name] for name in self.names]
+        self.durations = list(duration_weights)
+        self.duration_weights = list(duration_weights.values())
+        self.repeat_rate = repeat_rate
+        self.recent = []
+
+    def draw(self, rng):
+        """{prompt, duration, source}"""
+        # Double submits and people retrying the same idea while it renders
+        if self.recent and rng.random() < self.repeat_rate:
+            return dict(rng.choice(self.recent[-8:]), source="repeat")
+        source = rng.choices(self.names, self.weights)[0]
+        item = rng.choice(self.sources[source])
+        if isinstance(item, dict):
+            prompt, duration = item["prompt"], item.get("duration")
+        else:
+            prompt, duration = item, None
+        request = {
+            "prompt": prompt,
+            "duration": duration or rng.choices(self.durations, self.duration_weights)[0],
+            "source": source,
+        }
+        self.recent.append(request)
+        return request
+
+
+def poisson_arrivals(rng, rate, count):
+    """Offsets (s) of a Poisson process"""
+    t, offsets = 0.0, []
+    for _ in range(count):
+        t += rng.expovariate(rate)
+        offsets.append(t)
+    return offsets
+
+
+def bursty_arrivals(rng, rate, count, burst_factor=8.0, burst_seconds=20.0, calm_seconds=120.0):
+    """
+    Two-state Markov-modulated Poisson process: calm periods at `rate`
+    and bursts at rate * burst_factor, with exponential state lengths.
+    """
+    t, offsets = 0.0, []
+    bursting = False
+    state_end = rng.expovariate(1 / calm_seconds)
+    while len(offsets) < count:
+        current = rate * burst_factor if bursting else rate
+        gap = rng.expovariate(current)
+        if t + gap > state_end:
+            # Memoryless: jump to the switch and draw again in the new state
+            t = state_end
+            bursting = not bursting
+            state_end = t + rng.expovariate(1 / (burst_seconds if bursting else calm_seconds))
+            continue
+        t += gap
+        offsets.append(t)
+    return offsets
+
+
+def replay_arrivals(recorded, speed=1.0):
+    """Offsets from recorded timestamps, compressed by `speed`"""
+    stamps = [r["ts"] for r in recorded if r["ts"] is not None]
+    if not stamps:
+        raise ValueError("--arrival replay needs logs with timestamps (JSON lines with ts)")
+    first = min(stamps)
+    return [(r["ts"] - first) / speed for r in recorded if r["ts"] is not None]
+
+
+def git_revision():
+    """(short commit, dirty) of the tree under test, or (None, None) outside git"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+class LoadRun:
+    """Open-loop sender: every request starts at its scheduled offset, however slow the server is"""
+
+    def __init__(self, base_url, schedule, fresh=False, max_in_flight=256):
+        self.base_url = base_url
+        self.schedule = schedule
+        self.fresh = fresh
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _send(self, start, index, offset, request):
+        lag = time.perf_counter() - start - offset
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        body = {"prompt": request["prompt"], "duration": request["duration"], "fresh": self.fresh}
+        try:
+            result = send_generate(self.base_url, body)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        return dict(request, index=index, offset=round(offset, 3), start_lag=round(lag, 3),
+                    status=result["status"], elapsed=round(result["elapsed"], 3), error=result["error"])
+
+    def run(self):
+        start = time.perf_counter()
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            for index, (offset, request) in enumerate(self.schedule):
+                delay = offset - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(self._send, start, index, offset, request))
+            results = [f.result() for f in futures]
+        return results, time.perf_counter() - start
+
+
+def summarize(results, wall):
+    ok = [r for r in results if r["status"] == 200]
+    by_duration = defaultdict(list)
+    by_source = defaultdict(list)
+    for r in ok:
+        by_duration[r["duration"]].append(r["elapsed"])
+        by_source[r["source"]].append(r["elapsed"])
+
+    def pcts(values):
+        return {f"p{q}": round(percentile(values, q), 3) if values else None for q in (50, 95, 99)}
+
+    return {
+        "sent": len(results),
+        "succeeded": len(ok),
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "status_codes": dict(Counter(str(r["status"]) for r in results)),
+        "wall_seconds": round(wall, 2),
+        "offered_rps": round(len(results) / results[-1]["offset"], 4) if results and results[-1]["offset"] else None,
+        "goodput_rps": round(len(ok) / wall, 4) if wall else 0.0,
+        "end_to_end": pcts([r["elapsed"] for r in ok]),
+        "by_duration": {str(d): dict(count=len(v), **pcts(v)) for d, v in sorted(by_duration.items())},
+        "by_source": {s: dict(count=len(v), **pcts(v)) for s, v in sorted(by_source.items())},
+        "max_start_lag": max((r["start_lag"] for r in results), default=0.0),
+    }
+
+
+# Metrics shown by --compare, with the direction that counts as better
+COMPARE_KEYS = [
+    ("goodput_rps", "higher"),
+    ("error_rate", "lower"),
+    ("end_to_end.p50", "lower"),
+    ("end_to_end.p95", "lower"),
+    ("end_to_end.p99", "lower"),
+    ("peak_in_flight", "lower"),
+    ("peak_rss_mb", "lower"),
+]
+
+
+def _lookup(data, dotted):
+    for key in dotted.split("."):
+        data = data.get(key) if isinstance(data, dict) else None
+    return data
+
+
+def compare(paths):
+    runs = []
+    for path in paths:
+        with open(path) as f:
+            runs.append(json.load(f))
+    labels = [f"{r['meta'].get('commit') or '?'}{'*' if r['meta'].get('dirty') else ''}" for r in runs]
+    print(f"{'metric':<26}" + "".join(f"{label:>14}" for label in labels) + "     change")
+    for key, better in COMPARE_KEYS:
+        values = [_lookup(r["summary"], key) for r in runs]
+        row = f"{key:<26}" + "".join(f"{'-' if v is None else round(v, 3):>14}" for v in values)
+        first, last = values[0], values[-1]
+        if first not in (None, 0) and last is not None:
+            change = (last - first) / first
+            worse = change > 0.05 if better == "lower" else change < -0.05
+            row += f"   {change:+7.1%}{'  ⚠️' if worse else ''}"
+        print(row)
+    stages = sorted(set().union(*(r["summary"].get("stages", {}) for r in runs)))
+    for stage in stages:
+        values = [_lookup(r["summary"], f"stages.{stage}.p95") for r in runs]
+        print(f"{stage + ' p95':<26}" + "".join(f"{'-' if v is None else v:>14}" for v in values))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--compare", nargs="+", metavar="RESULT", help="compare saved runs instead of sending load")
+    parser.add_argument("--arrival", choices=("poisson", "bursty", "replay"), default="poisson")
+    parser.add_argument("--rate", type=float, default=0.3, help="mean arrivals per second (calm rate for bursty)")
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--burst-factor", type=float, default=8.0)
+    parser.add_argument("--burst-seconds", type=float, default=20.0, help="mean burst length")
+    parser.add_argument("--calm-seconds", type=float, default=120.0, help="mean time between bursts")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay time compression")
+    parser.add_argument("--mix", default="examples=1,surprise=1,logs=1", help="source weights")
+    parser.add_argument("--log", action="append", default=[], help="recorded server log (repeatable)")
+    parser.add_argument("--durations", help="duration weights, e.g. 15=0.5,30=0.5")
+    parser.add_argument("--repeat-rate", type=float, default=0.05, help="share of requests repeating a recent prompt")
+    parser.add_argument("--fresh", action="store_true", help="send fresh=true (no coalescing)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--target", help="existing server URL; default starts mock providers + API server")
+    parser.add_argument("--mock-port", type=int, default=8900)
+    parser.add_argument("--app-port", type=int, default=7861)
+    parser.add_argument("--output", help=f"result file (default {RESULTS_DIR}/<commit>-<time>.json)")
+    parser.add_argument("--verbose", action="store_true", help="show server logs")
+    for name in DEFAULT_PROFILES:
+        parser.add_argument(f"--{name}-latency")
+        parser.add_argument(f"--{name}-failure-rate")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.compare)
+        return
+
+    rng = random.Random(args.seed)
+    recorded = recorded_requests(args.log)
+    duration_weights = parse_weights(args.durations, int) if args.durations else DEFAULT_DURATION_WEIGHTS
+
+    if args.arrival == "replay":
+        # Recorded prompts, durations and timing, in order
+        timed = [r for r in recorded if r["ts"] is not None]
+        offsets = replay_arrivals(timed, args.speed)
+        schedule = sorted(
+            ((o, {"prompt": r["prompt"], "duration": r["duration"] or 15, "source": "logs"}) for o, r in zip(offsets, timed)),
+            key=lambda item: item[0],
+        )[:args.requests]
+    else:
+        mix = PromptMix(
+            {"examples": list(EXAMPLE_PROMPTS), "surprise": surprise_prompts(), "logs": recorded},
+            parse_weights(args.mix), duration_weights, args.repeat_rate,
+        )
+        if args.arrival == "poisson":
+            offsets = poisson_arrivals(rng, args.rate, args.requests)
+        else:
+            offsets = bursty_arrivals(rng, args.rate, args.requests, args.burst_factor,
+                                      args.burst_seconds, args.calm_seconds)
+        schedule = [(o, mix.draw(rng)) for o in offsets]
+
+    print(f"📈 {len(schedule)} requests over ~{schedule[-1][0]:.0f}s ({args.arrival}), "
+          f"sources {dict(Counter(r['source'] for _, r in schedule))}")
+
+    mock_args = []
+    for name in DEFAULT_PROFILES:
+        for option in ("latency", "failure_rate"):
+            value = getattr(args, f"{name}_{option}")
+            if value is not None:
+                mock_args += [f"--{name}-{option.replace('_', '-')}", value]
+
+    def execute(base_url, app_pid=None, mock_stats=None):
+        before = scrape_stage_buckets(base_url)
+        run = LoadRun(base_url, schedule, fresh=args.fresh)
+        results, wall = run.run()
+        summary = summarize(results, wall)
+        summary.update(
+            peak_in_flight=run.peak_in_flight,
+            stages=stage_report(before, scrape_stage_buckets(base_url)),
+            peak_rss_mb=peak_rss_mb(app_pid) if app_pid else None,
+        )
+        if mock_stats:
+            summary["mock"] = mock_stats()
+        return summary, results
+
+    if args.target:
+        summary, results = execute(args.target.rstrip("/"))
+    else:
+        with Servers(args.mock_port, args.app_port, mock_args, quiet=not args.verbose) as servers:
+            summary, results = execute(servers.base_url, servers.app.pid, servers.mock_stats)
+
+    commit, dirty = git_revision()
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "target": args.target or "mock",
+            "config": {k: v for k, v in vars(args).items() if k not in ("compare", "output", "verbose")},
+        },
+        "summary": summary,
+        "requests": results,
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{commit or 'nogit'}{'-dirty' if dirty else ''}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    e2e = summary["end_to_end"]
+    print(f"\n📊 {summary['succeeded']}/{summary['sent']} ok in {summary['wall_seconds']}s, "
+          f"goodput {summary['goodput_rps']} req/s, peak {summary['peak_in_flight']} in flight")
+    print(f"📬 Status codes: {summary['status_codes']}")
+    print(f"⏱️  End to end: p50 {e2e['p50']}s  p95 {e2e['p95']}s  p99 {e2e['p99']}s")
+    for duration, row in summary["by_duration"].items():
+        print(f"   {duration:>3}s clips: {row['count']:>3} ok, p50 {row['p50']}s  p95 {row['p95']}s")
+    if summary["peak_rss_mb"] is not None:
+        print(f"🧠 Server peak RSS: {summary['peak_rss_mb']:.1f} MB")
+    print(f"💾 Saved {output} (compare with: python loadgen.py --compare <old> {output})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import re
+from functools import lru_cache
+
+
+SECTION_RE = re.compile(r"^\[(.+?)\]$")
+WORD_RE = re.compile(r"[a-z']+")
+VOWEL_GROUPS_RE = re.compile(r"[aeiouy]+")
+
+
+@lru_cache(maxsize=8192)
+def count_syllables(word):
+    """Vowel-group estimate; good enough to weight lines, not for poetry"""
+    word = word.lower().strip("'")
+    if not word:
+        return 0
+    if word.endswith("'s"):
+        word = word[:-2]
+    count = len(VOWEL_GROUPS_RE.findall(word))
+    # Silent trailing e ("time", "love") but not "-le" ("gentle")
+    if word.endswith("e") and not word.endswith(("le", "ee", "ye")) and count > 1:
+        count -= 1
+    return max(1, count)
+
+
+def line_syllables(text):
+    return sum(count_syllables(w) for w in WORD_RE.findall(text.lower()))
+
+
+def _section_kind(label):
+    """"Verse 2" -> ("verse", 2), "Pre-Chorus" -> ("pre-chorus", None)"""
+    match = re.match(r"^(.*?)\s*(\d+)?$", label.strip())
+    kind = match.group(1).strip().lower() or label.lower()
+    number = int(match.group(2)) if match.group(2) else None
+    return kind, number
+
+
+def build_lyrics_document(content):
+    """
+    Structure lyrics text once for every client: sections with labels,
+    lines with syllable counts, character offsets into content, and a
+    [start, end) share of the song per line, weighted by syllables, for
+    timing alignment.
+    """
+    content = content or ""
+    title = None
+    sections = []
+    current = None
+    offset = 0
+
+    for raw in content.split("\n"):
+        start = offset + (len(raw) - len(raw.lstrip()))
+        text = raw.strip()
+        offset += len(raw) + 1
+        if not text:
+            continue
+
+        if text.startswith("#"):
+            if title is None:
+                title = text.lstrip("#").strip()
+            continue
+
+        header = SECTION_RE.match(text)
+        if header:
+            label = header.group(1).strip()
+            kind, number = _section_kind(label)
+            current = {"label": label, "kind": kind, "number": number, "start": start, "end": start + len(text), "lines": []}
+            sections.append(current)
+            continue
+
+        if current is None:
+            # Lyrics before any [Label]
+            current = {"label": None, "kind": "untitled", "number": None, "start": start, "end": start, "lines": []}
+            sections.append(current)
+        current["lines"].append({
+            "text": text,
+            "start": start,
+            "end": start + len(text),
+            "syllables": line_syllables(text),
+        })
+        current["end"] = start + len(text)
+
+    total = sum(line["syllables"] for section in sections for line in section["lines"])
+    elapsed = 0
+    index = 0
+    for section in sections:
+        for line in section["lines"]:
+            line["index"] = index
+            line["timing"] = [round(elapsed / total, 4) if total else 0.0]
+            elapsed += line["syllables"]
+            line["timing"].append(round(elapsed / total, 4) if total else 0.0)
+            index += 1
+
+    return {
+        "title": title,
+        "sections": sections,
+        "line_count": index,
+        "syllable_count": total,
+    }
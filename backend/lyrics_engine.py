@@ -0,0 +1,254 @@
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from structured_logging import get_logger
+
+log = get_logger("lyrics_engine")
+
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "lyrics_corpus.txt")
+
+LINE_START = "<s>"
+LINE_END = "</s>"
+
+WORD_RE = re.compile(r"[a-z']+")
+VOWELS_RE = re.compile(r"[aeiouy]+")
+
+# Spellings that sound alike at the end of a line ("me"/"free"/"sea")
+RHYME_EQUIVALENTS = {"e": "ee", "ea": "ee", "igh": "y", "ie": "y", "ye": "y", "ow": "o", "oe": "o",
+                     "ue": "oo", "ew": "oo", "ou": "oo"}
+
+# Words whose spelling lies about the sound
+RHYME_OVERRIDES = {"to": "oo", "do": "oo", "who": "oo", "into": "oo", "through": "oo", "you": "oo",
+                   "said": "ed", "love": "ove", "gone": "on", "done": "un"}
+
+# Lyric mood pulls in lines from these corpus themes as well
+MOOD_THEMES = {"sad": "sad", "energetic": "energetic", "calm": "calm", "romantic": "love", "happy": "life"}
+
+TITLE_STOPWORDS = {"the", "a", "an", "and", "to", "of", "in", "on", "at", "for", "with",
+                   "is", "are", "was", "were", "be", "you", "you're", "we", "i", "it", "that"}
+
+# Rhyme scheme per section kind, as line-pair groupings
+SCHEMES = {"verse": ("ABAB", "AABB"), "chorus": ("AABB",), "bridge": ("AABB", "ABAB")}
+
+
+def rhyme_key(word):
+    """
+    Ending that has to match for two words to rhyme: the last vowel
+    sound plus trailing consonants, with silent e and common spelling
+    variants folded ("time"/"rhyme" -> "ime", "sky"/"high" -> "y").
+    """
+    word = word.lower().strip("'")
+    if word.endswith("'s"):
+        word = word[:-2]
+    if word in RHYME_OVERRIDES:
+        return RHYME_OVERRIDES[word]
+    groups = VOWELS_RE.findall(word)
+    # Multi-syllable words ending in consonant+y rhyme with "free"
+    if len(groups) > 1 and re.search(r"[^aeiou]y$", word):
+        return "ee"
+    silent_e = len(groups) > 1 and re.search(r"[^aeiou]e$", word)
+    stem = word[:-1] if silent_e else word
+    match = re.search(r"[aeiouy]+[^aeiouy]*$", stem)
+    key = (match.group(0) if match else stem) + ("e" if silent_e else "")
+    if key.startswith("igh"):
+        key = "y" + key[3:]
+    return RHYME_EQUIVALENTS.get(key, key)
+
+
+class LyricsEngine:
+    """
+    CPU-only lyrics writer: a backward word-trigram Markov model trained on
+    the bundled corpus. Lines are generated from their last word back to
+    the first, so rhyme words are chosen up front and the chain fills in
+    the rest. Trains lazily on first use; a song takes a few milliseconds.
+    """
+
+    def __init__(self, corpus_path=CORPUS_PATH, min_words=5, max_words=11):
+        self.corpus_path = corpus_path
+        self.min_words = min_words
+        self.max_words = max_words
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self._train(self._read_corpus())
+                self._loaded = True
+
+    def _read_corpus(self):
+        """{theme: [line, ...]} from the "## theme" sections of the corpus"""
+        themes = defaultdict(list)
+        theme = "life"
+        with open(self.corpus_path, encoding="utf-8") as f:
+            for raw in f:
+                line = raw.strip()
+                if line.startswith("## "):
+                    theme = line[3:].strip().lower()
+                elif line and not line.startswith("#"):
+                    themes[theme].append(line)
+        return themes
+
+    def _train(self, themes):
+        start = time.time()
+        # Global and per-theme tables; values are lists so random.choice
+        # samples in proportion to counts
+        self._trigrams = defaultdict(list)
+        self._bigrams = defaultdict(list)
+        self._theme_trigrams = {}
+        self._end_words = {}
+        self._rhymes = defaultdict(set)
+        self._casing = {}
+        self._corpus_lines = set()
+
+        for theme, lines in themes.items():
+            theme_trigrams = defaultdict(list)
+            end_words = []
+            for line in lines:
+                words = WORD_RE.findall(line.lower())
+                if not words:
+                    continue
+                for original in re.findall(r"[A-Za-z']+", line)[1:]:
+                    self._casing.setdefault(original.lower(), original)
+                self._corpus_lines.add(" ".join(words))
+                end_words.append(words[-1])
+
+                # Backward sequence: </s> last ... first <s>
+                seq = [LINE_END] + words[::-1] + [LINE_START]
+                for i in range(len(seq) - 2):
+                    key = (seq[i], seq[i + 1])
+                    self._trigrams[key].append(seq[i + 2])
+                    theme_trigrams[key].append(seq[i + 2])
+                for i in range(1, len(seq) - 1):
+                    self._bigrams[seq[i]].append(seq[i + 1])
+
+            self._theme_trigrams[theme] = theme_trigrams
+            self._end_words[theme] = end_words
+
+        # Rhyme partners come from words that end a corpus line, so lines
+        # never stop on "and" or "the"
+        for words in self._end_words.values():
+            for word in words:
+                self._rhymes[rhyme_key(word)].add(word)
+        log.info(f"📚 Lyrics engine trained on {len(self._corpus_lines)} lines ({(time.time()-start)*1000:.0f}ms)")
+
+    def _next_word(self, rng, theme, prev, current):
+        table = self._theme_trigrams.get(theme)
+        options = None
+        if table is not None and rng.random() < 0.7:
+            options = table.get((prev, current))
+        if not options:
+            options = self._trigrams.get((prev, current)) or self._bigrams.get(current)
+        return rng.choice(options) if options else LINE_START
+
+    def generate_line(self, rng, end_word, theme=None, attempts=8):
+        """One lyric line ending in end_word"""
+        best = None
+        for _ in range(attempts):
+            words = [end_word]
+            prev, current = LINE_END, end_word
+            while len(words) < self.max_words:
+                word = self._next_word(rng, theme, prev, current)
+                if word == LINE_START:
+                    break
+                words.append(word)
+                prev, current = current, word
+            words.reverse()
+            best = words
+            # Prefer lines of a singable length that neither loop ("of the
+            # window of the window") nor copy the corpus verbatim
+            pairs = list(zip(words, words[1:]))
+            if (len(words) >= self.min_words and len(set(pairs)) == len(pairs)
+                    and " ".join(words) not in self._corpus_lines):
+                break
+        return self._format(best)
+
+    def _format(self, words):
+        cased = [self._casing.get(w, w) for w in words]
+        cased = ["I" if w == "i" else w for w in cased]
+        return cased[0][:1].upper() + cased[0][1:] + ("" if len(cased) == 1 else " " + " ".join(cased[1:]))
+
+    def _rhyme_pair(self, rng, pool, used):
+        """Two different end words that rhyme, drawn from the theme pool"""
+        candidates = list(pool)
+        rng.shuffle(candidates)
+        for word in candidates:
+            partners = [w for w in self._rhymes[rhyme_key(word)] if w != word and w not in used]
+            if word not in used and partners:
+                return word, rng.choice(partners)
+        first, second = rng.choice(pool), rng.choice(pool)
+        return first, second
+
+    def generate_section(self, rng, theme, pool, kind="verse", lines=4, used=None):
+        used = set() if used is None else used
+        scheme = rng.choice(SCHEMES.get(kind, ("AABB",)))
+        ends = [None] * lines
+        for letter in sorted(set(scheme)):
+            slots = [i for i, c in enumerate(scheme[:lines]) if c == letter]
+            a, b = self._rhyme_pair(rng, pool, used)
+            used.update((a, b))
+            for j, slot in enumerate(slots):
+                ends[slot] = a if j % 2 == 0 else b
+        return [self.generate_line(rng, end, theme) for end in ends if end]
+
+    def generate_song(self, structure, theme="life", mood=None, seed=None):
+        """
+        Write a song following structure (e.g. ["Verse 1", "Chorus"]).
+        Returns (title, lyrics_text); the chorus repeats verbatim and an
+        Outro reprises its last two lines.
+        """
+        self._ensure_loaded()
+        rng = random.Random(seed)
+        theme = theme if theme in self._end_words else "life"
+        pool = list(self._end_words[theme])
+        mood_theme = MOOD_THEMES.get(mood)
+        if mood_theme in self._end_words and mood_theme != theme:
+            pool += self._end_words[mood_theme]
+
+        used = set()
+        chorus = None
+        sections = []
+        for label in structure:
+            kind = label.split()[0].lower()
+            if kind == "chorus":
+                if chorus is None:
+                    chorus = self.generate_section(rng, theme, pool, "chorus", 4, used)
+                body = chorus
+            elif kind == "outro":
+                if chorus is None:
+                    chorus = self.generate_section(rng, theme, pool, "chorus", 4, used)
+                body = chorus[-2:]
+            else:
+                body = self.generate_section(rng, theme, pool, kind, 4, used)
+            sections.append(f"[{label}]\n" + "\n".join(body))
+
+        hook = chorus[0] if chorus else sections[0].split("\n")[1]
+        title = self._title(hook)
+        return title, f"# {title}\n\n" + "\n\n".join(sections)
+
+    @staticmethod
+    def _title(hook):
+        """Tail of the hook line without a dangling lead-in, e.g. "My Fire\""""
+        words = hook.split()[-3:]
+        while len(words) > 1 and words[0].lower() in TITLE_STOPWORDS:
+            words = words[1:]
+        return " ".join(w.capitalize() if w != "I" else w for w in words)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Process-wide engine; the corpus is only read when first used"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = LyricsEngine()
+        return _engine
@@ -0,0 +1,64 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+class LyricsVariantCache:
+    """
+    Spare lyric variants from multi-choice completions, keyed by prompt and
+    song_length. "Regenerate lyrics" pops one of these instead of paying
+    another round trip; each variant is handed out once.
+    """
+
+    def __init__(self, ttl_seconds=None, max_prompts=512):
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("LYRICS_VARIANT_TTL_SECONDS", "1800"))
+        self.ttl_seconds = ttl_seconds
+        self.max_prompts = max_prompts
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(prompt, song_length):
+        prompt = re.sub(r"\s+", " ", prompt or "").strip().lower().rstrip(".!?,;:")
+        return f"{prompt}|{song_length}"
+
+    def put(self, key, variants):
+        """Queue variants behind any still cached for the same key"""
+        if not variants:
+            return
+        with self._lock:
+            self._evict(time.time())
+            entry = self._entries.pop(key, None)
+            queued = entry[1] if entry else []
+            self._entries[key] = (time.time(), queued + list(variants))
+            while len(self._entries) > self.max_prompts:
+                self._entries.popitem(last=False)
+
+    def take(self, key):
+        """Next unused variant for key, or None"""
+        with self._lock:
+            self._evict(time.time())
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            variant = entry[1].pop(0)
+            if not entry[1]:
+                del self._entries[key]
+            return variant
+
+    def remaining(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return len(entry[1]) if entry else 0
+
+    def _evict(self, now):
+        # Entries are in insertion order, so expired ones sit at the front
+        cutoff = now - self.ttl_seconds
+        while self._entries:
+            key, (created_at, _) = next(iter(self._entries.items()))
+            if created_at >= cutoff:
+                break
+            del self._entries[key]
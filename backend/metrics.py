@@ -0,0 +1,246 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+import tracing
+
+
+# Stage latencies run from milliseconds (file copy) to minutes (MusicGen)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 4, 5, 7.5,
+                   10, 15, 20, 25, 30, 45, 60, 90, 120, 180, 300)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(v) for v in labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def inc(self, *labels, amount=1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels):
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}_total{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """
+    Point-in-time value per label set. set_function() registers a callback
+    read at scrape time, for values owned elsewhere (queue depth, limiters).
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, *labels, amount=1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labels, amount=1.0):
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track_inprogress(self, *labels):
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+    def set_function(self, function):
+        """function() -> {label tuple: value}, replacing stored values"""
+        self._function = function
+
+    def render(self):
+        if self._function is not None:
+            items = sorted((tuple(str(v) for v in k), float(v)) for k, v in self._function().items())
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket latency histogram per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        """Observe the duration of the block, whether or not it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*labels, value=time.perf_counter() - start)
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, ([*counts], total, n)) for k, (counts, total, n) in self._values.items())
+        lines = self.header()
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "prompt2track_stage_duration_seconds",
+    "Time spent in one pipeline stage, including provider queueing",
+    ["stage"],
+))
+FALLBACKS = REGISTRY.register(Counter(
+    "prompt2track_fallbacks",
+    "Degraded results served instead of the provider's",
+    ["kind"],
+))
+CACHE_HITS = REGISTRY.register(Counter(
+    "prompt2track_cache_hits",
+    "Requests answered from a cache or shared with an in-flight job",
+    ["cache"],
+))
+CACHE_MISSES = REGISTRY.register(Counter(
+    "prompt2track_cache_misses",
+    "Cache lookups that had to do the work",
+    ["cache"],
+))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "prompt2track_jobs_in_flight",
+    "Jobs currently running",
+    ["kind"],
+))
+REQUESTS = REGISTRY.register(Counter(
+    "prompt2track_requests",
+    "Finished API requests by endpoint and status code",
+    ["endpoint", "status"],
+))
+PROVIDER_IN_FLIGHT = REGISTRY.register(Gauge(
+    "prompt2track_provider_calls_in_flight",
+    "Upstream calls holding a provider slot",
+    ["provider"],
+))
+PROVIDER_WAITING = REGISTRY.register(Gauge(
+    "prompt2track_provider_calls_waiting",
+    "Upstream calls waiting for provider capacity",
+    ["provider"],
+))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "prompt2track_admission_queue_depth",
+    "Requests waiting for admission, per priority",
+    ["priority"],
+))
+RECLAIMED_BYTES = REGISTRY.register(Counter(
+    "prompt2track_retention_reclaimed_bytes",
+    "Disk space freed by the retention sweeper",
+    ["reason"],
+))
+EVICTIONS = REGISTRY.register(Counter(
+    "prompt2track_retention_evictions",
+    "Generations (or orphan files) removed by the retention sweeper",
+    ["reason"],
+))
+DISK_USAGE = REGISTRY.register(Gauge(
+    "prompt2track_asset_bytes",
+    "Bytes used by generated assets at the last retention sweep",
+    ["dir"],
+))
+BREAKER_OPEN = REGISTRY.register(Gauge(
+    "prompt2track_breaker_open",
+    "1 while a provider's circuit breaker is open or half-open",
+    ["provider"],
+))
+
+
+@contextmanager
+def stage_timer(stage, **attributes):
+    """
+    with stage_timer("musicgen_prediction"): ...
+    Records the stage histogram and a trace span of the same name.
+    """
+    with tracing.span(stage, **attributes), STAGE_SECONDS.time(stage):
+        yield
+
+
+def cache_result(cache, hit):
+    (CACHE_HITS if hit else CACHE_MISSES).inc(cache)
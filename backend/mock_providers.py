@@ -0,0 +1,326 @@
+"""
+Stand-in servers for the OpenAI chat/images and Replicate prediction APIs,
+for load tests that should not spend real credits.
+
+    python mock_providers.py --port 8900
+
+then point the backend at it:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1
+    REPLICATE_BASE_URL=http://127.0.0.1:8900
+
+Latency, failure rate and payload size are set per provider with
+MOCK_<PROVIDER>_LATENCY / _FAILURE_RATE and MOCK_AUDIO_BYTES /
+MOCK_IMAGE_BYTES (providers: CHAT, IMAGE, MUSIC). Latency specs:
+
+    fixed:2          always 2s
+    uniform:1:3      between 1s and 3s
+    exp:2            exponential, mean 2s
+    lognormal:2:0.5  log-normal, median 2s, sigma 0.5 (long right tail)
+"""
+import argparse
+import asyncio
+import base64
+import math
+import os
+import random
+import re
+import struct
+import time
+import uuid
+import zlib
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from lyrics_engine import get_engine
+
+
+# Roughly what the real providers look like from here
+DEFAULT_PROFILES = {
+    "chat": {"latency": "lognormal:3:0.4", "failure_rate": 0.0},
+    "image": {"latency": "lognormal:12:0.3", "failure_rate": 0.0},
+    "music": {"latency": "lognormal:20:0.3", "failure_rate": 0.0},
+}
+
+# 15s of 16-bit 32kHz stereo, and a typical DALL·E PNG
+DEFAULT_AUDIO_BYTES = 15 * 32000 * 4
+DEFAULT_IMAGE_BYTES = 1_500_000
+
+# Music latency is given for a 15s clip and scales with the requested duration
+MUSIC_REFERENCE_SECONDS = 15
+
+
+def parse_latency(spec):
+    """Latency spec ("lognormal:3:0.4") -> sampler(rng) returning seconds"""
+    kind, *args = str(spec).split(":")
+    try:
+        values = [float(a) for a in args]
+    except ValueError:
+        raise ValueError(f"Bad latency spec: {spec!r}")
+    samplers = {
+        "fixed": (1, lambda rng, s: s),
+        "uniform": (2, lambda rng, lo, hi: rng.uniform(lo, hi)),
+        "exp": (1, lambda rng, mean: rng.expovariate(1 / mean) if mean > 0 else 0.0),
+        "lognormal": (2, lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0),
+    }
+    if kind not in samplers or len(values) != samplers[kind][0]:
+        raise ValueError(f"Bad latency spec: {spec!r} (use fixed:S, uniform:A:B, exp:MEAN or lognormal:MEDIAN:SIGMA)")
+    sample = samplers[kind][1]
+    return lambda rng: max(0.0, sample(rng, *values))
+
+
+class ProviderProfile:
+    """Latency distribution and failure rate of one mocked provider"""
+
+    def __init__(self, latency, failure_rate=0.0):
+        self.spec = latency
+        self.sample = parse_latency(latency)
+        self.failure_rate = float(failure_rate)
+
+    @classmethod
+    def from_env(cls, name):
+        defaults = DEFAULT_PROFILES[name]
+        prefix = f"MOCK_{name.upper()}"
+        return cls(
+            os.getenv(f"{prefix}_LATENCY", defaults["latency"]),
+            os.getenv(f"{prefix}_FAILURE_RATE", defaults["failure_rate"]),
+        )
+
+    def fails(self, rng):
+        return rng.random() < self.failure_rate
+
+    def describe(self):
+        return {"latency": self.spec, "failure_rate": self.failure_rate}
+
+
+def wav_bytes(size):
+    """Silent 16-bit stereo WAV of about `size` bytes"""
+    data_size = max(0, size - 44) // 4 * 4
+    header = b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+    header += b"fmt " + struct.pack("<IHHIIHH", 16, 1, 2, 32000, 32000 * 4, 4, 16)
+    header += b"data" + struct.pack("<I", data_size)
+    return header + bytes(data_size)
+
+
+def png_bytes(size, width=64, height=64):
+    """
+    Small valid PNG padded to about `size` bytes with a private ancillary
+    chunk, so decoders accept it and transfer sizes stay realistic.
+    """
+    def chunk(kind, body):
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+    row = b"\x00" + bytes([40, 30, 90]) * width
+    png = b"\x89PNG\r\n\x1a\n"
+    png += chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+    png += chunk(b"IDAT", zlib.compress(row * height))
+    padding = size - len(png) - 12 - 12
+    if padding > 0:
+        png += chunk(b"pdDg", bytes(padding))
+    return png + chunk(b"IEND", b"")
+
+
+class MockState:
+    """Shared config, payload cache and in-memory predictions"""
+
+    def __init__(self, chat=None, image=None, music=None, audio_bytes=None, image_bytes=None, seed=None):
+        self.profiles = {
+            "chat": chat or ProviderProfile.from_env("chat"),
+            "image": image or ProviderProfile.from_env("image"),
+            "music": music or ProviderProfile.from_env("music"),
+        }
+        self.audio = wav_bytes(int(audio_bytes or os.getenv("MOCK_AUDIO_BYTES", DEFAULT_AUDIO_BYTES)))
+        self.image = png_bytes(int(image_bytes or os.getenv("MOCK_IMAGE_BYTES", DEFAULT_IMAGE_BYTES)))
+        self.rng = random.Random(seed)
+        self.predictions = {}
+        self.calls = {name: 0 for name in self.profiles}
+        self.failures = {name: 0 for name in self.profiles}
+
+    async def delay(self, provider, scale=1.0):
+        """Sleep for one sampled latency; returns True if this call should fail"""
+        profile = self.profiles[provider]
+        self.calls[provider] += 1
+        await asyncio.sleep(profile.sample(self.rng) * scale)
+        if profile.fails(self.rng):
+            self.failures[provider] += 1
+            return True
+        return False
+
+
+def _error(status, message):
+    return JSONResponse(status_code=status, content={"error": {"message": message, "type": "mock_error"}})
+
+
+def _song_text(user_prompt, seed):
+    """Lyrics shaped like the real completion, from the offline engine"""
+    engine = get_engine()
+    sections = re.findall(r"\[([^\]]+)\]", user_prompt.split("Sections, in order:", 1)[-1])
+    title, text = engine.generate_song(sections or ["Verse 1", "Chorus"], seed=seed)
+    return text
+
+
+def _completion_text(user_prompt, rng):
+    album = re.match(r"Write an album of (\d+) songs", user_prompt)
+    if not album:
+        return _song_text(user_prompt, rng.random())
+    songs = [_song_text(user_prompt, rng.random()) for _ in range(int(album.group(1)))]
+    return "Album: Mock Sessions\n\n" + "\n\n".join(songs)
+
+
+def create_app(state=None):
+    state = state or MockState()
+    app = FastAPI(title="Prompt2Track mock providers")
+    app.state.mock = state
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if await state.delay("chat"):
+            return _error(500, "Mock chat failure")
+        user_prompt = next((m["content"] for m in reversed(body.get("messages", [])) if m.get("role") == "user"), "")
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        choices = []
+        completion_tokens = 0
+        for index in range(int(body.get("n", 1))):
+            text = _completion_text(user_prompt, state.rng)
+            completion_tokens += len(text) // 4
+            choices.append({
+                "index": index,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            })
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": choices,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.post("/v1/images/generations")
+    async def image_generations(request: Request):
+        body = await request.json()
+        # HD renders take about twice as long
+        if await state.delay("image", 2.0 if body.get("quality") == "hd" else 1.0):
+            return _error(500, "Mock image failure")
+        if body.get("response_format") == "b64_json":
+            image = {"b64_json": base64.b64encode(state.image).decode("ascii")}
+        else:
+            image = {"url": f"{str(request.base_url).rstrip('/')}/files/{uuid.uuid4().hex}.png"}
+        return {"created": int(time.time()), "data": [dict(image, revised_prompt=body.get("prompt", ""))]}
+
+    @app.post("/v1/predictions")
+    async def create_prediction(request: Request):
+        body = await request.json()
+        profile = state.profiles["music"]
+        duration = float((body.get("input") or {}).get("duration", MUSIC_REFERENCE_SECONDS))
+        state.calls["music"] += 1
+        failed = profile.fails(state.rng)
+        state.failures["music"] += failed
+        prediction_id = uuid.uuid4().hex[:16]
+        base = str(request.base_url).rstrip("/")
+        state.predictions[prediction_id] = {
+            "ready_at": time.time() + profile.sample(state.rng) * duration / MUSIC_REFERENCE_SECONDS,
+            "failed": failed,
+            "canceled": False,
+            "json": {
+                "id": prediction_id,
+                "model": "meta/musicgen",
+                "version": body.get("version", ""),
+                "input": body.get("input"),
+                "logs": "",
+                "error": None,
+                "output": None,
+                "metrics": None,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "started_at": None,
+                "completed_at": None,
+                "urls": {
+                    "get": f"{base}/v1/predictions/{prediction_id}",
+                    "cancel": f"{base}/v1/predictions/{prediction_id}/cancel",
+                },
+            },
+        }
+        return JSONResponse(status_code=201, content=_prediction_view(state, prediction_id, base))
+
+    @app.get("/v1/predictions/{prediction_id}")
+    async def get_prediction(prediction_id: str, request: Request):
+        if prediction_id not in state.predictions:
+            return _error(404, "Unknown prediction")
+        return _prediction_view(state, prediction_id, str(request.base_url).rstrip("/"))
+
+    @app.post("/v1/predictions/{prediction_id}/cancel")
+    async def cancel_prediction(prediction_id: str, request: Request):
+        if prediction_id not in state.predictions:
+            return _error(404, "Unknown prediction")
+        state.predictions[prediction_id]["canceled"] = True
+        return _prediction_view(state, prediction_id, str(request.base_url).rstrip("/"))
+
+    @app.get("/files/{name}")
+    async def files(name: str):
+        if name.endswith(".wav"):
+            return Response(state.audio, media_type="audio/wav")
+        return Response(state.image, media_type="image/png")
+
+    @app.get("/mock/stats")
+    async def stats():
+        """Calls and injected failures per provider, plus the active profiles"""
+        return {
+            "calls": state.calls,
+            "failures": state.failures,
+            "profiles": {name: p.describe() for name, p in state.profiles.items()},
+            "predictions": len(state.predictions),
+        }
+
+    return app
+
+
+def _prediction_view(state, prediction_id, base):
+    entry = state.predictions[prediction_id]
+    view = dict(entry["json"])
+    if entry["canceled"]:
+        view["status"] = "canceled"
+    elif time.time() < entry["ready_at"]:
+        view["status"] = "processing"
+    elif entry["failed"]:
+        view.update(status="failed", error="Mock prediction failure")
+    else:
+        view.update(status="succeeded", output=f"{base}/files/{prediction_id}.wav")
+    return view
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    for name in DEFAULT_PROFILES:
+        parser.add_argument(f"--{name}-latency", help=f"latency spec (default {DEFAULT_PROFILES[name]['latency']})")
+        parser.add_argument(f"--{name}-failure-rate", type=float)
+    parser.add_argument("--audio-bytes", type=int)
+    parser.add_argument("--image-bytes", type=int)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    profiles = {}
+    for name in DEFAULT_PROFILES:
+        env = ProviderProfile.from_env(name)
+        latency = getattr(args, f"{name}_latency") or env.spec
+        failure_rate = getattr(args, f"{name}_failure_rate")
+        profiles[name] = ProviderProfile(latency, env.failure_rate if failure_rate is None else failure_rate)
+
+    state = MockState(audio_bytes=args.audio_bytes, image_bytes=args.image_bytes, seed=args.seed, **profiles)
+    print(f"🧪 Mock providers on http://{args.host}:{args.port}: "
+          + ", ".join(f"{n} {p.spec} ({p.failure_rate:.0%} fail)" for n, p in state.profiles.items()))
+
+    import uvicorn
+    uvicorn.run(create_app(state), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
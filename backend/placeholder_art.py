@@ -0,0 +1,146 @@
+import hashlib
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from structured_logging import get_logger
+
+log = get_logger("placeholder_art")
+
+
+class PlaceholderCoverRenderer:
+    """
+    CPU-only procedural album cover, rendered in a few milliseconds.
+    Gradient and palette follow the genre, shapes follow the mood and
+    the lyrics title is set as typography, so every song gets a cover
+    while DALL·E is still working (or has failed).
+    """
+
+    # (top-left, bottom-right, accent) colors per genre
+    genre_palettes = {
+        "jazz": ((40, 22, 60), (196, 120, 48), (255, 214, 140)),
+        "rock": ((20, 20, 24), (160, 20, 30), (240, 240, 240)),
+        "electronic": ((10, 8, 40), (0, 180, 200), (255, 60, 200)),
+        "pop": ((255, 110, 150), (120, 90, 255), (255, 255, 255)),
+        "classical": ((30, 36, 60), (200, 180, 140), (250, 240, 210)),
+        "hip-hop": ((16, 16, 16), (220, 160, 20), (255, 255, 255)),
+        "indie": ((60, 90, 80), (230, 190, 150), (250, 245, 230)),
+        "ambient": ((8, 24, 48), (90, 160, 190), (220, 240, 255)),
+    }
+
+    mood_shapes = {
+        "calm": "circles",
+        "happy": "bubbles",
+        "sad": "rain",
+        "energetic": "stripes",
+        "romantic": "circles",
+        "dark": "shards",
+    }
+
+    def __init__(self, size=512):
+        self.size = size
+        self._font_cache = {}
+        # Gradient coordinates only depend on size, so build them once
+        ramp = np.linspace(0.0, 1.0, size, dtype=np.float32)
+        self._diagonal = ((ramp[None, :] + ramp[:, None]) / 2.0)[..., None]
+        yy, xx = np.mgrid[0:size, 0:size].astype(np.float32) / (size - 1)
+        self._vignette = (1.0 - 0.55 * ((xx - 0.5) ** 2 + (yy - 0.5) ** 2))[..., None]
+
+    def _font(self, px):
+        font = self._font_cache.get(px)
+        if font is None:
+            for name in ("DejaVuSans-Bold.ttf", "Arial Bold.ttf", "arialbd.ttf"):
+                try:
+                    font = ImageFont.truetype(name, px)
+                    break
+                except OSError:
+                    continue
+            else:
+                try:
+                    font = ImageFont.load_default(size=px)
+                except TypeError:
+                    font = ImageFont.load_default()
+            self._font_cache[px] = font
+        return font
+
+    def render(self, title, genre="indie", mood="balanced"):
+        """Return a PIL image for the given title/genre/mood"""
+        top, bottom, accent = self.genre_palettes.get(genre, self.genre_palettes["indie"])
+        # Seed from the content so the same song always gets the same cover
+        seed = int(hashlib.md5(f"{title}|{genre}|{mood}".encode("utf-8")).hexdigest()[:8], 16)
+        rng = np.random.default_rng(seed)
+
+        top_arr = np.array(top, dtype=np.float32)
+        bottom_arr = np.array(bottom, dtype=np.float32)
+        pixels = top_arr * (1.0 - self._diagonal) + bottom_arr * self._diagonal
+        pixels *= self._vignette
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+
+        overlay = Image.new("RGBA", (self.size, self.size), (0, 0, 0, 0))
+        self._draw_shapes(ImageDraw.Draw(overlay), self.mood_shapes.get(mood, "circles"), accent, rng)
+        image = Image.alpha_composite(image.convert("RGBA"), overlay)
+
+        self._draw_title(ImageDraw.Draw(image), title, accent)
+        return image.convert("RGB")
+
+    def _draw_shapes(self, draw, style, accent, rng):
+        s = self.size
+        if style == "stripes":
+            for _ in range(7):
+                x = int(rng.integers(-s // 2, s))
+                width = int(rng.integers(s // 40, s // 12))
+                draw.polygon([(x, s), (x + width, s), (x + width + s // 2, 0), (x + s // 2, 0)],
+                             fill=accent + (int(rng.integers(40, 110)),))
+        elif style == "rain":
+            for _ in range(60):
+                x, y = int(rng.integers(0, s)), int(rng.integers(0, s))
+                length = int(rng.integers(s // 30, s // 8))
+                draw.line([(x, y), (x - length // 4, y + length)], fill=accent + (90,), width=2)
+        elif style == "shards":
+            for _ in range(6):
+                points = [(int(rng.integers(0, s)), int(rng.integers(0, s))) for _ in range(3)]
+                draw.polygon(points, fill=accent + (int(rng.integers(30, 80)),))
+        else:
+            count = 18 if style == "bubbles" else 5
+            for _ in range(count):
+                r = int(rng.integers(s // 30, s // 10 if style == "bubbles" else s // 3))
+                x, y = int(rng.integers(0, s)), int(rng.integers(0, s))
+                draw.ellipse([x - r, y - r, x + r, y + r], outline=accent + (140,), width=3,
+                             fill=accent + (int(rng.integers(15, 60)),))
+
+    def _draw_title(self, draw, title, accent):
+        s = self.size
+        words = (title or "Untitled").upper().split()
+        font = self._font(max(18, s // 12))
+
+        # Greedy wrap to ~80% of the cover width
+        lines, current = [], ""
+        for word in words:
+            candidate = f"{current} {word}".strip()
+            if current and draw.textlength(candidate, font=font) > s * 0.8:
+                lines.append(current)
+                current = word
+            else:
+                current = candidate
+        lines.append(current)
+
+        line_height = int(font.size * 1.2) if hasattr(font, "size") else 20
+        y = s - s // 12 - line_height * len(lines)
+        for line in lines[:3]:
+            draw.text((s // 12 + 2, y + 2), line, font=font, fill=(0, 0, 0))
+            draw.text((s // 12, y), line, font=font, fill=accent)
+            y += line_height
+
+    def save(self, title, genre, mood, directory):
+        """Render and write a JPEG into directory; returns the file path"""
+        start = time.time()
+        os.makedirs(directory, exist_ok=True)
+        ts = datetime.now().strftime("%Y%m%d-%H%M%S")
+        digest = hashlib.md5(f"{title}|{genre}|{mood}|{time.time_ns()}".encode("utf-8")).hexdigest()[:6]
+        filename = os.path.join(directory, f"placeholder_{ts}_{digest}.jpg")
+        # JPEG encodes several times faster than PNG and these covers are short-lived
+        self.render(title, genre, mood).save(filename, "JPEG", quality=88)
+        log.info(f"🖼️ Placeholder cover rendered → {filename} ({(time.time()-start)*1000:.0f}ms)")
+        return filename
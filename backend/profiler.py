@@ -0,0 +1,176 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import tracing
+from structured_logging import get_logger
+
+log = get_logger("profiler")
+
+
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+# Per-request profiles running at once; further X-Profile requests run unprofiled
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "2"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+
+# Leaf frames of threads parked waiting for work, I/O or a lock
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("handlers.py", "dequeue"),
+    ("thread.py", "_worker"),
+    ("_base.py", "wait"),
+    ("_base.py", "result"),
+    ("socket.py", "readinto"),
+    ("ssl.py", "read"),
+    ("ssl.py", "recv_into"),
+}
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame):
+    """Root-first ';'-joined stack of a frame, in flamegraph.pl's collapsed format"""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def is_idle(frame):
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+class StackSampler:
+    """
+    Wall-clock sampling profiler. A background thread snapshots every other
+    thread's Python stack each interval (sys._current_frames) and counts
+    identical stacks. Overhead is one stack walk per thread per interval and
+    nothing at all in the sampled threads.
+    trace_id restricts samples to threads currently inside that trace's spans,
+    with the span name as the root frame.
+    """
+
+    def __init__(self, interval=None, include_idle=False, trace_id=None):
+        self.interval = (interval if interval is not None else PROFILE_INTERVAL_MS) / 1000
+        self.include_idle = include_idle
+        self.trace_id = trace_id
+        self.counts = Counter()
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def run(self, seconds):
+        """Sample for a fixed time (blocking)"""
+        self.start()
+        self._stop.wait(seconds)
+        return self.stop()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if not self.include_idle and is_idle(frame):
+                    continue
+                if self.trace_id is not None:
+                    span = tracing.thread_span(ident)
+                    if span is None or span.trace_id != self.trace_id:
+                        continue
+                    root = f"{names.get(ident, ident)};[{span.name}]"
+                else:
+                    root = str(names.get(ident, ident))
+                self.counts[f"{root};{collapse(frame)}"] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """One "stack count" line per distinct stack, heaviest first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+    def summary(self):
+        return {
+            "seconds": round(self.elapsed, 3),
+            "interval_ms": self.interval * 1000,
+            "ticks": self.samples,
+            "stacks": len(self.counts),
+            "samples": sum(self.counts.values()),
+        }
+
+
+class Profiler:
+    """
+    One server-wide profile at a time (GET /debug/profile) plus up to
+    PROFILE_MAX_CONCURRENT per-request profiles, the last PROFILE_KEEP of
+    which are kept for download by trace ID.
+    """
+
+    def __init__(self):
+        self._global = threading.Lock()
+        self._requests = threading.BoundedSemaphore(PROFILE_MAX_CONCURRENT)
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def profile(self, seconds, interval=None, include_idle=False):
+        """Blocking whole-process profile; None when one is already running"""
+        if not self._global.acquire(blocking=False):
+            return None
+        try:
+            seconds = min(max(seconds, 0.1), PROFILE_MAX_SECONDS)
+            log.info(f"🔬 Profiling all threads for {seconds:.1f}s")
+            sampler = StackSampler(interval, include_idle).run(seconds)
+            log.info(f"🔬 Profile done: {sampler.summary()}")
+            return sampler
+        finally:
+            self._global.release()
+
+    def start_request(self, trace_id, interval=None):
+        """Sampler for one request's threads, or None when too many are running"""
+        if not self._requests.acquire(blocking=False):
+            log.warning("⚠️ Per-request profile skipped, too many running")
+            return None
+        # Keep waits: for one request, time blocked on a provider is the answer
+        return StackSampler(interval, include_idle=True, trace_id=trace_id).start()
+
+    def finish_request(self, sampler):
+        try:
+            sampler.stop()
+        finally:
+            self._requests.release()
+        with self._lock:
+            self._profiles[sampler.trace_id] = sampler
+            while len(self._profiles) > PROFILE_KEEP:
+                self._profiles.popitem(last=False)
+
+    def get(self, trace_id):
+        with self._lock:
+            return self._profiles.get(trace_id)
+
+
+profiler = Profiler()
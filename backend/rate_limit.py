@@ -0,0 +1,221 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import tracing
+from deadline import LatencyTracker
+from structured_logging import NOISY, get_logger
+
+log = get_logger("rate_limit")
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a request waited longer than allowed for provider capacity"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at rate_per_minute.
+    Callers block until enough tokens are available instead of failing.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity or max(1.0, rate_per_minute / 6.0))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1.0, timeout=None):
+        """Take amount tokens, waiting as needed. Returns seconds waited."""
+        # Oversized requests still go through once the bucket is full
+        amount = min(float(amount), self.capacity)
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= amount:
+                    self._tokens -= amount
+                    return now - start
+
+                wait = max(self._paused_until - now, (amount - self._tokens) / self.rate)
+                if deadline is not None:
+                    if now + wait > deadline:
+                        raise RateLimitTimeout(f"waited {now - start:.1f}s for rate limit capacity")
+                self._cond.wait(wait)
+
+    def adjust(self, delta):
+        """Credit (positive) or debit (negative) tokens after real usage is known"""
+        with self._cond:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + delta)
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Stop handing out tokens for a while (e.g. after an upstream 429)"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def available(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class ProviderLimiter:
+    """
+    Concurrency cap plus request and token buckets for one upstream provider.
+    """
+
+    def __init__(self, name, max_concurrency, requests_per_minute, tokens_per_minute=None, max_wait=None):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        # Recent upstream call durations (slot held), for readiness reporting
+        self.latency = LatencyTracker(name, window=50, min_samples=1)
+
+    @contextmanager
+    def slot(self, tokens=0, timeout=None):
+        """
+        Hold one provider slot for the duration of an upstream call.
+        timeout caps the queueing time below max_wait (e.g. a stage deadline).
+        Yields the tokens actually reserved, which settle() reconciles: an
+        estimate above the bucket's capacity only takes the capacity.
+        """
+        start = time.monotonic()
+        max_wait = self.max_wait
+        if timeout is not None:
+            max_wait = timeout if max_wait is None else min(max_wait, timeout)
+        with self._lock:
+            self.waiting += 1
+        try:
+            with tracing.span("rate_limit_wait", provider=self.name):
+                reserved = self._acquire(start, max_wait, tokens)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+        waited = time.monotonic() - start
+        if waited > 0.05:
+            log.info(f"⏳ {self.name} throttled for {waited:.2f}s", extra=NOISY)
+
+        with self._lock:
+            self.in_flight += 1
+        called = time.monotonic()
+        try:
+            with tracing.span("provider_call", provider=self.name):
+                yield reserved
+        finally:
+            self.latency.record(time.monotonic() - called)
+            with self._lock:
+                self.in_flight -= 1
+            self._semaphore.release()
+
+    def _acquire(self, start, max_wait, tokens):
+        """
+        Concurrency slot, then request and token budget, within max_wait.
+        Returns the tokens taken from the token bucket.
+        """
+        if not self._semaphore.acquire(timeout=max_wait):
+            raise RateLimitTimeout(f"{self.name}: no free slot after {max_wait:.1f}s")
+        reserved = 0.0
+        try:
+            self._requests.acquire(1, timeout=self._remaining(start, max_wait))
+            if self._tokens is not None and tokens:
+                reserved = min(float(tokens), self._tokens.capacity)
+                self._tokens.acquire(reserved, timeout=self._remaining(start, max_wait))
+        except Exception:
+            self._semaphore.release()
+            raise
+        return reserved
+
+    @staticmethod
+    def _remaining(start, max_wait):
+        if max_wait is None:
+            return None
+        return max(0.0, max_wait - (time.monotonic() - start))
+
+    def settle(self, reserved_tokens, actual_tokens):
+        """Reconcile the tokens slot() reserved (what it yielded) with real usage"""
+        if self._tokens is not None and actual_tokens is not None:
+            self._tokens.adjust(reserved_tokens - actual_tokens)
+
+    def backoff(self, seconds):
+        """Upstream said slow down: hold all new requests for a while"""
+        log.warning(f"🐢 {self.name} rate limited upstream, backing off {seconds:.1f}s")
+        self._requests.pause(seconds)
+
+    def snapshot(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "free_slots": max(0, self.max_concurrency - self.in_flight),
+            "waiting": self.waiting,
+            "latency": self.latency.snapshot(),
+        }
+
+
+def is_rate_limit_error(exc):
+    """True if an SDK exception is an upstream 429"""
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429 or "429" in str(exc) or "rate limit" in str(exc).lower()
+
+
+def _env_number(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+# Defaults sit below typical account limits; override per deployment
+PROVIDER_DEFAULTS = {
+    "openai_chat": {"concurrency": 8, "rpm": 500, "tpm": 200000},
+    "openai_images": {"concurrency": 4, "rpm": 50, "tpm": None},
+    "replicate": {"concurrency": 4, "rpm": 600, "tpm": None},
+}
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name):
+    """
+    Shared limiter for a provider, configured from the environment, e.g.
+    OPENAI_CHAT_MAX_CONCURRENCY, OPENAI_CHAT_RPM, OPENAI_CHAT_TPM.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            defaults = PROVIDER_DEFAULTS[name]
+            prefix = name.upper()
+            tpm = _env_number(f"{prefix}_TPM", defaults["tpm"] or 0)
+            limiter = ProviderLimiter(
+                name,
+                max_concurrency=int(_env_number(f"{prefix}_MAX_CONCURRENCY", defaults["concurrency"])),
+                requests_per_minute=_env_number(f"{prefix}_RPM", defaults["rpm"]),
+                tokens_per_minute=tpm or None,
+                max_wait=_env_number("RATE_LIMIT_MAX_WAIT_SECONDS", 120.0),
+            )
+            _limiters[name] = limiter
+        return limiter
+
+
+def limiter_states():
+    """Snapshot of every limiter created so far"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {l.name: l.snapshot() for l in limiters}
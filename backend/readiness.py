@@ -0,0 +1,102 @@
+import os
+import shutil
+import time
+
+
+READINESS_TTL_SECONDS = float(os.getenv("READINESS_TTL_SECONDS", "2"))
+# Below this much free disk the instance stops taking work (x2 = degraded)
+READINESS_MIN_FREE_MB = float(os.getenv("READINESS_MIN_FREE_MB", "500"))
+# Share of the normal-priority queue that may be filled while all slots are busy
+READINESS_MAX_QUEUE_FILL = float(os.getenv("READINESS_MAX_QUEUE_FILL", "0.5"))
+
+# Providers whose outage stops /generate outright; the others have fallbacks
+# (local lyrics engine, placeholder covers)
+CRITICAL_PROVIDERS = {"replicate"}
+# Same for generators that failed to start
+CRITICAL_GENERATORS = {"music_generator"}
+
+READY, DEGRADED, UNREADY = "ready", "degraded", "unready"
+
+
+def disk_headroom(path):
+    """Free space on the filesystem holding path"""
+    os.makedirs(path, exist_ok=True)
+    usage = shutil.disk_usage(path)
+    return {
+        "free_mb": round(usage.free / 1024 / 1024, 1),
+        "total_mb": round(usage.total / 1024 / 1024, 1),
+        "free_pct": round(100 * usage.free / usage.total, 1) if usage.total else 0.0,
+    }
+
+
+def assess(report):
+    """
+    (status, reasons) for a capacity report. unready: this instance should
+    get no new work (503); degraded: it answers, but slower or with fallbacks.
+    """
+    unready, degraded = [], []
+
+    admission = report["admission"]
+    normal = admission["queues"]["normal"]
+    if admission["free_slots"] == 0:
+        if normal["limit"] and normal["depth"] / normal["limit"] >= READINESS_MAX_QUEUE_FILL:
+            unready.append(f"admission queue {normal['depth']}/{normal['limit']} with no free slots")
+        else:
+            degraded.append("all generation slots busy")
+
+    for name, breaker in report["breakers"].items():
+        if breaker["state"] == "closed":
+            continue
+        reason = f"{name} circuit {breaker['state']}"
+        (unready if name in CRITICAL_PROVIDERS and breaker["state"] == "open" else degraded).append(reason)
+
+    for name, generator in report["generators"].items():
+        if generator["state"] == "failed":
+            reason = f"{name} failed to start: {generator['error']}"
+            (unready if name in CRITICAL_GENERATORS else degraded).append(reason)
+        elif generator["state"] in ("starting", "degraded"):
+            degraded.append(f"{name} {generator['state']}" + (f": {generator['error']}" if generator["error"] else ""))
+
+    for name, provider in report["providers"].items():
+        if provider["waiting"]:
+            degraded.append(f"{provider['waiting']} call(s) waiting for {name}")
+
+    executors = report["executors"]
+    if executors["threadpool"]["free"] == 0:
+        degraded.append("worker threadpool exhausted")
+    if executors["cover"]["pending"] >= executors["cover"]["workers"]:
+        degraded.append(f"{executors['cover']['pending']} cover renders for {executors['cover']['workers']} workers")
+
+    for path, disk in report["disk"].items():
+        if disk["free_mb"] < READINESS_MIN_FREE_MB:
+            unready.append(f"{disk['free_mb']:.0f} MB free in {path}")
+        elif disk["free_mb"] < 2 * READINESS_MIN_FREE_MB:
+            degraded.append(f"{disk['free_mb']:.0f} MB free in {path}")
+
+    if unready:
+        return UNREADY, unready + degraded
+    return (DEGRADED if degraded else READY), degraded
+
+
+class ReadinessProbe:
+    """
+    Capacity report for load balancers. collect() builds the raw report; the
+    assessed result is cached for ttl seconds so frequent probes from many
+    balancers cost a dict lookup. Call from the event loop (collect reads
+    admission state, which is loop-only).
+    """
+
+    def __init__(self, collect, ttl=None):
+        self.collect = collect
+        self.ttl = READINESS_TTL_SECONDS if ttl is None else ttl
+        self._cached = None
+        self._cached_at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        if self._cached is None or now - self._cached_at >= self.ttl:
+            report = self.collect()
+            status, reasons = assess(report)
+            self._cached = {"status": status, "reasons": reasons, "checked_at": time.time(), **report}
+            self._cached_at = now
+        return self._cached, now - self._cached_at
@@ -0,0 +1,230 @@
+import os
+import threading
+import time
+
+from metrics import DISK_USAGE, EVICTIONS, RECLAIMED_BYTES
+from structured_logging import get_logger
+
+log = get_logger("retention")
+
+
+# Asset budget across assets/ and STATIC_DIR (0 = no size limit)
+RETENTION_MAX_MB = float(os.getenv("RETENTION_MAX_MB", "5120"))
+# Unpinned generations older than this are removed regardless of space (0 = keep)
+RETENTION_MAX_AGE_DAYS = float(os.getenv("RETENTION_MAX_AGE_DAYS", "0"))
+# Nothing younger is touched: covers still rendering, songs just returned
+RETENTION_MIN_AGE_SECONDS = float(os.getenv("RETENTION_MIN_AGE_SECONDS", "3600"))
+RETENTION_SWEEP_SECONDS = float(os.getenv("RETENTION_SWEEP_SECONDS", "600"))
+
+TRASH_DIR = ".trash"
+
+
+class RetentionSweeper:
+    """
+    Keeps generated assets inside a disk budget. Each sweep removes
+    unpinned generations past RETENTION_MAX_AGE_DAYS, then least recently
+    used ones (last /static download, else creation) until usage fits
+    RETENTION_MAX_MB. Files no generation references (older outputs, failed
+    runs) are evicted by modification time in the same order.
+
+    A generation's row and files go together: inside the index transaction
+    the files are renamed into <dir>/.trash, and only after COMMIT are they
+    unlinked. A failed rename rolls the row back. After a crash, trashed
+    files that are still indexed are restored and the rest deleted.
+    """
+
+    def __init__(self, index, directories, max_mb=None, max_age_days=None, min_age=None, interval=None):
+        self.index = index
+        self.directories = list(directories)
+        self.max_bytes = (RETENTION_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+        max_age_days = RETENTION_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        self.max_age = max_age_days * 86400
+        self.min_age = RETENTION_MIN_AGE_SECONDS if min_age is None else min_age
+        self.interval = RETENTION_SWEEP_SECONDS if interval is None else interval
+        self._accessed = {}
+        self._sweep_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.last_report = None
+
+    def touch(self, filename):
+        """Note a download; flushed to the index at the next sweep"""
+        self._accessed[filename] = time.time()
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        threading.Thread(target=self._run, name="retention", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                log.error(f"❌ Retention sweep failed: {e}", exc_info=e)
+
+    def sweep(self):
+        """One pass; returns a report of what was reclaimed"""
+        with self._sweep_lock:
+            start = time.monotonic()
+            self._recover_trash()
+            accessed, self._accessed = self._accessed, {}
+            self.index.touch(accessed)
+
+            files = self._scan()
+            usage = sum(size for size, _ in files.values())
+            report = {"files": len(files), "bytes_before": usage, "evicted": {}, "reclaimed_bytes": {}}
+            now = time.time()
+            protect_after = now - self.min_age
+
+            referenced = self.index.referenced_files()
+            orphans = sorted(
+                (mtime, name) for name, (_, mtime) in files.items() if name not in referenced and mtime < protect_after
+            )
+
+            if self.max_age:
+                cutoff = min(now - self.max_age, protect_after)
+                # Kept rows stay in the table, so page past them instead of re-reading them
+                after = None
+                while True:
+                    batch = self.index.eviction_candidates(cutoff, after=after)
+                    if not batch:
+                        break
+                    for generation_id, _, _ in batch:
+                        freed = self._evict_generation(generation_id, files, "age", report)
+                        if freed is not None:
+                            usage -= freed
+                    after = (batch[-1][1], batch[-1][0])
+                for mtime, name in [o for o in orphans if o[0] < cutoff]:
+                    usage -= self._evict_orphan(name, files, report)
+                orphans = [o for o in orphans if o[0] >= cutoff]
+
+            if self.max_bytes:
+                usage = self._enforce_budget(usage, orphans, protect_after, files, report)
+
+            report["bytes_after"] = usage
+            report["seconds"] = round(time.monotonic() - start, 3)
+            for directory in self.directories:
+                DISK_USAGE.set(directory, value=sum(size for size, _ in self._scan([directory]).values()))
+            if report["evicted"]:
+                log.info(f"🧹 Retention reclaimed {sum(report['reclaimed_bytes'].values()) / 1024 / 1024:.1f} MB "
+                         f"({report['evicted']}), {usage / 1024 / 1024:.0f} MB in use", extra=report)
+            self.last_report = dict(report, finished_at=now)
+            return self.last_report
+
+    def _enforce_budget(self, usage, orphans, protect_after, files, report):
+        """Evict indexed generations and orphan files, oldest use first, until under budget"""
+        candidates = []
+        exhausted = False
+        after = None
+        while usage > self.max_bytes:
+            if not candidates and not exhausted:
+                batch = self.index.eviction_candidates(protect_after, after=after)
+                exhausted = not batch
+                candidates = [(last_used, generation_id) for generation_id, last_used, _ in batch]
+                if batch:
+                    after = candidates[-1]
+            if candidates and (not orphans or candidates[0][0] <= orphans[0][0]):
+                _, generation_id = candidates.pop(0)
+                freed = self._evict_generation(generation_id, files, "budget", report)
+                if freed is not None:
+                    usage -= freed
+            elif orphans:
+                _, name = orphans.pop(0)
+                usage -= self._evict_orphan(name, files, report)
+            else:
+                log.warning(f"⚠️ Assets use {usage / 1024 / 1024:.0f} MB, over the {self.max_bytes / 1024 / 1024:.0f} MB "
+                            "budget, but everything left is pinned or too recent")
+                break
+        return usage
+
+    def _evict_generation(self, generation_id, files, reason, report):
+        """
+        Delete one generation and the files only it used. Returns bytes
+        freed, or None when it was kept (pinned meanwhile, or a file could
+        not be moved).
+        """
+        moved = []
+        try:
+            with self.index.deleting(generation_id) as (deleted, filenames):
+                if not deleted:
+                    return None
+                try:
+                    for filename in filenames:
+                        for directory in self.directories:
+                            path = os.path.join(directory, filename)
+                            if os.path.exists(path):
+                                trash = os.path.join(directory, TRASH_DIR)
+                                os.makedirs(trash, exist_ok=True)
+                                os.replace(path, os.path.join(trash, filename))
+                                moved.append((path, os.path.join(trash, filename)))
+                except OSError:
+                    for original, trashed in reversed(moved):
+                        os.replace(trashed, original)
+                    raise
+        except OSError as e:
+            log.warning(f"⚠️ Kept generation {generation_id}, could not remove its files: {e}")
+            return None
+        freed = 0
+        for _, trashed in moved:
+            freed += _unlink(trashed)
+        for filename in filenames:
+            files.pop(filename, None)
+        self._count(reason, freed, report)
+        return freed
+
+    def _evict_orphan(self, name, files, report):
+        freed = 0
+        for directory in self.directories:
+            freed += _unlink(os.path.join(directory, name))
+        files.pop(name, None)
+        self._count("orphan", freed, report)
+        return freed
+
+    def _count(self, reason, freed, report):
+        EVICTIONS.inc(reason)
+        RECLAIMED_BYTES.inc(reason, amount=freed)
+        report["evicted"][reason] = report["evicted"].get(reason, 0) + 1
+        report["reclaimed_bytes"][reason] = report["reclaimed_bytes"].get(reason, 0) + freed
+
+    def _scan(self, directories=None):
+        """{filename: (total bytes across directories, newest mtime)}"""
+        files = {}
+        for directory in directories or self.directories:
+            if not os.path.isdir(directory):
+                continue
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    stat = entry.stat()
+                    size, mtime = files.get(entry.name, (0, 0.0))
+                    files[entry.name] = (size + stat.st_size, max(mtime, stat.st_mtime))
+        return files
+
+    def _recover_trash(self):
+        """Finish or undo evictions interrupted by a crash"""
+        referenced = None
+        for directory in self.directories:
+            trash = os.path.join(directory, TRASH_DIR)
+            if not os.path.isdir(trash):
+                continue
+            for name in os.listdir(trash):
+                if referenced is None:
+                    referenced = self.index.referenced_files()
+                if name in referenced:
+                    os.replace(os.path.join(trash, name), os.path.join(directory, name))
+                else:
+                    _unlink(os.path.join(trash, name))
+
+
+def _unlink(path):
+    """Remove a file; returns its size (0 if it was already gone)"""
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
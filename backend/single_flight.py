@@ -0,0 +1,51 @@
+import asyncio
+import re
+from structured_logging import NOISY, get_logger
+
+log = get_logger("single_flight")
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight generation requests.
+    The first caller for a key does the work; concurrent duplicates
+    await the same future. Nothing is kept once the work finishes.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    @staticmethod
+    def normalize_prompt(prompt):
+        """Case, whitespace and trailing punctuation don't change the song"""
+        prompt = re.sub(r"\s+", " ", prompt or "").strip().lower()
+        return prompt.rstrip(".!?,;:")
+
+    def key(self, prompt, **params):
+        """Build the coalescing key from the normalized prompt and parameters"""
+        parts = [self.normalize_prompt(prompt)]
+        parts.extend(f"{name}={params[name]}" for name in sorted(params))
+        return "|".join(parts)
+
+    async def do(self, key, job):
+        """
+        Run job() unless an identical request is already running.
+        Returns (result, shared) where shared is True for coalesced callers.
+        """
+        entry = self._inflight.get(key)
+        if entry is not None:
+            task, count = entry
+            self._inflight[key] = (task, count + 1)
+            log.info(f"🔗 Coalesced with in-flight request ({count} already waiting on it)", extra=NOISY)
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(job())
+        # The leader counts as the first caller waiting on the task
+        self._inflight[key] = (task, 1)
+        task.add_done_callback(lambda t: self._release(key, t))
+        return await asyncio.shield(task), False
+
+    def _release(self, key, task):
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
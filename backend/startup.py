@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+
+from structured_logging import get_logger
+
+log = get_logger("startup")
+
+
+# When generators are built: "background" (right after import, in parallel
+# threads), "lazy" (first request that needs one) or "eager" (before serving)
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "background").lower()
+# A generator that failed to start is retried on use after this long
+COMPONENT_RETRY_SECONDS = float(os.getenv("COMPONENT_RETRY_SECONDS", "30"))
+
+COLD, STARTING, READY, DEGRADED, FAILED = "cold", "starting", "ready", "degraded", "failed"
+
+
+class ComponentUnavailable(RuntimeError):
+    """A lazily built component failed to start; retry_after is when it will be tried again"""
+
+    def __init__(self, name, error, retry_after):
+        super().__init__(f"{name} is unavailable: {error}")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class LazyComponent:
+    """
+    A component built on first get() instead of at import, so a slow SDK
+    import or a missing API key costs only the features that need it.
+    warm(instance) runs after the factory for work worth doing before the
+    first request (e.g. creating a client); if it fails the instance is
+    still served and the component reports "degraded". A failed factory
+    raises ComponentUnavailable until COMPONENT_RETRY_SECONDS have passed.
+    """
+
+    def __init__(self, name, factory, warm=None):
+        self.name = name
+        self.factory = factory
+        self.warm = warm
+        self.state = COLD
+        self.error = None
+        self.init_seconds = None
+        self._instance = None
+        self._failed_at = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is not None:
+                return self._instance
+            if self.state == FAILED:
+                retry_after = self._failed_at + COMPONENT_RETRY_SECONDS - time.monotonic()
+                if retry_after > 0:
+                    raise ComponentUnavailable(self.name, self.error, retry_after)
+            self.state = STARTING
+            start = time.perf_counter()
+            try:
+                instance = self.factory()
+            except Exception as e:
+                self.state, self.error, self._failed_at = FAILED, str(e), time.monotonic()
+                self.init_seconds = round(time.perf_counter() - start, 3)
+                log.error(f"❌ {self.name} failed to start: {e}")
+                raise ComponentUnavailable(self.name, e, COMPONENT_RETRY_SECONDS) from e
+            self.state, self.error = READY, None
+            if self.warm is not None:
+                try:
+                    self.warm(instance)
+                except Exception as e:
+                    self.state, self.error = DEGRADED, str(e)
+                    log.warning(f"⚠️ {self.name} started degraded: {e}")
+            self.init_seconds = round(time.perf_counter() - start, 3)
+            self._instance = instance
+            log.info(f"✅ {self.name} {self.state} in {self.init_seconds:.2f}s")
+            return instance
+
+    def preload(self):
+        """get() that records failures instead of raising"""
+        try:
+            self.get()
+        except ComponentUnavailable:
+            pass
+
+    def status(self):
+        return {"state": self.state, "init_seconds": self.init_seconds, "error": self.error}
+
+
+def warm_up(components, mode=None):
+    """Build components per STARTUP_WARMUP; background threads run in parallel"""
+    mode = mode or STARTUP_WARMUP
+    if mode == "eager":
+        for component in components:
+            component.preload()
+    elif mode == "background":
+        for component in components:
+            threading.Thread(target=component.preload, name=f"warmup-{component.name}", daemon=True).start()
+
+
+class StartupTimer:
+    """Wall time of each startup phase, from this module's import"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.phases = {}
+        self._last = self.started
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = round(now - self._last, 3)
+        self._last = now
+
+    def report(self):
+        return {
+            "started_at": self.started_at,
+            "phases": dict(self.phases),
+            "total_seconds": round(self._last - self.started, 3),
+            "warmup": STARTUP_WARMUP,
+        }
+
+
+startup_timer = StartupTimer()
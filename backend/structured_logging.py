@@ -0,0 +1,173 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+# Set per request (middleware) and per generation job; copied into worker
+# threads by run_in_threadpool and submit_with_context()
+request_id_var = contextvars.ContextVar("request_id", default=None)
+job_id_var = contextvars.ContextVar("job_id", default=None)
+
+# extra= for high-volume lines (throttling, coalescing, queueing); the share
+# kept is LOG_NOISY_SAMPLE, per request
+NOISY = {"sample": float(os.getenv("LOG_NOISY_SAMPLE", "0.1"))}
+
+# LogRecord attributes that are not user fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sample"}
+
+
+def get_logger(name):
+    """Logger under the app's namespace, e.g. get_logger("music")"""
+    return logging.getLogger(f"prompt2track.{name}")
+
+
+@contextmanager
+def log_context(request_id=None, job_id=None):
+    """Attach request/job IDs to every record logged inside the block"""
+    tokens = []
+    if request_id is not None:
+        tokens.append((request_id_var, request_id_var.set(request_id)))
+    if job_id is not None:
+        tokens.append((job_id_var, job_id_var.set(job_id)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def submit_with_context(executor, fn, *args, **kwargs):
+    """executor.submit() that carries the caller's request/job IDs into the worker"""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class ContextFilter(logging.Filter):
+    """Stamp IDs on the record in the logging thread, before it is queued"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        record.job_id = job_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drop a share of noisy INFO/DEBUG records. A record's rate comes from
+    extra={"sample": rate} or from LOG_SAMPLE ("prompt2track.rate_limit=0.1").
+    The decision is hashed from the request ID, so a kept request keeps
+    all of its lines. Warnings and errors are never sampled.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = rates or {}
+
+    def _rate(self, record):
+        rate = getattr(record, "sample", None)
+        if rate is not None:
+            return rate
+        name = record.name
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record)
+        if rate >= 1.0:
+            return True
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            bucket = zlib.crc32(f"{request_id}:{record.name}".encode()) / 0xFFFFFFFF
+        else:
+            bucket = random.random()
+        return bucket < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; extra={...} fields are included as keys"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "job_id": getattr(record, "job_id", None),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Readable single-line format for local development"""
+
+    def format(self, record):
+        ids = "/".join(i for i in (getattr(record, "request_id", None), getattr(record, "job_id", None)) if i)
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname[0]} {'[' + ids + '] ' if ids else ''}{record.getMessage()}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def _parse_rates(spec):
+    rates = {}
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        name, _, rate = part.partition("=")
+        name = name.strip()
+        rates[name if name.startswith("prompt2track") else f"prompt2track.{name}"] = float(rate)
+    return rates
+
+
+_listener = None
+
+
+def setup_logging(level=None, fmt=None, sample=None, stream=None):
+    """
+    Route the app's loggers through a queue: callers only format and
+    enqueue, and a background listener thread does the writing.
+    LOG_LEVEL (info), LOG_FORMAT (json or text) and LOG_SAMPLE configure it.
+    Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level = (level or os.getenv("LOG_LEVEL", "info")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "json")).lower()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(logging.Formatter("%(message)s"))
+
+    handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    handler.addFilter(ContextFilter())
+    handler.addFilter(SamplingFilter(_parse_rates(sample if sample is not None else os.getenv("LOG_SAMPLE"))))
+    # Formatting happens here so the listener only writes finished lines
+    handler.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+
+    root = logging.getLogger("prompt2track")
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
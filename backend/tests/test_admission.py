@@ -0,0 +1,70 @@
+import asyncio
+
+from admission import AdmissionController
+
+
+def controller():
+    return AdmissionController(max_concurrent=1, queue_limits={"high": 4, "normal": 4, "low": 4})
+
+
+def test_waiting_ticket_reports_live_position():
+    async def scenario():
+        admission = controller()
+        release = asyncio.Event()
+        seen = {}
+
+        async def hold(priority, ticket_id):
+            async with admission.admit(priority, ticket_id):
+                await release.wait()
+
+        tasks = [asyncio.create_task(hold("normal", "running"))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(hold("normal", "second")))
+        await asyncio.sleep(0)
+        seen["before"] = admission.ticket_status("second")
+
+        # A high-priority arrival moves ahead of it
+        tasks.append(asyncio.create_task(hold("high", "urgent")))
+        await asyncio.sleep(0)
+        seen["after"] = admission.ticket_status("second")
+        seen["urgent"] = admission.ticket_status("urgent")
+        seen["running"] = admission.ticket_status("running")
+
+        release.set()
+        await asyncio.gather(*tasks)
+        seen["done"] = admission.ticket_status("second")
+        return seen
+
+    seen = asyncio.run(scenario())
+    assert seen["before"]["state"] == "queued" and seen["before"]["position"] == 0
+    assert seen["after"]["position"] == 1
+    assert seen["after"]["estimated_wait"] > seen["before"]["estimated_wait"]
+    assert seen["urgent"]["position"] == 0
+    assert seen["running"]["state"] == "running"
+    assert seen["done"] is None
+
+
+def test_cancelled_waiter_is_forgotten():
+    async def scenario():
+        admission = controller()
+        release = asyncio.Event()
+
+        async def hold(ticket_id):
+            async with admission.admit("normal", ticket_id):
+                await release.wait()
+
+        running = asyncio.create_task(hold("running"))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(hold("waiting"))
+        await asyncio.sleep(0)
+        queued = admission.ticket_status("waiting")
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        gone = admission.ticket_status("waiting")
+        release.set()
+        await running
+        return queued, gone
+
+    queued, gone = asyncio.run(scenario())
+    assert queued["state"] == "queued"
+    assert gone is None
@@ -0,0 +1,130 @@
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, OPEN, CircuitBreaker
+from deadline import Deadline, DeadlineExceeded
+from generate_music import MusicGenerator
+
+
+def breaker():
+    return CircuitBreaker("test", window=10, min_calls=5, failure_rate=0.5, slow_call_seconds=30, open_seconds=30)
+
+
+def fail(b, error, deadline=None):
+    with pytest.raises(type(error)):
+        with b.guard(deadline):
+            raise error
+
+
+def test_provider_errors_open_the_breaker():
+    b = breaker()
+    for _ in range(5):
+        fail(b, RuntimeError("502 from provider"))
+    assert b.state == OPEN
+
+
+def test_deadline_exceeded_leaves_breaker_closed():
+    b = breaker()
+    for _ in range(6):
+        fail(b, DeadlineExceeded("caller out of time"))
+    assert b.state == CLOSED
+    assert b.snapshot()["recent_calls"] == 0
+
+
+def test_client_timeout_after_deadline_expired_is_neutral():
+    b = breaker()
+    expired = Deadline(0)
+    for _ in range(6):
+        fail(b, TimeoutError("read timed out"), expired)
+    assert b.state == CLOSED
+
+
+def test_errors_with_time_left_still_count():
+    b = breaker()
+    for _ in range(5):
+        fail(b, TimeoutError("read timed out"), Deadline(60))
+    assert b.state == OPEN
+
+
+def test_deadline_does_not_close_a_half_open_breaker():
+    b = CircuitBreaker("test", min_calls=1, open_seconds=0, probes=1)
+    fail(b, RuntimeError("down"))
+    assert b.state == OPEN
+    fail(b, DeadlineExceeded("caller out of time"))
+    assert b.state == "half_open"
+    with b.guard():
+        pass
+    assert b.state == CLOSED
+
+
+class StuckPrediction:
+    status = "processing"
+    id = "p1"
+
+    def reload(self):
+        pass
+
+    def cancel(self):
+        self.status = "canceled"
+
+
+class StuckPredictions:
+    def create(self, **kwargs):
+        return StuckPrediction()
+
+
+def test_musicgen_deadline_expiry_leaves_replicate_breaker_closed(monkeypatch):
+    monkeypatch.setenv("REPLICATE_API_TOKEN", "test")
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    generator = MusicGenerator()
+    generator.client = type("Client", (), {"predictions": StuckPredictions()})()
+    generator.breaker = breaker()
+    for _ in range(6):
+        with pytest.raises(DeadlineExceeded):
+            generator.generate("lofi beat", 5, deadline=Deadline(0.01))
+    assert generator.breaker.state == CLOSED
+
+
+class DonePrediction(StuckPrediction):
+    status = "succeeded"
+    output = "https://replicate.delivery/song.wav"
+
+
+class DonePredictions:
+    def create(self, **kwargs):
+        return DonePrediction()
+
+
+def song_generator(monkeypatch, tmp_path, download, probes=1):
+    import requests
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("REPLICATE_API_TOKEN", "test")
+    monkeypatch.setattr(requests, "get", download)
+    generator = MusicGenerator()
+    generator.client = type("Client", (), {"predictions": DonePredictions()})()
+    generator.breaker = CircuitBreaker("test", min_calls=1, open_seconds=0, probes=probes)
+    generator.breaker._trip("test")
+    return generator
+
+
+def test_song_takes_one_half_open_probe(monkeypatch, tmp_path):
+    response = type("Response", (), {"content": b"RIFF", "raise_for_status": lambda self: None})()
+    generator = song_generator(monkeypatch, tmp_path, lambda url, timeout: response, probes=2)
+    generator.generate("lofi beat", 5)
+    # Prediction and download are one probe, so one song can't close the breaker alone
+    assert generator.breaker.state == "half_open"
+    generator.generate("lofi beat", 5)
+    assert generator.breaker.state == CLOSED
+
+
+def test_download_failure_is_one_failed_probe(monkeypatch, tmp_path):
+    def download(url, timeout):
+        raise ConnectionError("reset")
+
+    generator = song_generator(monkeypatch, tmp_path, download)
+    with pytest.raises(ConnectionError):
+        generator.generate("lofi beat", 5)
+    assert generator.breaker.state == OPEN
+    assert generator.breaker._probes_in_flight == 0
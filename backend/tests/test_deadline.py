@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from deadline import Deadline, DeadlineExceeded, HedgedCall, get_tracker, hedged_call
+
+
+def test_stage_takes_a_share_of_what_is_left():
+    parent = Deadline(10)
+    child = parent.stage(0.5)
+    assert child.budget == pytest.approx(5, abs=0.05)
+    assert child.remaining() <= parent.remaining()
+
+
+def test_stage_of_an_expired_deadline_is_expired():
+    parent = Deadline(0)
+    child = parent.stage(0.5)
+    assert child.expired()
+    with pytest.raises(DeadlineExceeded):
+        child.check("lyrics")
+
+
+def test_expire_ends_the_budget():
+    deadline = Deadline(60)
+    deadline.expire()
+    assert deadline.expired() and deadline.timeout(cap=5) == 0
+
+
+def seeded_stage(name, p95):
+    """A stage whose tracker already has enough samples to hedge at p95"""
+    tracker = get_tracker(name)
+    for _ in range(tracker.min_samples):
+        tracker.record(p95)
+    return name
+
+
+def test_fast_call_never_hedges():
+    calls = []
+
+    def fn(attempt):
+        calls.append(attempt)
+        return "ok"
+
+    assert hedged_call(fn, seeded_stage("test_fast", 0.2), timeout=2) == "ok"
+    assert len(calls) == 1
+
+
+def test_slow_first_attempt_loses_to_hedge_and_is_expired():
+    attempts = []
+    first_done = threading.Event()
+
+    def fn(attempt):
+        attempts.append(attempt)
+        if len(attempts) == 1:
+            # Stalls until its deadline is expired by the winner
+            while not attempt.expired():
+                time.sleep(0.005)
+            first_done.set()
+            raise DeadlineExceeded("lost the race")
+        return "hedge"
+
+    assert hedged_call(fn, seeded_stage("test_hedge", 0.05), timeout=2) == "hedge"
+    assert len(attempts) == 2
+    assert first_done.wait(1), "the losing attempt kept running"
+
+
+def test_error_is_raised_once_every_attempt_failed():
+    def fn(attempt):
+        raise ConnectionError("reset")
+
+    with pytest.raises(ConnectionError):
+        hedged_call(fn, "test_errors", timeout=1)
+
+
+def test_no_attempt_in_time_raises_and_expires_attempts():
+    attempts = []
+
+    def fn(attempt):
+        attempts.append(attempt)
+        time.sleep(0.2)
+        return "late"
+
+    with pytest.raises(DeadlineExceeded):
+        hedged_call(fn, "test_timeout", timeout=0.05)
+    assert all(a.expired() for a in attempts)
+
+
+def test_result_can_time_out_while_attempt_keeps_running():
+    release = threading.Event()
+
+    def fn(attempt):
+        release.wait(1)
+        return "late"
+
+    call = HedgedCall(fn, "test_partial", timeout=2)
+    with pytest.raises(DeadlineExceeded):
+        call.result(0.02)
+    release.set()
+    assert call.future.result(timeout=1) == "late"
@@ -0,0 +1,56 @@
+import pytest
+
+from generation_index import GenerationIndex, InvalidCursor, decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = GenerationIndex(str(tmp_path / "generations.db"))
+    # Two rows share a timestamp so the id breaks the tie
+    for n, created_at in enumerate([100.0, 200.0, 200.0, 300.0, 400.0]):
+        index.record(
+            id=f"gen{n}", created_at=created_at, kind="song", prompt=f"song {n}",
+            image_file=f"cover_{n}.png" if n % 2 == 0 else None,
+        )
+    return index
+
+
+def walk(index, limit, with_cover=False):
+    pages, cursor = [], None
+    while True:
+        items, cursor = index.page(limit, cursor, with_cover)
+        pages.append([item["id"] for item in items])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trips():
+    assert decode_cursor(encode_cursor(1712345678.123456, "abc|def")) == (1712345678.123456, "abc|def")
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor(1.0, "x")[:-3] + "???", "bm8tcGlwZQ"])
+def test_bad_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_pages_are_newest_first_without_gaps_or_repeats(index):
+    pages = walk(index, 2)
+    assert pages == [["gen4", "gen3"], ["gen2", "gen1"], ["gen0"]]
+
+
+def test_last_full_page_has_no_next_cursor(index):
+    items, cursor = index.page(5)
+    assert len(items) == 5 and cursor is None
+
+
+def test_with_cover_pages_only_rendered_covers(index):
+    assert walk(index, 1, with_cover=True) == [["gen4"], ["gen2"], ["gen0"]]
+
+
+def test_rows_added_after_the_first_page_do_not_shift_later_pages(index):
+    first, cursor = index.page(2)
+    index.record(id="newest", created_at=500.0, kind="song", prompt="new")
+    second, _ = index.page(2, cursor)
+    assert [i["id"] for i in first] == ["gen4", "gen3"]
+    assert [i["id"] for i in second] == ["gen2", "gen1"]
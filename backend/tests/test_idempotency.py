@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from idempotency import IdempotencyConflict, IdempotencyStore
+
+
+def counting_job(result="song", delay=0, fail=False):
+    calls = []
+
+    async def job():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError("provider down")
+        return f"{result}-{len(calls)}"
+
+    return job, calls
+
+
+def test_completed_key_is_replayed():
+    async def scenario():
+        store = IdempotencyStore(ttl_seconds=60)
+        job, calls = counting_job()
+        first = await store.run("k", "fp", job)
+        second = await store.run("k", "fp", job)
+        return first, second, calls
+
+    first, second, calls = asyncio.run(scenario())
+    assert first == ("song-1", False)
+    assert second == ("song-1", True)
+    assert len(calls) == 1
+
+
+def test_reused_key_with_different_body_conflicts():
+    async def scenario():
+        store = IdempotencyStore(ttl_seconds=60)
+        job, _ = counting_job()
+        await store.run("k", "fp", job)
+        await store.run("k", "other", job)
+
+    with pytest.raises(IdempotencyConflict):
+        asyncio.run(scenario())
+
+
+def test_concurrent_duplicates_wait_for_one_job():
+    async def scenario():
+        store = IdempotencyStore(ttl_seconds=60)
+        job, calls = counting_job(delay=0.05)
+        results = await asyncio.gather(*(store.run("k", "fp", job) for _ in range(5)))
+        return results, calls
+
+    results, calls = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert {r for r, _ in results} == {"song-1"}
+    assert sorted(replayed for _, replayed in results) == [False, True, True, True, True]
+
+
+def test_failed_job_is_forgotten_and_can_be_retried():
+    async def scenario():
+        store = IdempotencyStore(ttl_seconds=60)
+        failing, _ = counting_job(fail=True)
+        with pytest.raises(RuntimeError):
+            await store.run("k", "fp", failing)
+        await asyncio.sleep(0)
+        job, calls = counting_job()
+        return await store.run("k", "fp", job), calls
+
+    result, calls = asyncio.run(scenario())
+    assert result == ("song-1", False)
+    assert len(calls) == 1
+
+
+def test_keys_are_scoped_per_client():
+    async def scenario():
+        store = IdempotencyStore(ttl_seconds=60)
+        job, calls = counting_job()
+        alice = await store.run("k", "fp", job, scope="addr:10.0.0.1")
+        bob = await store.run("k", "other", job, scope="addr:10.0.0.2")
+        return alice, bob, calls
+
+    alice, bob, calls = asyncio.run(scenario())
+    assert alice == ("song-1", False)
+    assert bob == ("song-2", False)
+    assert len(calls) == 2
@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from circuit_breaker import CircuitOpenError
+from deadline import DeadlineExceeded
+from generate_image import ImageGenerator
+
+
+@pytest.mark.parametrize("size, expected", [
+    (None, "1024x1024"),
+    ("square", "1024x1024"),
+    ("Landscape", "1792x1024"),
+    ("1024x1792", "1024x1792"),
+    (1024, "1024x1024"),
+])
+def test_resolve_size(size, expected):
+    assert ImageGenerator.resolve_size(size) == expected
+
+
+@pytest.mark.parametrize("size", ["huge", 512, "512x512", "1792x1792", True])
+def test_resolve_size_rejects_sizes_dalle_3_cannot_render(size):
+    with pytest.raises(ValueError, match="image_size"):
+        ImageGenerator.resolve_size(size)
+
+
+def test_resolve_quality():
+    assert ImageGenerator.resolve_quality(None) == ImageGenerator.default_quality
+    assert ImageGenerator.resolve_quality("HD") == "hd"
+    with pytest.raises(ValueError, match="image_quality"):
+        ImageGenerator.resolve_quality("ultra")
+
+
+def bare_generator(error):
+    """ImageGenerator without an OpenAI client whose render raises error"""
+    generator = ImageGenerator.__new__(ImageGenerator)
+    generator._api_mode = "new"
+    generator._limiter = type("Limiter", (), {"backoff": lambda self, s: None})()
+    generator._breaker = type("Breaker", (), {"check": lambda self: None})()
+
+    def render(*args, **kwargs):
+        raise error
+
+    generator._generate_new_api = render
+    return generator
+
+
+@pytest.mark.parametrize("error", [CircuitOpenError("openai_images", 12.0), DeadlineExceeded("cover out of time")])
+def test_fast_fail_and_timeout_are_not_wrapped(error):
+    with pytest.raises(type(error)):
+        bare_generator(error).generate("calm piano")
+
+
+def test_provider_errors_are_wrapped():
+    with pytest.raises(RuntimeError, match="Generation failed"):
+        bare_generator(ConnectionError("reset")).generate("calm piano")
+
+
+@pytest.mark.parametrize("size, phrase", [
+    ("square", "square composition"),
+    ("landscape", "wide landscape composition"),
+    ("portrait", "tall portrait composition"),
+])
+def test_prompt_describes_the_requested_composition(size, phrase):
+    prompt = ImageGenerator.__new__(ImageGenerator)._force_literal_prompt("calm piano", ImageGenerator.resolve_size(size))
+    assert prompt.endswith(phrase)
+
+
+def test_bad_default_quality_fails_at_startup():
+    env = dict(os.environ, IMAGE_DEFAULT_QUALITY="ultra")
+    result = subprocess.run(
+        [sys.executable, "-c", "import generate_image"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, capture_output=True, text=True,
+    )
+    assert result.returncode != 0
+    assert "IMAGE_DEFAULT_QUALITY must be one of standard, hd" in result.stderr
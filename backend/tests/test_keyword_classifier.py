@@ -0,0 +1,55 @@
+import pytest
+
+from generate_lyrics import LYRICS_CLASSIFIER
+from keyword_classifier import KeywordClassifier
+
+RULES = {
+    "theme": [
+        ("love", ["love", "heart", "romance"]),
+        ("dreams", ["dream", "hope"]),
+    ],
+    "genre": [("hip-hop", ["hip hop", "rap"])],
+}
+
+
+@pytest.fixture
+def classifier():
+    return KeywordClassifier(RULES, defaults={"theme": "life", "genre": "indie"}, cache_size=0)
+
+
+@pytest.mark.parametrize("text", ["heart’s song", "heart's song", "Heart’S song"])
+def test_possessive_is_stripped(classifier, text):
+    assert classifier.scan(text) == {"heart"}
+    assert classifier.classify(text)["theme"] == "love"
+
+
+@pytest.mark.parametrize("text", ["love—forever", "love–forever", "love…", "“love”", "«love»"])
+def test_unicode_punctuation_separates_words(classifier, text):
+    assert classifier.classify(text)["theme"] == "love"
+
+
+def test_em_dash_between_phrase_words(classifier):
+    assert classifier.classify("hip—hop all night")["genre"] == "hip-hop"
+
+
+def test_whole_words_only(classifier):
+    assert classifier.classify("hearth and home")["theme"] == "life"
+
+
+def test_inflections_and_non_ascii_words(classifier):
+    assert classifier.scan("dreaming of café romances") == {"dream", "romance"}
+
+
+def test_lyrics_classifier_handles_gpt_punctuation():
+    assert LYRICS_CLASSIFIER.classify("My heart’s on fire — love—forever")["prompt_theme"] == "love"
+
+
+@pytest.mark.parametrize("text", ["loving you", "a lover", "loved", "hoping", "hoped"])
+def test_silent_e_dropped_before_suffix(classifier, text):
+    assert classifier.classify(text)["theme"] in ("love", "dreams")
+    assert classifier.scan(text)
+
+
+def test_silent_e_keeps_double_e():
+    classifier = KeywordClassifier({"mood": [("free", ["free"])]}, cache_size=0)
+    assert classifier.scan("freeing the birds") == {"free"}
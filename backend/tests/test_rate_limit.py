@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from rate_limit import ProviderLimiter, RateLimitTimeout, TokenBucket
+
+
+def test_bucket_blocks_until_refilled():
+    bucket = TokenBucket(rate_per_minute=600, capacity=1)  # one token per 0.1s
+    assert bucket.acquire() < 0.01
+    waited = bucket.acquire()
+    assert 0.05 < waited < 0.5
+
+
+def test_bucket_times_out_when_refill_is_too_slow():
+    bucket = TokenBucket(rate_per_minute=6, capacity=1)  # one token per 10s
+    bucket.acquire()
+    start = time.monotonic()
+    with pytest.raises(RateLimitTimeout):
+        bucket.acquire(timeout=0.1)
+    assert time.monotonic() - start < 0.5
+
+
+def test_pause_holds_tokens_back():
+    bucket = TokenBucket(rate_per_minute=6000, capacity=10)
+    bucket.pause(0.2)
+    with pytest.raises(RateLimitTimeout):
+        bucket.acquire(timeout=0.05)
+    assert bucket.acquire(timeout=1) >= 0.1
+
+
+def test_backoff_pauses_the_request_bucket():
+    limiter = ProviderLimiter("test", max_concurrency=2, requests_per_minute=6000)
+    limiter.backoff(0.2)
+    with pytest.raises(RateLimitTimeout):
+        with limiter.slot(timeout=0.05):
+            pass
+
+
+def test_failed_acquire_releases_the_concurrency_slot():
+    limiter = ProviderLimiter("test", max_concurrency=1, requests_per_minute=6, tokens_per_minute=600)
+    with limiter.slot():
+        pass
+    # The request bucket is now empty; this waits past its timeout
+    with pytest.raises(RateLimitTimeout):
+        with limiter.slot(timeout=0.05):
+            pass
+    assert limiter._semaphore.acquire(blocking=False)
+    limiter._semaphore.release()
+    assert limiter.in_flight == 0 and limiter.waiting == 0
+
+
+def test_slot_times_out_while_all_slots_are_busy():
+    limiter = ProviderLimiter("test", max_concurrency=1, requests_per_minute=6000)
+    release = threading.Event()
+    held = threading.Event()
+
+    def hold():
+        with limiter.slot():
+            held.set()
+            release.wait()
+
+    worker = threading.Thread(target=hold)
+    worker.start()
+    held.wait()
+    try:
+        with pytest.raises(RateLimitTimeout):
+            with limiter.slot(timeout=0.05):
+                pass
+    finally:
+        release.set()
+        worker.join()
+
+
+def test_oversized_estimate_settles_against_what_was_reserved():
+    limiter = ProviderLimiter("test", max_concurrency=1, requests_per_minute=6000, tokens_per_minute=600)
+    capacity = limiter._tokens.capacity
+    with limiter.slot(tokens=capacity * 5) as reserved:
+        assert reserved == capacity
+    limiter.settle(reserved, actual_tokens=10)
+    # Crediting the uncapped estimate back would refill the bucket completely
+    assert limiter._tokens.available() == pytest.approx(capacity - 10, abs=1)
+
+
+def test_underestimate_is_debited():
+    limiter = ProviderLimiter("test", max_concurrency=1, requests_per_minute=6000, tokens_per_minute=600)
+    with limiter.slot(tokens=10) as reserved:
+        pass
+    before = limiter._tokens.available()
+    limiter.settle(reserved, actual_tokens=50)
+    assert limiter._tokens.available() == pytest.approx(before - 40, abs=1)
@@ -0,0 +1,119 @@
+import os
+import time
+
+import pytest
+
+from generation_index import GenerationIndex
+from retention import TRASH_DIR, RetentionSweeper
+
+DAY = 86400
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    assets, static = tmp_path / "assets", tmp_path / "static"
+    assets.mkdir()
+    static.mkdir()
+    return str(assets), str(static)
+
+
+@pytest.fixture
+def index(tmp_path):
+    return GenerationIndex(str(tmp_path / "generations.db"))
+
+
+def write(directory, name, size=10):
+    with open(os.path.join(directory, name), "wb") as f:
+        f.write(b"x" * size)
+
+
+def old_generation(index, dirs, n, age_days=10, image_file=None):
+    audio = f"audio_{n}.wav"
+    for directory in dirs:
+        write(directory, audio)
+    return index.record(
+        id=f"gen{n:03d}", created_at=time.time() - age_days * DAY - n, kind="song", prompt=f"song {n}",
+        audio_file=audio, image_file=image_file,
+    )
+
+
+def sweeper(index, dirs):
+    return RetentionSweeper(index, dirs, max_mb=0, max_age_days=1, min_age=0, interval=0)
+
+
+def test_evicts_row_and_its_files_but_keeps_shared_cover(index, dirs):
+    for directory in dirs:
+        write(directory, "cover.png")
+    old = old_generation(index, dirs, 1, image_file="cover.png")
+    recent = index.record(id="recent", kind="album_track", prompt="new", image_file="cover.png")
+
+    report = sweeper(index, dirs).sweep()
+
+    assert report["evicted"] == {"age": 1}
+    assert index.get(old) is None and index.get(recent) is not None
+    for directory in dirs:
+        assert not os.path.exists(os.path.join(directory, "audio_1.wav"))
+        assert os.path.exists(os.path.join(directory, "cover.png"))
+        assert os.listdir(os.path.join(directory, TRASH_DIR)) == []
+
+
+def test_pinned_generations_are_kept(index, dirs):
+    generation_id = old_generation(index, dirs, 1)
+    index.set_pinned(generation_id, True)
+    assert sweeper(index, dirs).sweep()["evicted"] == {}
+    assert index.get(generation_id) is not None
+
+
+def test_pages_past_a_batch_that_could_not_be_evicted(index, dirs, monkeypatch):
+    # The two least recently used rows' files can't be moved to the trash
+    for n in range(5):
+        old_generation(index, dirs, 10 - n)
+    for directory in dirs:
+        for n in (10, 9):
+            os.makedirs(os.path.join(directory, TRASH_DIR, f"audio_{n}.wav", "blocker"))
+    candidates = index.eviction_candidates
+    monkeypatch.setattr(index, "eviction_candidates", lambda older_than, after=None: candidates(older_than, 2, after))
+
+    sweep = sweeper(index, dirs)
+    # Recovery would clear the blockers; keep them so the renames fail
+    sweep._recover_trash = lambda: None
+    report = sweep.sweep()
+
+    assert report["evicted"] == {"age": 3}
+    assert {i for i, _, _ in candidates(time.time())} == {"gen010", "gen009"}
+    assert os.path.exists(os.path.join(dirs[0], "audio_10.wav"))
+
+
+def test_budget_pages_past_kept_rows(index, dirs, monkeypatch):
+    for n in range(4):
+        old_generation(index, dirs, 10 - n)
+    for directory in dirs:
+        os.makedirs(os.path.join(directory, TRASH_DIR, "audio_10.wav", "blocker"))
+    candidates = index.eviction_candidates
+    monkeypatch.setattr(index, "eviction_candidates", lambda older_than, after=None: candidates(older_than, 1, after))
+
+    sweep = RetentionSweeper(index, dirs, max_mb=40 / 1024 / 1024, max_age_days=0, min_age=0, interval=0)
+    sweep._recover_trash = lambda: None
+    report = sweep.sweep()
+
+    # 80 bytes in use, 40 allowed: the blocked row is skipped and the next two go
+    assert report["evicted"] == {"budget": 2}
+    assert report["bytes_after"] <= 40
+
+
+def test_interrupted_eviction_is_recovered(index, dirs):
+    kept = old_generation(index, dirs, 1, age_days=0)
+    for directory in dirs:
+        trash = os.path.join(directory, TRASH_DIR)
+        os.makedirs(trash)
+        # Crash after the move, before COMMIT: the row is still indexed
+        os.replace(os.path.join(directory, "audio_1.wav"), os.path.join(trash, "audio_1.wav"))
+        # Crash after COMMIT, before unlink: nothing references it
+        write(trash, "audio_gone.wav")
+
+    RetentionSweeper(index, dirs, max_mb=0, max_age_days=0, min_age=DAY, interval=0).sweep()
+
+    assert index.get(kept) is not None
+    for directory in dirs:
+        assert os.path.exists(os.path.join(directory, "audio_1.wav"))
+        assert os.listdir(os.path.join(directory, TRASH_DIR)) == []
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_leader_call():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def job():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "song"
+
+        results = await asyncio.gather(*(flight.do("k", job) for _ in range(8)))
+        return results, calls, flight
+
+    results, calls, flight = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [r for r, _ in results] == ["song"] * 8
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert flight._inflight == {}
+
+
+def test_leader_exception_reaches_every_follower():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def job():
+            await asyncio.sleep(0.05)
+            raise RuntimeError("replicate 502")
+
+        return await asyncio.gather(*(flight.do("k", job) for _ in range(4)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) and str(r) == "replicate 502" for r in results)
+
+
+def test_finished_key_runs_again():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def job():
+            calls.append(1)
+            return len(calls)
+
+        first = await flight.do("k", job)
+        second = await flight.do("k", job)
+        return first, second
+
+    assert asyncio.run(scenario()) == ((1, False), (2, False))
+
+
+@pytest.mark.parametrize("prompt", ["Calm  Piano!", "calm piano", " CALM PIANO. "])
+def test_key_ignores_case_whitespace_and_punctuation(prompt):
+    flight = SingleFlight()
+    assert flight.key(prompt, duration=15) == flight.key("calm piano", duration=15)
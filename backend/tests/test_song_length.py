@@ -0,0 +1,17 @@
+import pytest
+
+from generate_lyrics import DEFAULT_SONG_LENGTH, resolve_song_length
+
+
+@pytest.mark.parametrize("value", [None, ""])
+def test_omitted_song_length_is_the_default(value):
+    assert resolve_song_length(value) == DEFAULT_SONG_LENGTH == "medium"
+
+
+def test_explicit_tier_is_normalized():
+    assert resolve_song_length(" Short ") == "short"
+
+
+def test_unknown_tier_is_rejected():
+    with pytest.raises(ValueError, match="song_length"):
+        resolve_song_length("epic")
@@ -0,0 +1,281 @@
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# Innermost open span of the current request/job. Worker threads inherit it
+# through run_in_threadpool and structured_logging.submit_with_context()
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+# Innermost span per worker thread, so the profiler can attribute stack
+# samples to a trace. Event loop threads interleave requests and are skipped.
+_thread_spans = {}
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "duration",
+                 "attributes", "error", "thread", "sampled", "_t0")
+
+    def __init__(self, name, trace_id, parent_id=None, sampled=True, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.thread = threading.current_thread().name
+        self.sampled = sampled
+        self._t0 = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._t0
+        if self.sampled:
+            tracer.export(self)
+
+    @property
+    def traceparent(self):
+        """W3C trace context header value for this span"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": round(self.start, 6),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "thread": self.thread,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class RingBufferExporter:
+    """Spans of the most recent traces, kept in memory for /debug/traces"""
+
+    def __init__(self, max_traces=200, max_spans_per_trace=500):
+        self.max_traces = max_traces
+        self.max_spans_per_trace = max_spans_per_trace
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            if len(spans) < self.max_spans_per_trace:
+                spans.append(span.to_dict())
+
+    def get(self, trace_id):
+        with self._lock:
+            spans = list(self._traces.get(trace_id, ()))
+        return sorted(spans, key=lambda s: s["start"])
+
+    def summaries(self, limit=50):
+        """Newest first: trace ID, root span name, total time and span count"""
+        with self._lock:
+            items = list(self._traces.items())[-limit:]
+        result = []
+        for trace_id, spans in reversed(items):
+            root = next((s for s in spans if s["parent_id"] is None), None) or min(spans, key=lambda s: s["start"])
+            end = max(s["start"] + (s["duration_ms"] or 0) / 1000 for s in spans)
+            result.append({
+                "trace_id": trace_id,
+                "root": root["name"],
+                "start": root["start"],
+                "duration_ms": round((end - min(s["start"] for s in spans)) * 1000, 3),
+                "spans": len(spans),
+                "errors": sum(1 for s in spans if s["error"]),
+            })
+        return result
+
+
+class FileExporter:
+    """JSON lines appended by a background thread, so request threads never block on disk"""
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        threading.Thread(target=self._write_loop, name="trace-writer", daemon=True).start()
+
+    def export(self, span):
+        self._queue.put(span.to_dict())
+
+    def _write_loop(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                f.write(json.dumps(self._queue.get(), default=str) + "\n")
+                # Drain whatever else is queued before flushing
+                while not self._queue.empty():
+                    f.write(json.dumps(self._queue.get(), default=str) + "\n")
+                f.flush()
+
+
+class Tracer:
+    """
+    Minimal in-process tracer. TRACE_EXPORTER picks where finished spans
+    go: "ring" (default, /debug/traces), "file" (TRACE_FILE), "both" or
+    "off"; TRACE_SAMPLE_RATE is the share of new traces recorded.
+    """
+
+    def __init__(self):
+        mode = os.getenv("TRACE_EXPORTER", "ring").lower()
+        self.sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+        self.ring = RingBufferExporter(int(os.getenv("TRACE_BUFFER_TRACES", "200"))) if mode in ("ring", "both") else None
+        self.file = FileExporter(os.getenv("TRACE_FILE", "traces/spans.jsonl")) if mode in ("file", "both") else None
+        self.enabled = mode != "off"
+
+    def export(self, span):
+        if self.ring is not None:
+            self.ring.export(span)
+        if self.file is not None:
+            self.file.export(span)
+
+
+tracer = Tracer()
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a block as a child of the current span (or as a new trace root).
+    Exceptions are recorded on the span and re-raised.
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        s = Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+    else:
+        s = Span(name, os.urandom(16).hex(), None, _sample(), attributes)
+    token = _current_span.set(s)
+    ident, previous = _bind_thread(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _unbind_thread(ident, previous)
+        _current_span.reset(token)
+        s.finish()
+
+
+@contextmanager
+def start_trace(name, traceparent=None, record=True, **attributes):
+    """
+    Root span for an incoming request, continuing the caller's trace when
+    it sent a W3C traceparent header. record=False still hands out IDs
+    but keeps the spans out of the exporters.
+    """
+    match = TRACEPARENT_RE.match(traceparent or "")
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        root = Span(name, trace_id, parent_id, bool(int(flags, 16) & 1) and tracer.enabled, attributes)
+    else:
+        root = Span(name, os.urandom(16).hex(), None, _sample(), attributes)
+    root.sampled = root.sampled and record
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        root.finish()
+
+
+def record_span(name, duration, **attributes):
+    """Add an already-finished child span (e.g. time spent queued) ending now"""
+    parent = _current_span.get()
+    if parent is None or not parent.sampled:
+        return
+    s = Span(name, parent.trace_id, parent.span_id, True, attributes)
+    s.start = time.time() - duration
+    s.duration = duration
+    tracer.export(s)
+
+
+def thread_span(ident):
+    """Span a worker thread is currently inside, or None"""
+    return _thread_spans.get(ident)
+
+
+def traced(name):
+    """Decorator: run the function inside a span (on whichever thread calls it)"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _bind_thread(s):
+    try:
+        asyncio.get_running_loop()
+        return None, None
+    except RuntimeError:
+        pass
+    ident = threading.get_ident()
+    previous = _thread_spans.get(ident)
+    _thread_spans[ident] = s
+    return ident, previous
+
+
+def _unbind_thread(ident, previous):
+    if ident is None:
+        return
+    if previous is None:
+        _thread_spans.pop(ident, None)
+    else:
+        _thread_spans[ident] = previous
+
+
+def _sample():
+    return tracer.enabled and (tracer.sample_rate >= 1.0 or random.random() < tracer.sample_rate)
+
+
+def chrome_trace(spans):
+    """Spans as Chrome trace events (open in chrome://tracing or Perfetto)"""
+    threads = {}
+    events = []
+    for s in spans:
+        tid = threads.setdefault(s["thread"], len(threads) + 1)
+        events.append({
+            "name": s["name"],
+            "ph": "X",
+            "ts": s["start"] * 1e6,
+            "dur": (s["duration_ms"] or 0) * 1000,
+            "pid": 1,
+            "tid": tid,
+            "args": dict(s["attributes"], span_id=s["span_id"], parent_id=s["parent_id"], error=s["error"]),
+        })
+    events += [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+               for name, tid in threads.items()]
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
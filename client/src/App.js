@@ -49,7 +49,7 @@ const SURPRISE_PROMPTS = [
 ];
 
 /** ✅ Loading overlay (Equalizer + Pipeline) */
-const LoadingOverlay = ({ open, reducedMotion, prompt }) => {
+const LoadingOverlay = ({ open, reducedMotion, prompt, queueStatus }) => {
   const [progress, setProgress] = useState(0);
   const [stage, setStage] = useState(0); // 0=music,1=cover,2=lyrics
 
@@ -184,6 +184,12 @@ const LoadingOverlay = ({ open, reducedMotion, prompt }) => {
 
           <h3 className="text-3xl md:text-4xl font-bold text-white">{steps[stage].title}…</h3>
           <p className="text-white/65 text-base md:text-lg mt-3">{prompt?.trim() ? `“${clipped}”` : clipped}</p>
+          {queueStatus?.state === "queued" && (
+            <p className="text-white/50 text-sm mt-2">
+              {queueStatus.position > 0 ? `#${queueStatus.position + 1} in line` : "Next in line"}
+              {queueStatus.estimated_wait > 0 ? ` · about ${Math.ceil(queueStatus.estimated_wait)}s` : ""}
+            </p>
+          )}
 
           {/* Pipeline */}
           <div className="mt-9 grid grid-cols-1 md:grid-cols-3 gap-5 text-left">
@@ -218,10 +224,13 @@ const LoadingOverlay = ({ open, reducedMotion, prompt }) => {
 function App() {
   const [prompt, setPrompt] = useState("");
   const [duration, setDuration] = useState(15);
+  const [songLength, setSongLength] = useState("medium");
 
   const [audioUrl, setAudioUrl] = useState(null);
   const [imageUrl, setImageUrl] = useState(null);
   const [lyrics, setLyrics] = useState(null);
+  const [songPrompt, setSongPrompt] = useState(null);
+  const [regeneratingLyrics, setRegeneratingLyrics] = useState(false);
 
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
@@ -242,6 +251,9 @@ function App() {
   const [btnSparkKey, setBtnSparkKey] = useState(0);
   const [showConfetti, setShowConfetti] = useState(false);
   const confettiTimerRef = useRef(null);
+  const coverPollRef = useRef(null);
+  const queuePollRef = useRef(null);
+  const [queueStatus, setQueueStatus] = useState(null);
 
   // Deployment-safe URLs
   const API_BASE = (process.env.REACT_APP_API_BASE_URL || "http://127.0.0.1:7860").replace(/\/$/, "");
@@ -252,12 +264,60 @@ function App() {
     if (inputSection) inputSection.scrollIntoView({ behavior: "smooth", block: "center" });
   };
 
+  const stopCoverPolling = () => {
+    if (coverPollRef.current) clearTimeout(coverPollRef.current);
+    coverPollRef.current = null;
+  };
+
+  // The backend answers with a placeholder cover; swap in the DALL·E art when it lands
+  const pollCover = (statusUrl, attempt = 0) => {
+    if (attempt >= 60) return;
+    coverPollRef.current = setTimeout(async () => {
+      try {
+        const res = await fetch(statusUrl);
+        if (!res.ok) return;
+        const job = await res.json();
+        if (job.status === "ready" && job.image_url) {
+          setImageUrl(job.image_url);
+        } else if (job.status === "pending") {
+          pollCover(statusUrl, attempt + 1);
+        }
+      } catch {
+        pollCover(statusUrl, attempt + 1);
+      }
+    }, 2000);
+  };
+
+  const stopQueuePolling = () => {
+    if (queuePollRef.current) clearTimeout(queuePollRef.current);
+    queuePollRef.current = null;
+    setQueueStatus(null);
+  };
+
+  // The POST only answers when the song is done, so ask where it is in line meanwhile
+  const pollQueue = (requestId) => {
+    queuePollRef.current = setTimeout(async () => {
+      try {
+        const res = await fetch(`${API_BASE}/queue/${requestId}`);
+        if (!queuePollRef.current) return;
+        if (res.ok) {
+          const ticket = await res.json();
+          setQueueStatus(ticket);
+          if (ticket.state === "running") return;
+        }
+      } catch {}
+      if (queuePollRef.current) pollQueue(requestId);
+    }, 1500);
+  };
+
   const handleGenerate = async () => {
     if (!prompt.trim()) {
       setError("Please enter a prompt!");
       return;
     }
 
+    stopCoverPolling();
+
     setLoading(true);
     setAudioUrl(null);
     setImageUrl(null);
@@ -277,11 +337,31 @@ function App() {
     }
 
     try {
+      // One key per click so retried POSTs attach to the same backend job
+      const idempotencyKey =
+        window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+      // Our handle for GET /queue/{id} while the request waits for a slot
+      const requestId = `${Date.now().toString(36)}${Math.random().toString(36).slice(2, 8)}`;
+      pollQueue(requestId);
+
       const res = await fetch(`${API_BASE}/generate`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ prompt, duration }),
+        headers: {
+          "Content-Type": "application/json",
+          "Idempotency-Key": idempotencyKey,
+          "X-Request-ID": requestId,
+        },
+        body: JSON.stringify({ prompt, duration, song_length: songLength }),
       });
+      stopQueuePolling();
+
+      if (res.status === 429 || res.status === 503) {
+        const busy = await res.json().catch(() => ({}));
+        const retryAfter = res.headers.get("Retry-After") || busy?.retry_after;
+        throw new Error(
+          `Server is busy${retryAfter ? ` — please try again in about ${retryAfter}s` : ""}.`
+        );
+      }
 
       if (!res.ok) {
         const errorText = await res.text();
@@ -294,6 +374,11 @@ function App() {
         setAudioUrl(data.audio_url);
         setImageUrl(data.image_url || null);
         setLyrics(data.lyrics || null);
+        setSongPrompt(data.original_prompt || prompt);
+
+        if (data.cover_job?.status === "pending" && data.cover_job.status_url) {
+          pollCover(data.cover_job.status_url);
+        }
 
         // Confetti moment
         if (!prefersReducedMotion) {
@@ -311,6 +396,7 @@ function App() {
         setError(`Error: ${err?.message || "Unknown error"}`);
       }
     } finally {
+      stopQueuePolling();
       setLoading(false);
     }
   };
@@ -321,6 +407,7 @@ function App() {
   };
 
   const handleTryNext = () => {
+    stopCoverPolling();
     setShowImmersivePlayer(false);
     setAudioUrl(null);
     setImageUrl(null);
@@ -337,6 +424,25 @@ function App() {
     }
   };
 
+  // Usually served from variants the backend already has, so it's near-instant
+  const regenerateLyrics = async () => {
+    if (!songPrompt || regeneratingLyrics) return;
+    setRegeneratingLyrics(true);
+    try {
+      const res = await fetch(`${API_BASE}/lyrics/regenerate`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ prompt: songPrompt, duration, song_length: lyrics?.song_length }),
+      });
+      if (!res.ok) throw new Error(`Server error: ${res.status}`);
+      setLyrics(await res.json());
+    } catch (err) {
+      setError(`Error: ${err?.message || "Could not regenerate lyrics"}`);
+    } finally {
+      setRegeneratingLyrics(false);
+    }
+  };
+
   const downloadLyrics = () => {
     if (!lyrics?.content) return;
     const a = document.createElement("a");
@@ -357,6 +463,8 @@ function App() {
   useEffect(() => {
     return () => {
       if (confettiTimerRef.current) clearTimeout(confettiTimerRef.current);
+      if (coverPollRef.current) clearTimeout(coverPollRef.current);
+      if (queuePollRef.current) clearTimeout(queuePollRef.current);
     };
   }, []);
 
@@ -389,7 +497,7 @@ function App() {
       )}
 
       {/* Loading Overlay */}
-      <LoadingOverlay open={loading} reducedMotion={prefersReducedMotion} prompt={prompt} />
+      <LoadingOverlay open={loading} reducedMotion={prefersReducedMotion} prompt={prompt} queueStatus={queueStatus} />
 
       {/* Top Navigation Bar */}
       <nav className="fixed top-0 left-0 right-0 z-40 bg-black/10 backdrop-blur-xl border-b border-white/5">
@@ -764,6 +872,28 @@ function App() {
               <span>60s</span>
             </div>
           </div>
+
+          <div className="flex justify-center items-center gap-2 mt-6">
+            <span className="text-sm text-gray-400 mr-1">Lyrics</span>
+            {[
+              { value: "short", label: "Verse + chorus" },
+              { value: "medium", label: "Full song" },
+              { value: "long", label: "Extended" },
+            ].map((option) => (
+              <button
+                key={option.value}
+                onClick={() => setSongLength(option.value)}
+                className={`px-4 py-2 rounded-full text-sm font-semibold transition-all duration-300 ${
+                  songLength === option.value
+                    ? "bg-white/20 text-white border border-white/40"
+                    : "bg-white/5 text-gray-400 hover:bg-white/10 hover:text-white border border-white/10"
+                }`}
+                style={{ fontFamily: "Montserrat, sans-serif" }}
+              >
+                {option.label}
+              </button>
+            ))}
+          </div>
         </div>
 
         {error && (
@@ -846,10 +976,10 @@ function App() {
         </div>
       </div>
       <div className="mt-16">
-  <GeneratedAudios />
+  <GeneratedAudios apiBase={API_BASE} refreshKey={audioUrl} />
 </div>
 <div className="mt-16">
-  <GeneratedImages />
+  <GeneratedImages apiBase={API_BASE} refreshKey={imageUrl} />
 </div>
 
 
@@ -995,10 +1125,17 @@ function App() {
           {activeTab === "lyrics" && lyrics && (
             <div className="max-w-4xl mx-auto">
               <SpotifyLyricsDisplay lyrics={lyrics} />
-              <div className="mt-6 text-center">
+              <div className="mt-6 flex justify-center gap-3">
+                <button
+                  onClick={regenerateLyrics}
+                  disabled={regeneratingLyrics}
+                  className="bg-white/10 hover:bg-white/20 disabled:opacity-50 text-white px-6 py-3 rounded-full flex items-center gap-2 transition-all duration-300 hover:scale-105"
+                >
+                  🔁 {regeneratingLyrics ? "Writing..." : "New Lyrics"}
+                </button>
                 <button
                   onClick={downloadLyrics}
-                  className="bg-green-600 hover:bg-green-700 text-white px-6 py-3 rounded-full flex items-center gap-2 mx-auto transition-all duration-300 hover:scale-105"
+                  className="bg-green-600 hover:bg-green-700 text-white px-6 py-3 rounded-full flex items-center gap-2 transition-all duration-300 hover:scale-105"
                 >
                   ⬇️ Download Lyrics
                 </button>
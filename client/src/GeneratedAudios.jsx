@@ -37,7 +37,22 @@ function gradientFor(key) {
   return `linear-gradient(135deg, hsla(${a},92%,62%,0.24), hsla(${b},92%,62%,0.10))`;
 }
 
-// ✅ Auto-load ALL audio files in src/assets (CRA/Webpack)
+// ✅ Server history: keyset-paginated pages from GET /history
+const PAGE_SIZE = 50;
+
+function fromHistory(item) {
+  return {
+    id: `gen-${item.id}`,
+    file: item.audio_file,
+    url: item.audio_url,
+    title: item.title || prettifyFileName(item.audio_file),
+    subtitle: item.prompt,
+    format: extOf(item.audio_file),
+    tags: [item.genre, item.mood].filter(Boolean),
+  };
+}
+
+// Fallback when the API is unreachable: audio files bundled in src/assets (CRA/Webpack)
 // If this file is in src/components, change "./assets" -> "../assets"
 function loadAssetAudios() {
   try {
@@ -53,7 +68,9 @@ function loadAssetAudios() {
           file,
           url: ctx(k),
           title: prettifyFileName(file),
+          subtitle: file,
           format: extOf(file),
+          tags: ["Local", "Assets"],
         };
       })
       .sort((a, b) => a.title.localeCompare(b.title));
@@ -62,11 +79,56 @@ function loadAssetAudios() {
   }
 }
 
-export default function GeneratedAudios() {
+export default function GeneratedAudios({ apiBase = "http://127.0.0.1:7860", refreshKey = null }) {
   const audioRef = useRef(null);
 
-  const tracks = useMemo(() => loadAssetAudios(), []);
-  const [activeId, setActiveId] = useState(tracks[0]?.id || null);
+  const localTracks = useMemo(() => loadAssetAudios(), []);
+  const [serverTracks, setServerTracks] = useState(null); // null until the first page loads
+  const [cursor, setCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  const fetchPage = async (after) => {
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+    if (after) params.set("cursor", after);
+    const res = await fetch(`${apiBase}/history?${params}`);
+    if (!res.ok) throw new Error(`history ${res.status}`);
+    const data = await res.json();
+    return { items: data.items.filter((i) => i.audio_url).map(fromHistory), next: data.next_cursor };
+  };
+
+  // First page on mount and whenever a new song lands
+  useEffect(() => {
+    let cancelled = false;
+    fetchPage(null)
+      .then(({ items, next }) => {
+        if (cancelled) return;
+        setServerTracks(items);
+        setCursor(next);
+      })
+      .catch(() => !cancelled && setServerTracks(null));
+    return () => {
+      cancelled = true;
+    };
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [apiBase, refreshKey]);
+
+  const loadMore = async () => {
+    if (!cursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const { items, next } = await fetchPage(cursor);
+      setServerTracks((prev) => [...(prev || []), ...items]);
+      setCursor(next);
+    } catch {
+      // keep what we have; the button stays for a retry
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const fromServer = !!serverTracks?.length;
+  const tracks = fromServer ? serverTracks : localTracks;
+  const [activeId, setActiveId] = useState(null);
   const activeTrack = useMemo(
     () => tracks.find((t) => t.id === activeId) || tracks[0] || null,
     [tracks, activeId]
@@ -117,7 +179,7 @@ export default function GeneratedAudios() {
   const playTrack = (id) => {
     if (!tracks.length) return;
 
-    if (id === activeId) {
+    if (id === activeTrack?.id) {
       togglePlay();
       return;
     }
@@ -143,14 +205,14 @@ export default function GeneratedAudios() {
 
   const goPrev = () => {
     if (!tracks.length) return;
-    const idx = tracks.findIndex((t) => t.id === activeId);
+    const idx = tracks.findIndex((t) => t.id === activeTrack?.id);
     const prev = tracks[(idx - 1 + tracks.length) % tracks.length];
     if (prev) setActiveId(prev.id);
   };
 
   const goNext = () => {
     if (!tracks.length) return;
-    const idx = tracks.findIndex((t) => t.id === activeId);
+    const idx = tracks.findIndex((t) => t.id === activeTrack?.id);
     const next = tracks[(idx + 1) % tracks.length];
     if (next) setActiveId(next.id);
   };
@@ -171,13 +233,19 @@ export default function GeneratedAudios() {
             Your Generated Library
           </h3>
           <p className="text-white/60 mt-1">
-            Auto-loaded from <span className="text-white/80">src/assets</span> — play anything instantly.
+            {fromServer ? (
+              <>Every song you've generated, newest first — play anything instantly.</>
+            ) : (
+              <>
+                Auto-loaded from <span className="text-white/80">src/assets</span> — play anything instantly.
+              </>
+            )}
           </p>
         </div>
 
         <div className="hidden md:flex items-center gap-2 text-xs text-white/50">
           <span className="px-3 py-1 rounded-full border border-white/10 bg-white/5 backdrop-blur-md">
-            Local files
+            {fromServer ? "History" : "Local files"}
           </span>
           <span className="px-3 py-1 rounded-full border border-white/10 bg-white/5 backdrop-blur-md">
             Premium UI
@@ -206,12 +274,15 @@ export default function GeneratedAudios() {
           <div className="rounded-3xl border border-white/10 bg-white/[0.04] backdrop-blur-xl shadow-[0_30px_80px_rgba(0,0,0,0.35)] overflow-hidden">
             <div className="px-6 py-5 border-b border-white/10 flex items-center justify-between">
               <div className="text-white/85 text-sm font-semibold">Library</div>
-              <div className="text-white/40 text-xs">{tracks.length} tracks</div>
+              <div className="text-white/40 text-xs">
+                {tracks.length}
+                {cursor ? "+" : ""} tracks
+              </div>
             </div>
 
             <div className="divide-y divide-white/5">
               {tracks.map((t) => {
-                const active = t.id === activeId;
+                const active = t.id === activeTrack?.id;
                 return (
                   <button
                     key={t.id}
@@ -249,12 +320,15 @@ export default function GeneratedAudios() {
                         </span>
                       </div>
 
-                      <div className="mt-1 text-white/50 text-sm truncate">{t.file}</div>
+                      <div className="mt-1 text-white/50 text-sm truncate">{t.subtitle}</div>
 
                       {/* micro meta */}
                       <div className="mt-2 flex items-center gap-2 text-[11px] text-white/45">
-                        <span className="px-2 py-0.5 rounded-full bg-white/5 border border-white/10">Local</span>
-                        <span className="px-2 py-0.5 rounded-full bg-white/5 border border-white/10">Assets</span>
+                        {t.tags.map((tag) => (
+                          <span key={tag} className="px-2 py-0.5 rounded-full bg-white/5 border border-white/10">
+                            {tag}
+                          </span>
+                        ))}
                       </div>
                     </div>
 
@@ -273,6 +347,18 @@ export default function GeneratedAudios() {
                 );
               })}
             </div>
+
+            {fromServer && cursor && (
+              <div className="px-6 py-4 border-t border-white/10 flex justify-center">
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="px-4 py-2 rounded-full bg-white/5 hover:bg-white/10 border border-white/10 text-white/85 transition disabled:opacity-50"
+                >
+                  {loadingMore ? "Loading…" : "Load more"}
+                </button>
+              </div>
+            )}
           </div>
 
           {/* Now Playing */}
@@ -289,7 +375,7 @@ export default function GeneratedAudios() {
                 <div className="flex items-center justify-between gap-3">
                   <div className="min-w-0">
                     <div className="text-white text-lg font-extrabold truncate">{activeTrack?.title || "Track"}</div>
-                    <div className="text-white/60 text-sm truncate">{activeTrack?.file || ""}</div>
+                    <div className="text-white/60 text-sm truncate">{activeTrack?.subtitle || ""}</div>
                   </div>
 
                   <button
@@ -22,7 +22,20 @@ function gradientFor(key) {
   return `linear-gradient(135deg, hsla(${a},92%,62%,0.22), hsla(${b},92%,62%,0.10))`;
 }
 
-// ✅ Auto-load ALL images in src/assets/images (CRA/Webpack)
+// ✅ Server gallery: keyset-paginated pages of rendered covers from GET /gallery
+const PAGE_SIZE = 30;
+
+function fromGallery(item) {
+  return {
+    id: `gen-${item.id}`,
+    file: item.image_file,
+    url: item.image_url,
+    title: item.title || prettifyFileName(item.image_file),
+    subtitle: item.prompt,
+  };
+}
+
+// Fallback when the API is unreachable: images bundled in src/assets/images (CRA/Webpack)
 // If this file is in src/components, change "./assets/images" -> "../assets/images"
 function loadAssetImages() {
   try {
@@ -38,6 +51,7 @@ function loadAssetImages() {
           file,
           url: ctx(k),
           title: prettifyFileName(file),
+          subtitle: file,
         };
       })
       .sort((a, b) => a.title.localeCompare(b.title));
@@ -46,9 +60,54 @@ function loadAssetImages() {
   }
 }
 
-export default function GeneratedImages() {
-  const images = useMemo(() => loadAssetImages(), []);
-  const [activeId, setActiveId] = useState(images[0]?.id || null);
+export default function GeneratedImages({ apiBase = "http://127.0.0.1:7860", refreshKey = null }) {
+  const localImages = useMemo(() => loadAssetImages(), []);
+  const [serverImages, setServerImages] = useState(null); // null until the first page loads
+  const [cursor, setCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  const fetchPage = async (after) => {
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+    if (after) params.set("cursor", after);
+    const res = await fetch(`${apiBase}/gallery?${params}`);
+    if (!res.ok) throw new Error(`gallery ${res.status}`);
+    const data = await res.json();
+    return { items: data.items.map(fromGallery), next: data.next_cursor };
+  };
+
+  // First page on mount and whenever a new cover finishes
+  useEffect(() => {
+    let cancelled = false;
+    fetchPage(null)
+      .then(({ items, next }) => {
+        if (cancelled) return;
+        setServerImages(items);
+        setCursor(next);
+      })
+      .catch(() => !cancelled && setServerImages(null));
+    return () => {
+      cancelled = true;
+    };
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [apiBase, refreshKey]);
+
+  const loadMore = async () => {
+    if (!cursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const { items, next } = await fetchPage(cursor);
+      setServerImages((prev) => [...(prev || []), ...items]);
+      setCursor(next);
+    } catch {
+      // keep what we have; the button stays for a retry
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const fromServer = !!serverImages?.length;
+  const images = fromServer ? serverImages : localImages;
+  const [activeId, setActiveId] = useState(null);
 
   const active = useMemo(
     () => images.find((x) => x.id === activeId) || null,
@@ -100,13 +159,19 @@ export default function GeneratedImages() {
             Your Generated Gallery
           </h3>
           <p className="text-white/60 mt-1">
-            Auto-loaded from <span className="text-white/80">src/assets/images</span> — click to view full size.
+            {fromServer ? (
+              <>Every cover you've generated, newest first — click to view full size.</>
+            ) : (
+              <>
+                Auto-loaded from <span className="text-white/80">src/assets/images</span> — click to view full size.
+              </>
+            )}
           </p>
         </div>
 
         <div className="hidden md:flex items-center gap-2 text-xs text-white/50">
           <span className="px-3 py-1 rounded-full border border-white/10 bg-white/5 backdrop-blur-md">
-            Local images
+            {fromServer ? "Gallery" : "Local images"}
           </span>
           <span className="px-3 py-1 rounded-full border border-white/10 bg-white/5 backdrop-blur-md">
             Lightbox
@@ -157,13 +222,25 @@ export default function GeneratedImages() {
 
                   <div className="absolute inset-x-0 bottom-0 p-4 bg-gradient-to-t from-black/60 via-black/20 to-transparent">
                     <div className="text-white font-extrabold truncate">{img.title}</div>
-                    <div className="text-white/60 text-xs truncate">{img.file}</div>
+                    <div className="text-white/60 text-xs truncate">{img.subtitle}</div>
                   </div>
                 </div>
               </button>
             ))}
           </div>
 
+          {fromServer && cursor && (
+            <div className="mt-6 flex justify-center">
+              <button
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="px-4 py-2 rounded-full bg-white/5 hover:bg-white/10 border border-white/10 text-white/85 transition disabled:opacity-50"
+              >
+                {loadingMore ? "Loading…" : "Load more"}
+              </button>
+            </div>
+          )}
+
           {/* Lightbox */}
           {open && active && (
             <div
@@ -180,7 +257,7 @@ export default function GeneratedImages() {
                 <div className="flex items-center justify-between gap-4 p-4 border-b border-white/10">
                   <div className="min-w-0">
                     <div className="text-white font-extrabold truncate">{active.title}</div>
-                    <div className="text-white/60 text-xs truncate">{active.file}</div>
+                    <div className="text-white/60 text-xs truncate">{active.subtitle}</div>
                   </div>
 
                   <div className="flex items-center gap-2">
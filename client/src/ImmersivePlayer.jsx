@@ -2,6 +2,7 @@
 import { useEffect, useMemo, useRef, useState } from "react";
 import { motion, AnimatePresence } from "framer-motion";
 import WavyOrb from "./WavyOrb";
+import { lyricsRows, activeRowIndex } from "./lyricsDocument";
 
 function clamp(v, lo = 0, hi = 255) {
   return Math.min(hi, Math.max(lo, v));
@@ -128,30 +129,18 @@ export default function ImmersivePlayer({
     };
   }, [imageUrl]);
 
-  // ---------- Lyrics parsing ----------
-  const lyricsLines = useMemo(() => {
-    if (!lyrics?.content) return [];
-    const lines = lyrics.content.split("\n");
-    const out = [];
-    for (const raw of lines) {
-      const t = raw.trim();
-      if (!t || t.startsWith("#")) continue;
-      const isSection = /^\[.*\]$/.test(t);
-      out.push({ id: `line-${out.length}`, text: t, isSection });
-    }
-    return out;
-  }, [lyrics]);
+  // ---------- Lyrics rows (pre-structured by the backend) ----------
+  const lyricsLines = useMemo(() => lyricsRows(lyrics), [lyrics]);
 
-  // Highlight lyric line based on playback progress (simple mapping)
+  // Highlight the line being sung: each line owns a syllable-weighted share of the song
   useEffect(() => {
     if (!isPlaying || !showLyrics || lyricsLines.length === 0) return;
     const id = setInterval(() => {
       const p = duration ? currentTime / duration : 0;
-      const idx = Math.floor(p * lyricsLines.length);
-      setCurrentLineIndex(Math.min(idx, lyricsLines.length - 1));
+      setCurrentLineIndex(activeRowIndex(lyricsLines, p));
     }, 120);
     return () => clearInterval(id);
-  }, [isPlaying, showLyrics, currentTime, duration, lyricsLines.length]);
+  }, [isPlaying, showLyrics, currentTime, duration, lyricsLines]);
 
   // ---------- Audio sync ----------
   useEffect(() => {
@@ -385,7 +374,7 @@ export default function ImmersivePlayer({
                               lineHeight: 1.6,
                             }}
                           >
-                            {line.text.replace(/^\[|\]$/g, "")}
+                            {line.text}
                           </div>
                         );
                       })}
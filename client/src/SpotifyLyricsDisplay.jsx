@@ -1,5 +1,6 @@
-import React, { useState, useEffect, useRef, useCallback } from 'react';
+import React, { useState, useEffect, useRef, useMemo } from 'react';
 import { motion } from 'framer-motion';
+import { lyricsRows } from './lyricsDocument';
 
 const SpotifyLyricsDisplay = ({ lyrics }) => {
   const [currentLineIndex, setCurrentLineIndex] = useState(0);
@@ -7,30 +8,8 @@ const SpotifyLyricsDisplay = ({ lyrics }) => {
   const lyricsContainerRef = useRef(null);
   const scrollIntervalRef = useRef(null);
   
-  // Parse lyrics into lines
-  const parseLyrics = useCallback((lyricsText) => {
-    if (!lyricsText) return [];
-    
-    const lines = lyricsText.split('\n');
-    const parsedLines = [];
-    
-    lines.forEach((line) => {
-      const trimmedLine = line.trim();
-      if (trimmedLine && !trimmedLine.startsWith('#')) {
-        const isSection = trimmedLine.match(/^\[.*\]$/);
-        parsedLines.push({
-          text: trimmedLine,
-          isSection: !!isSection,
-          id: `line-${parsedLines.length}`
-        });
-      }
-    });
-    
-    console.log("✅ Parsed lyrics lines:", parsedLines.length);
-    return parsedLines;
-  }, []);
-
-  const lyricsLines = parseLyrics(lyrics?.content);
+  // Sections and lines come pre-structured from the backend
+  const lyricsLines = useMemo(() => lyricsRows(lyrics), [lyrics]);
 
   // Simple auto-scroll system - independent of audio
   const startAutoScroll = () => {
@@ -87,7 +66,7 @@ const SpotifyLyricsDisplay = ({ lyrics }) => {
   // Auto-scroll container to keep current line in view
   useEffect(() => {
     if (lyricsContainerRef.current && lyricsLines.length > 0) {
-      const currentElement = lyricsContainerRef.current.querySelector(`#line-${currentLineIndex}`);
+      const currentElement = lyricsContainerRef.current.querySelector(`#row-${currentLineIndex}`);
       if (currentElement) {
         currentElement.scrollIntoView({
           behavior: 'smooth',
@@ -201,7 +180,7 @@ const SpotifyLyricsDisplay = ({ lyrics }) => {
         {lyricsLines.map((line, index) => (
           <motion.div
             key={line.id}
-            id={`line-${index}`}
+            id={`row-${index}`}
             animate={{
               opacity: index === currentLineIndex ? 1 : 0.4,
               scale: index === currentLineIndex ? 1.02 : 1,
@@ -213,7 +192,7 @@ const SpotifyLyricsDisplay = ({ lyrics }) => {
           >
             {line.isSection ? (
               <span className="bg-gradient-to-r from-blue-400 to-purple-400 bg-clip-text text-transparent font-bold text-lg">
-                {line.text}
+                [{line.text}]
               </span>
             ) : (
               <span className="text-lg leading-relaxed font-medium">
@@ -0,0 +1,28 @@
+// Flattens the backend's structured lyrics document into display rows:
+// one header row per labeled section followed by its lines.
+export const lyricsRows = (lyrics) => {
+  const sections = lyrics?.document?.sections || [];
+  const rows = [];
+  sections.forEach((section, s) => {
+    if (section.label) {
+      rows.push({ id: `section-${s}`, text: section.label, isSection: true });
+    }
+    section.lines.forEach((line) => {
+      rows.push({
+        id: `line-${line.index}`,
+        text: line.text,
+        isSection: false,
+        syllables: line.syllables,
+        start: line.timing[0],
+        end: line.timing[1],
+      });
+    });
+  });
+  return rows;
+};
+
+// Row index of the lyric line sung at progress p (0..1), by syllable share
+export const activeRowIndex = (rows, p) => {
+  const idx = rows.findIndex((row) => !row.isSection && p < row.end);
+  return idx === -1 ? rows.length - 1 : idx;
+};